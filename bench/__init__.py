@@ -0,0 +1 @@
+"""Benchmarks against synthetic survey data; run ``python -m bench --help``."""
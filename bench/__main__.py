@@ -0,0 +1,383 @@
+"""Benchmark suite: ``python -m bench [--sizes 1k,100k,1M] [--json out.json]``.
+
+Times the gazetteer load and geo option building, the submit path of the
+survey form and each computation behind the admin dashboard against
+synthetic "Main List" data of each size, using ``MemoryConnection`` instead of
+Google Sheets. ``--app`` also runs the real Streamlit script (admin
+dashboard, cold and warm) and reports the timings recorded by
+``fiber_survey.metrics``. Save a run with ``--json`` and pass it to
+``--compare`` on another commit to see the change per case.
+
+Everything runs in a scratch data directory; the gazetteer snapshot (and
+cached map boundaries, if any) are copied into it.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_USER_DATA_DIR = os.environ.get("FIBER_SURVEY_DATA_DIR")
+WORK_DIR = tempfile.mkdtemp(prefix="fiber-bench-")
+os.environ["FIBER_SURVEY_DATA_DIR"] = WORK_DIR  # before fiber_survey.config is imported
+
+import pandas as pd  # noqa: E402
+
+from fiber_survey import (dedup, distance_checks, explorer, export, frames, gazetteer, points, rollups,  # noqa: E402
+                          sheets, storage, validation)
+from fiber_survey.config import BASE_DIR  # noqa: E402
+from fiber_survey.geo_index import GeoIndex  # noqa: E402
+from fiber_survey.mirror import Mirror  # noqa: E402
+from fiber_survey.outbox import Flusher, Outbox  # noqa: E402
+from fiber_survey.schema import DB_COLUMNS, LINE_ID_COLUMN, MAIN_WORKSHEET, POINT_COLUMNS, POINTS_WORKSHEET  # noqa: E402
+from fiber_survey.topology import Topology  # noqa: E402
+
+from . import synthetic  # noqa: E402
+from .memory_sheets import MemoryConnection  # noqa: E402
+
+DEFAULT_SIZES = "1k,100k"
+INCREMENT = 10  # rows added before each incremental sync
+REWRITE_MAX = 200000  # the full-sheet rewrite holds several copies of the sheet in memory
+SEARCHES = ["ঢাকা", "কালি", "সদর", "পুর"]
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def user_data_dir():
+    return _USER_DATA_DIR or os.path.join(BASE_DIR, "local_data")
+
+
+def gazetteer_path(explicit=None):
+    candidates = [explicit] if explicit else [gazetteer.SNAPSHOT_PATH,
+                                              os.path.join(user_data_dir(), "gazetteer.json.gz")]
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    if explicit:
+        raise SystemExit(f"No gazetteer snapshot at {explicit}")
+    print("No gazetteer snapshot found (run `python -m fiber_survey.gazetteer refresh`); "
+          "using a synthetic gazetteer", flush=True)
+    path = os.path.join(WORK_DIR, "synthetic-gazetteer.json.gz")
+    gazetteer.write_snapshot(synthetic.gazetteer(), path, sources={})
+    return path
+
+
+class Runner:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def case(self, group, name, fn, size=None, setup=None, repeat=None):
+        # Median and best of `repeat` runs; setup() runs untimed before each
+        runs = []
+        value = None
+        for _ in range(repeat or self.repeat):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            value = fn()
+            runs.append((time.perf_counter() - start) * 1000)
+        result = {"group": group, "name": name, "size": size, "median_ms": round(statistics.median(runs), 3),
+                  "min_ms": round(min(runs), 3), "runs": len(runs)}
+        self.results.append(result)
+        print(f"  {name:<38} {_size(size):>6} {result['median_ms']:>11.1f} {result['min_ms']:>11.1f}", flush=True)
+        return value
+
+
+def _size(size):
+    if size is None:
+        return "-"
+    if size >= 1000000 and size % 1000000 == 0:
+        return f"{size // 1000000}M"
+    if size >= 1000 and size % 1000 == 0:
+        return f"{size // 1000}k"
+    return str(size)
+
+
+# --- gazetteer ---------------------------------------------------------------
+def bench_gazetteer(run, path):
+    print("gazetteer", flush=True)
+    tree = run.case("gazetteer", "gazetteer.read_snapshot", lambda: gazetteer.read_snapshot(path)["tree"])
+    index = run.case("gazetteer", "geo_index.build", lambda: GeoIndex(tree))
+
+    def all_options():
+        # Every selectbox list the form can show, Division -> Upazila
+        n = len(index.options())
+        for div in index.children():
+            n += len(index.options(div))
+            for dist in index.children(div):
+                n += len(index.options(div, dist))
+                for upz in index.children(div, dist):
+                    n += len(index.options(div, dist, upz))
+        return n
+
+    run.case("gazetteer", "geo_index.options_all", all_options)
+    run.case("gazetteer", "geo_index.search", lambda: [index.search(q) for q in SEARCHES])
+    run.case("gazetteer", "validation.gazetteer_keys", lambda: validation.gazetteer_keys(tree))
+    return tree
+
+
+# --- submit path -------------------------------------------------------------
+def bench_submit(run, tree, keys, conn, size, scratch, rewrite_max=REWRITE_MAX):
+    print(f"submit ({_size(size)} rows in Main List)", flush=True)
+    officer, fiber_records = synthetic.form_submission(tree, lines=3, points_per_line=2, seed=size)
+    outbox = Outbox(path=os.path.join(scratch, "outbox.sqlite3"))
+    flusher = Flusher(outbox, storage.SheetsStorage(conn))  # not started; flush_once is called directly
+
+    def build_and_validate():
+        records, point_rows = synthetic.submit_records(officer, fiber_records)
+        frame = validation.normalize_frame(pd.DataFrame(records), DB_COLUMNS)
+        frame.index = pd.RangeIndex(1, len(frame) + 1)
+        validation.errors_only(validation.validate(frame, gazetteer_key_sets=keys))
+        return records, point_rows
+
+    records, point_rows = run.case("submit", "submit.build_validate", build_and_validate, size)
+    run.case("submit", "submit.enqueue", lambda: outbox.enqueue_many(
+        {MAIN_WORKSHEET: records, POINTS_WORKSHEET: point_rows}), size)
+    while flusher.flush_once():
+        pass
+    run.case("submit", "submit.flush_append", flusher.flush_once, size,
+             setup=lambda: outbox.enqueue_many({MAIN_WORKSHEET: records, POINTS_WORKSHEET: point_rows}))
+    # FIBER_STORAGE_BACKEND=sql with a local SQLite file
+    database = storage.SQLStorage("sqlite:///" + os.path.join(scratch, "survey.sqlite3"))
+    sql_flusher = Flusher(outbox, database)
+    run.case("submit", "submit.flush_sql", sql_flusher.flush_once, size,
+             setup=lambda: outbox.enqueue_many({MAIN_WORKSHEET: records, POINTS_WORKSHEET: point_rows}))
+    # Legacy FIBER_SHEETS_WRITE_MODE=rewrite: read, concat and rewrite the whole sheet
+    if size <= rewrite_max:
+        run.case("submit", "submit.rewrite", lambda: sheets.rewrite_records(conn, records), size)
+    else:
+        print(f"  {'submit.rewrite':<38} {_size(size):>6} {'skipped (--rewrite-max)':>23}", flush=True)
+
+
+# --- dashboard -----------------------------------------------------------------
+def bench_dashboard(run, conn, size, scratch, tree):
+    print(f"dashboard ({_size(size)} rows)", flush=True)
+    path = os.path.join(scratch, "mirror.sqlite3")
+    mirror = Mirror(path=path, worksheet=MAIN_WORKSHEET,
+                    hooks=[rollups.Rollups(), rollups.AreaRollups(), dedup.LineHashes()], indexes=explorer.INDEXES)
+    points_mirror = Mirror(path=path, worksheet=POINTS_WORKSHEET, columns=POINT_COLUMNS, table=points.POINTS_TABLE,
+                           indexes=[(LINE_ID_COLUMN,)])
+    repeat = 1 if size >= 1000000 else None
+
+    run.case("dashboard", "mirror.full_sync", lambda: mirror.sync(conn, force=True), size, repeat=repeat)
+    run.case("dashboard", "mirror.points_full_sync", lambda: points_mirror.sync(conn, force=True), size,
+             repeat=repeat)
+
+    extra = iter(range(10 ** 6))
+
+    def add_rows():
+        lines = synthetic.main_list(tree, INCREMENT, seed=size + next(extra))
+        sheets.append_records(conn, lines)
+
+    run.case("dashboard", "mirror.incremental_sync", lambda: mirror.sync(conn, min_interval=0), size,
+             setup=add_rows)
+
+    q = mirror.query
+    run.case("dashboard", "rollups.totals", lambda: q(rollups.totals), size)
+    run.case("dashboard", "rollups.counts_by", lambda: (q(rollups.counts_by, "division"),
+                                                        q(rollups.counts_by, "core")), size)
+    run.case("dashboard", "rollups.daily_entries", lambda: q(rollups.daily_entries), size)
+    run.case("dashboard", "rollups.top_officers", lambda: q(rollups.top_officers, 10), size)
+    run.case("dashboard", "rollups.area_totals", lambda: (q(rollups.area_totals, "district"),
+                                                          q(rollups.area_totals, "upazila")), size)
+    run.case("dashboard", "mirror.tail", lambda: mirror.tail(10), size)
+    run.case("dashboard", "dedup.totals", lambda: q(dedup.totals), size)
+    run.case("dashboard", "dedup.review", lambda: q(dedup.review, mirror.table), size)
+    run.case("dashboard", "distance_checks.scan", lambda: q(distance_checks.scan), size, repeat=repeat)
+    # Submit-time lookup of a 3 line form against every stored line
+    submission = pd.DataFrame(synthetic.submit_records(*synthetic.form_submission(tree, lines=3, seed=size + 1))[0])
+    run.case("dashboard", "dedup.claim", lambda: q(dedup.claim, submission), size,
+             setup=lambda: q(dedup.release, submission))
+    run.case("dashboard", "points.points_per_line", lambda: q(points.points_per_line), size)
+    run.case("dashboard", "points.core_transitions", lambda: q(points.core_transitions), size)
+    run.case("dashboard", "validation.main_list", lambda: validation.validate(
+        validation.normalize_frame(mirror.read_frame(), DB_COLUMNS),
+        gazetteer_key_sets=validation.gazetteer_keys(tree)), size, repeat=repeat)
+    geo = frames.geo_categories(tree)
+    run.case("dashboard", "frames.load", lambda: frames.load(mirror, geo), size, repeat=repeat)
+
+    division = next(iter(tree), "")
+    run.case("dashboard", "explorer.count_page", lambda: (
+        q(explorer.count, mirror.table, [("উৎস বিভাগ", "=", division)]),
+        q(explorer.page, mirror.table, [("উৎস বিভাগ", "=", division)], offset=500)), size)
+    for fmt in export.FORMATS:
+        run.case("dashboard", f"export.{fmt.lower()}", lambda: os.remove(export.export(
+            mirror, points.POINTS_TABLE, fmt)), size, repeat=repeat)
+
+    generations = tuple(m.state()["generation"] for m in (mirror, points_mirror))
+    run.case("dashboard", "topology.build", lambda: q(Topology().sync, generations), size, repeat=repeat)
+    topo = Topology()
+    q(topo.sync, generations)
+    forget = topo._memo.clear  # analyses are memoized per graph version
+    run.case("dashboard", "topology.components_by_district", topo.components_by_district, size, setup=forget)
+    run.case("dashboard", "topology.longest_routes", lambda: topo.longest_routes(10), size, setup=forget)
+    run.case("dashboard", "topology.single_points_of_failure", lambda: topo.single_points_of_failure(20), size,
+             setup=forget)
+
+    # FIBER_STORAGE_BACKEND=sql: the same rows in a local SQLite database
+    database = storage.SQLStorage("sqlite:///" + os.path.join(scratch, "survey.sqlite3"))
+    run.case("dashboard", "sql.import_sheets", lambda: database.import_from(storage.SheetsStorage(conn)), size,
+             repeat=1)
+    run.case("dashboard", "sql.query_page", lambda: database.query(
+        MAIN_WORKSHEET, {"উৎস বিভাগ": division}, order_by="Timestamp", descending=True, limit=50, offset=500), size)
+    run.case("dashboard", "sql.aggregate", lambda: database.aggregate(
+        MAIN_WORKSHEET, ["উৎস জেলা"], {"entries": ("count", None), "km": ("sum", "উৎস দূরত্ব (KM)")}), size)
+    sql_mirror = Mirror(path=os.path.join(scratch, "sql_mirror.sqlite3"), worksheet=MAIN_WORKSHEET,
+                        hooks=[rollups.Rollups(), rollups.AreaRollups(), dedup.LineHashes()])
+    run.case("dashboard", "mirror.full_sync_sql", lambda: sql_mirror.sync(database, force=True), size, repeat=repeat)
+
+
+# --- whole app (optional) ------------------------------------------------------
+APP_OPS = ["mirror.sync", "dashboard.figures", "dashboard.plotly_render", "map.build", "script.run"]
+
+
+def bench_app(run, conn, size):
+    # Real script through Streamlit's AppTest; numbers come from fiber_survey.metrics
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    from fiber_survey import metrics
+
+    print(f"app ({_size(size)} rows)", flush=True)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    for name in os.listdir(WORK_DIR):
+        if name.startswith(("mirror.sqlite3", "outbox.sqlite3")):
+            os.remove(os.path.join(WORK_DIR, name))
+    st.connection = lambda *args, **kwargs: conn
+    app = AppTest.from_file(os.path.join(BASE_DIR, "fiber-core-survey.py"), default_timeout=3600)
+    # Login page in a fresh interpreter, as on a container cold start; this
+    # process has already imported everything
+    code = ("import sys, time; from streamlit.testing.v1 import AppTest; "
+            "app = AppTest.from_file(sys.argv[1], default_timeout=600); started = time.perf_counter(); app.run(); "
+            "print((time.perf_counter() - started) * 1000)")
+    ms = float(subprocess.run([sys.executable, "-c", code, os.path.join(BASE_DIR, "fiber-core-survey.py")],
+                              env=dict(os.environ, PYTHONPATH=BASE_DIR), capture_output=True, text=True,
+                              check=True).stdout.split()[-1])
+    run.results.append({"group": "app", "name": "app.cold.login", "size": size, "median_ms": round(ms, 3),
+                        "min_ms": round(ms, 3), "runs": 1})
+    print(f"  {'app.cold.login':<38} {_size(size):>6} {ms:>11.1f} {ms:>11.1f}", flush=True)
+    app.run()
+    app.text_input(key="auth_pass").input("Bccadmin2026")
+    app.button[0].click()
+    for label in ("cold", "warm"):
+        metrics._samples.clear()
+        start = time.perf_counter()
+        app.run()
+        if app.exception:
+            raise SystemExit(f"App raised: {app.exception[0].value}")
+        elapsed = (time.perf_counter() - start) * 1000
+        table = metrics.summary()
+        table = table[table["Page"] == "Dashboard"]
+        for op in APP_OPS:
+            rows = table[table["Operation"] == op]
+            if rows.empty:
+                continue
+            ms = float((rows["p50 (ms)"] * rows["Count"]).sum())
+            run.results.append({"group": "app", "name": f"app.{label}.{op}", "size": size, "median_ms": ms,
+                                "min_ms": ms, "runs": 1})
+            print(f"  {'app.' + label + '.' + op:<38} {_size(size):>6} {ms:>11.1f} {ms:>11.1f}", flush=True)
+        run.results.append({"group": "app", "name": f"app.{label}.rerun", "size": size,
+                            "median_ms": round(elapsed, 3), "min_ms": round(elapsed, 3), "runs": 1})
+        print(f"  {'app.' + label + '.rerun':<38} {_size(size):>6} {elapsed:>11.1f} {elapsed:>11.1f}", flush=True)
+
+
+# --- reporting -----------------------------------------------------------------
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {"commit": commit, "python": platform.python_version(), "pandas": pd.__version__,
+            "machine": platform.machine(), "when": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = {(r["name"], r["size"]): r["median_ms"] for r in baseline["results"]}
+    print(f"\ncompared with {baseline['environment'].get('commit') or baseline_path}")
+    print(f"  {'case':<38} {'size':>6} {'before ms':>11} {'after ms':>11} {'change':>8}")
+    for r in results:
+        old = before.get((r["name"], r["size"]))
+        if old is None:
+            continue
+        change = f"{(r['median_ms'] - old) / old * 100:+.0f}%" if old else "-"
+        print(f"  {r['name']:<38} {_size(r['size']):>6} {old:>11.1f} {r['median_ms']:>11.1f} {change:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Main List sizes, e.g. 1k,100k,1M")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each Sheets API call")
+    parser.add_argument("--gazetteer", help="gazetteer snapshot to use (default: the app's)")
+    parser.add_argument("--only", help="comma separated groups: gazetteer,submit,dashboard,app")
+    parser.add_argument("--rewrite-max", type=parse_size, default=REWRITE_MAX,
+                        help="largest size for the legacy full-sheet rewrite case")
+    parser.add_argument("--app", action="store_true", help="also time the Streamlit script itself")
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--compare", help="results JSON of an earlier run")
+    args = parser.parse_args(argv)
+
+    groups = set(args.only.split(",")) if args.only else {"gazetteer", "submit", "dashboard"}
+    if args.app:
+        groups.add("app")
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    path = gazetteer_path(args.gazetteer)
+    shutil.copy(path, os.path.join(WORK_DIR, "gazetteer.json.gz"))
+    boundaries = os.path.join(user_data_dir(), "boundaries")
+    if os.path.isdir(boundaries):
+        shutil.copytree(boundaries, os.path.join(WORK_DIR, "boundaries"))
+
+    run = Runner(args.repeat)
+    print(f"{'':<2} {'case':<38} {'size':>6} {'median ms':>11} {'best ms':>11}")
+    try:
+        tree = gazetteer.read_snapshot(path)["tree"]
+        if "gazetteer" in groups:
+            bench_gazetteer(run, path)
+        keys = validation.gazetteer_keys(tree)
+        for size in sizes:
+            lines = synthetic.main_list(tree, size, args.seed)
+            point_rows = synthetic.point_list(lines, args.seed)
+            for group in ("submit", "dashboard", "app"):
+                if group not in groups:
+                    continue
+                conn = MemoryConnection(latency=args.latency)
+                conn.load(MAIN_WORKSHEET, lines)
+                conn.load(POINTS_WORKSHEET, point_rows)
+                scratch = tempfile.mkdtemp(dir=WORK_DIR)
+                if group == "submit":
+                    bench_submit(run, tree, keys, conn, size, scratch, args.rewrite_max)
+                elif group == "dashboard":
+                    bench_dashboard(run, conn, size, scratch, tree)
+                else:
+                    bench_app(run, conn, size)
+                shutil.rmtree(scratch, ignore_errors=True)
+            del lines, point_rows
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    doc = {"environment": environment(), "results": run.results}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(doc, f, ensure_ascii=False, indent=1)
+    if args.compare:
+        compare(run.results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""In-memory stand-in for ``GSheetsConnection``.
+
+Implements the parts the app uses: ``conn.read``/``conn.update`` for the
+rewrite path, and the service account client (``_select_worksheet``,
+``_open_spreadsheet``) with the gspread worksheet calls used by
+``fiber_survey.sheets``, ``mirror`` and ``points``. ``latency`` adds a fixed
+delay per API call to model the round trip to Google.
+"""
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def _col(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def _parse(a1):
+    m = re.match(r"([A-Z]+)(\d+)", a1)
+    return int(m.group(2)), _col(m.group(1))
+
+
+class MemoryWorksheet:
+    def __init__(self, spreadsheet, title, sheet_id):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.col_count = 26
+        self.rows = []  # lists of strings, header first
+
+    def _call(self):
+        if self.spreadsheet.latency:
+            time.sleep(self.spreadsheet.latency)
+        self.spreadsheet.calls += 1
+
+    def row_values(self, row):
+        self._call()
+        return list(self.rows[row - 1]) if len(self.rows) >= row else []
+
+    def get_all_values(self):
+        self._call()
+        width = max((len(r) for r in self.rows), default=0)
+        return [r + [""] * (width - len(r)) for r in self.rows]
+
+    def get(self, range_name):
+        # "A12:Z" / "A12:Z40" -> rows up to column Z, trailing blanks dropped like the API
+        self._call()
+        start, end = range_name.split(":")
+        row, _ = _parse(start)
+        last = _col(end.rstrip("0123456789"))
+        end_row = int(end[len(end.rstrip("0123456789")):] or len(self.rows))
+        out = []
+        for r in self.rows[row - 1:end_row]:
+            r = r[:last]
+            while r and r[-1] == "":
+                r = r[:-1]
+            out.append(r)
+        return out
+
+    def update(self, range_name=None, values=None, **kwargs):
+        self._call()
+        row, col = _parse(range_name)
+        for i, values_row in enumerate(values):
+            while len(self.rows) < row + i:
+                self.rows.append([])
+            current = self.rows[row - 1 + i]
+            if len(current) < col - 1 + len(values_row):
+                current.extend([""] * (col - 1 + len(values_row) - len(current)))
+            current[col - 1:col - 1 + len(values_row)] = ["" if v is None else str(v) for v in values_row]
+        self.col_count = max(self.col_count, col - 1 + max((len(v) for v in values), default=0))
+
+    def append_rows(self, values, **kwargs):
+        self._call()
+        self.rows.extend([["" if v is None else str(v) for v in r] for r in values])
+
+
+class MemorySpreadsheet:
+    def __init__(self, latency=0.0):
+        self.id = f"memory-{id(self)}"  # sheets caches headers per spreadsheet id
+        self.latency = latency
+        self.calls = 0
+        self._sheets = {}
+
+    def worksheet(self, title):
+        from gspread.exceptions import WorksheetNotFound
+
+        if title not in self._sheets:
+            raise WorksheetNotFound(title)
+        return self._sheets[title]
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self._sheets[title] = MemoryWorksheet(self, title, len(self._sheets) + 1)
+        return self._sheets[title]
+
+    def worksheets(self):
+        return list(self._sheets.values())
+
+
+class MemoryClient:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def _select_worksheet(self, worksheet=None, **kwargs):
+        return self.spreadsheet.worksheet(worksheet)
+
+    def _open_spreadsheet(self, **kwargs):
+        return self.spreadsheet
+
+
+class MemoryConnection:
+    def __init__(self, latency=0.0):
+        self.spreadsheet = MemorySpreadsheet(latency)
+        self.client = MemoryClient(self.spreadsheet)
+
+    def load(self, worksheet, frame):
+        # Seeds a worksheet with a header row and the frame's rows as text
+        try:
+            ws = self.spreadsheet.worksheet(worksheet)
+        except Exception:
+            ws = self.spreadsheet.add_worksheet(worksheet)
+        # Equal cells share one str object, so a 1M row sheet fits in memory
+        columns = []
+        for col in frame.columns:
+            codes, uniques = pd.factorize(frame[col].astype(str))
+            columns.append(np.array(list(uniques), dtype=object)[codes])
+        ws.rows = [list(frame.columns)] + np.column_stack(columns).tolist()
+        ws.col_count = max(ws.col_count, len(frame.columns))
+        return ws
+
+    def read(self, worksheet=None, ttl=None, **kwargs):
+        values = self.spreadsheet.worksheet(worksheet).get_all_values()
+        if not values:
+            return pd.DataFrame()
+        return pd.DataFrame(values[1:], columns=values[0])
+
+    def update(self, worksheet=None, data=None, **kwargs):
+        ws = self.spreadsheet.worksheet(worksheet)
+        ws._call()
+        ws.rows = [list(data.columns)] + data.astype(object).where(data.notna(), "").astype(str).values.tolist()
@@ -0,0 +1,159 @@
+"""Synthetic "Main List" and "Points" data for the benchmarks.
+
+Rows follow ``DB_COLUMNS`` and use real Division -> Union names from the
+gazetteer, so gazetteer checks, rollups and the topology see realistic key
+distributions. Output only depends on ``seed``. Values are drawn from small
+pools of strings, which keeps a 1M row sheet within a few hundred MB.
+"""
+import numpy as np
+import pandas as pd
+
+from fiber_survey import points
+from fiber_survey.schema import DB_COLUMNS, LINE_ID_COLUMN, POINT_COLUMNS
+
+CORE_TYPES = np.array(["48", "24", "12"], dtype=object)
+CORE_WEIGHTS = [0.3, 0.5, 0.2]
+DESIGNATIONS = np.array([
+    "প্রোগ্রামার", "মেইনটেন্যান্স ইঞ্জিনিয়ার", "নেটওয়ার্ক ইঞ্জিনিয়ার", "সহকারী পরিচালক",
+    "সহকারী প্রোগ্রামার", "সহকারী মেইনটেন্যান্স ইঞ্জিনিয়ার", "সহকারী নেটওয়ার্ক ইঞ্জিনিয়ার",
+], dtype=object)
+OFFICERS = 2000
+NEARBY = 40  # destinations are drawn within this many unions of the source
+START = pd.Timestamp("2026-01-01")
+DAYS = 180
+
+
+DIVISIONS = ["ঢাকা", "চট্টগ্রাম", "রাজশাহী", "খুলনা", "বরিশাল", "সিলেট", "রংপুর", "ময়মনসিংহ"]
+
+
+def gazetteer(districts=8, upazilas=8, unions=9):
+    # Stand-in tree of about the real gazetteer's size, for runs without a
+    # snapshot; only the division names are real
+    return {div: {f"{div} জেলা {i}": {f"{div} {i} উপজেলা {j}": [f"{div} {i}-{j} ইউনিয়ন {k}" for k in range(unions)]
+                                      for j in range(upazilas)}
+                  for i in range(districts)}
+            for div in DIVISIONS}
+
+
+def union_paths(tree):
+    # Every (division, district, upazila, union), in gazetteer order so
+    # neighbouring indexes are in the same district
+    return [(div, dist, upz, uni)
+            for div, districts in tree.items()
+            for dist, upazilas in districts.items()
+            for upz, unions in upazilas.items()
+            for uni in (unions or [""])]
+
+
+def _km_pool(rng, n):
+    # Mostly short links with a long tail, as strings with two decimals
+    pool = np.array([f"{v:.2f}" for v in np.round(np.arange(0, 60, 0.01), 2)], dtype=object)
+    km = np.minimum(np.round(rng.gamma(2.0, 3.0, n), 2), 59.99)
+    return pool[(km * 100).astype(int)]
+
+
+def main_list(tree, n, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = union_paths(tree)
+    cols = [np.array([p[i] for p in paths], dtype=object) for i in range(4)]
+    node_names = np.array([f"{p[3] or p[2]} POP" for p in paths], dtype=object)
+
+    src = rng.integers(0, len(paths), n)
+    dst = np.clip(src + rng.integers(-NEARBY, NEARBY + 1, n), 0, len(paths) - 1)
+
+    officer = rng.integers(0, OFFICERS, n)
+    officer_names = np.array([f"কর্মকর্তা {i}" for i in range(OFFICERS)], dtype=object)
+    contacts = np.array([f"017{i:08d}" for i in range(OFFICERS)], dtype=object)
+    designations = DESIGNATIONS[np.arange(OFFICERS) % len(DESIGNATIONS)]
+    workplace_upz = rng.integers(0, len(paths), OFFICERS)
+    workplaces = np.array([f"উপজেলা আইসিটি অফিস, {paths[i][2]}" for i in workplace_upz], dtype=object)
+
+    seconds = np.sort(rng.integers(0, DAYS * 86400, n))
+    stamps = (START + pd.to_timedelta(seconds, unit="s")).strftime("%Y-%m-%d %H:%M:%S")
+    line_ids = [f"{v:016x}" for v in rng.integers(0, 2 ** 63, n, dtype=np.int64)]
+
+    frame = pd.DataFrame({
+        "Timestamp": np.asarray(stamps, dtype=object),
+        "নাম": officer_names[officer],
+        "যোগাযোগ নম্বর": contacts[officer],
+        "পদবী": designations[officer],
+        "কর্মস্থল": workplaces[officer],
+        "উৎস বিভাগ": cols[0][src], "উৎস জেলা": cols[1][src], "উৎস উপজেলা": cols[2][src], "উৎস ইউনিয়ন": cols[3][src],
+        "উৎস (Source Name)": node_names[src],
+        "উৎস কোর টাইপ": rng.choice(CORE_TYPES, n, p=CORE_WEIGHTS),
+        "উৎস দূরত্ব (KM)": _km_pool(rng, n),
+        "গন্তব্য বিভাগ": cols[0][dst], "গন্তব্য জেলা": cols[1][dst], "গন্তব্য উপজেলা": cols[2][dst],
+        "গন্তব্য ইউনিয়ন": cols[3][dst],
+        "গন্তব্য (Destination Name)": node_names[dst],
+        "গন্তব্য কোর টাইপ": rng.choice(CORE_TYPES, n, p=CORE_WEIGHTS),
+        "গন্তব্য দূরত্ব (KM)": _km_pool(rng, n),
+        "ডিপেন্ডেন্সি (KM)": _km_pool(rng, n),
+        "পয়েন্টসমূহ": "",
+        LINE_ID_COLUMN: np.array(line_ids, dtype=object),
+    })
+    return frame[DB_COLUMNS]
+
+
+def point_list(lines, seed=0, mean_points=1.0, max_points=4):
+    # Intermediate points for a main_list() frame, ordered like the flusher writes them
+    rng = np.random.default_rng(seed + 1)
+    counts = np.minimum(rng.poisson(mean_points, len(lines)), max_points)
+    line_index = np.repeat(np.arange(len(lines)), counts)
+    n = len(line_index)
+    seq = pd.Series(line_index).groupby(line_index).cumcount().to_numpy() + 1
+    unions = lines["উৎস ইউনিয়ন"].to_numpy()[line_index]
+    frame = pd.DataFrame({
+        LINE_ID_COLUMN: lines[LINE_ID_COLUMN].to_numpy()[line_index],
+        points.SEQ: seq.astype(str).astype(object),
+        points.NAME: [f"{u} JB-{s}" for u, s in zip(unions, seq)],
+        points.CORE: rng.choice(CORE_TYPES, n, p=CORE_WEIGHTS),
+        points.DIST: _km_pool(rng, n),
+    })
+    return frame[POINT_COLUMNS]
+
+
+def form_submissions(tree, count, lines=1, points_per_line=2, seed=0):
+    # count submits of what render_survey_form collects: the officer fields
+    # and one dict per fiber line, with points as entered
+    sample = main_list(tree, count * lines, seed)
+    fiber_records = []
+    for row in sample.to_dict("records"):
+        fiber_records.append({
+            "div": row["উৎস বিভাগ"], "dist": row["উৎস জেলা"], "upz": row["উৎস উপজেলা"], "uni": row["উৎস ইউনিয়ন"],
+            "s_name": row["উৎস (Source Name)"], "s_core": row["উৎস কোর টাইপ"],
+            "s_dist": float(row["উৎস দূরত্ব (KM)"]),
+            "d_div": row["গন্তব্য বিভাগ"], "d_district": row["গন্তব্য জেলা"], "d_upz": row["গন্তব্য উপজেলা"],
+            "d_uni": row["গন্তব্য ইউনিয়ন"], "d_name": row["গন্তব্য (Destination Name)"],
+            "d_core": row["গন্তব্য কোর টাইপ"], "d_dist": float(row["গন্তব্য দূরত্ব (KM)"]),
+            "dep_km": float(row["ডিপেন্ডেন্সি (KM)"]),
+            "points": [{"name": f"JB-{k}", "core": "24", "dist": 1.5} for k in range(points_per_line)],
+        })
+    out = []
+    for start in range(0, count * lines, lines):
+        first = sample.iloc[start]
+        officer = {key: first[key] for key in ["নাম", "যোগাযোগ নম্বর", "পদবী", "কর্মস্থল"]}
+        out.append((officer, fiber_records[start:start + lines]))
+    return out
+
+
+def form_submission(tree, lines=1, points_per_line=2, seed=0):
+    return form_submissions(tree, 1, lines, points_per_line, seed)[0]
+
+
+def submit_records(officer, fiber_records):
+    # Mirrors render_survey_form: one "Main List" row per line, point rows by Line ID
+    records, point_rows = [], []
+    stamp = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+    for rec in fiber_records:
+        line_id = points.new_line_id()
+        point_rows.extend(points.point_rows(line_id, rec.get("points") or []))
+        records.append({
+            "Timestamp": stamp, **officer,
+            "উৎস বিভাগ": rec["div"], "উৎস জেলা": rec["dist"], "উৎস উপজেলা": rec["upz"], "উৎস ইউনিয়ন": rec["uni"],
+            "উৎস (Source Name)": rec["s_name"], "উৎস কোর টাইপ": rec["s_core"], "উৎস দূরত্ব (KM)": rec["s_dist"],
+            "গন্তব্য বিভাগ": rec["d_div"], "গন্তব্য জেলা": rec["d_district"], "গন্তব্য উপজেলা": rec["d_upz"],
+            "গন্তব্য ইউনিয়ন": rec["d_uni"], "গন্তব্য (Destination Name)": rec["d_name"],
+            "গন্তব্য কোর টাইপ": rec["d_core"], "গন্তব্য দূরত্ব (KM)": rec["d_dist"], "ডিপেন্ডেন্সি (KM)": rec["dep_km"],
+            "পয়েন্টসমূহ": "", "Line ID": line_id,
+        })
+    return records, point_rows
@@ -1,11 +1,12 @@
 import streamlit as st
-import pandas as pd
-import json
-import urllib.request
-from datetime import datetime
-import plotly.express as px
-from streamlit_gsheets import GSheetsConnection
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Only what the login page needs; pandas, gspread and the survey modules are
+# imported below the login check, plotly where the admin charts are built
+from fiber_survey import gazetteer, metrics
 
 # -----------------------------------------------------------------------------
 # PAGE SETUP & DESIGN (Moved to top)
@@ -100,85 +101,326 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # -----------------------------------------------------------------------------
-# 1. GEOGRAPHICAL DATA LOADER
+# 0. LOGIN (rendered before the heavy imports)
 # -----------------------------------------------------------------------------
-NUHIL_RAW = {
-    "divisions": "https://raw.githubusercontent.com/nuhil/bangladesh-geocode/master/divisions/divisions.json",
-    "districts": "https://raw.githubusercontent.com/nuhil/bangladesh-geocode/master/districts/districts.json",
-    "upazilas": "https://raw.githubusercontent.com/nuhil/bangladesh-geocode/master/upazilas/upazilas.json",
-    "unions": "https://raw.githubusercontent.com/nuhil/bangladesh-geocode/master/unions/unions.json",
-}
+def render_login():
+    st.markdown("<br><br>", unsafe_allow_html=True)
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        with st.form("login_form"):
+            st.markdown("<h2 style='text-align: center; color: #006400;'>লগইন করুন</h2>", unsafe_allow_html=True)
+            password = st.text_input("পাসওয়ার্ড (Password)", type="password", key="auth_pass")
+            submitted = st.form_submit_button("প্রবেশ করুন (Login)", use_container_width=True)
+            if submitted:
+                if password == 'Bccuser2026':
+                    st.session_state.authenticated = True
+                    st.session_state.user_role = 'USER'
+                    st.rerun()
+                elif password == 'Bccadmin2026':
+                    st.session_state.authenticated = True
+                    st.session_state.user_role = 'ADMIN'
+                    st.rerun()
+                else:
+                    st.error("❌ ভুল পাসওয়ার্ড! আবার চেষ্টা করুন।")
+
+def load_bd_data():
+    # Prebuilt snapshot (see fiber_survey.gazetteer)
+    with metrics.timer("gazetteer.load"):
+        doc = gazetteer.load_document()
+    return doc["tree"], doc["sha256"]
 
-def fetch_json(url):
-    with urllib.request.urlopen(url, timeout=30) as r:
-        return json.loads(r.read().decode('utf-8'))
+@st.cache_resource
+def gazetteer_loader():
+    # Parsed once per host in a background thread, started by the first
+    # rerun after a login; sessions wait on it only where areas are needed
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gazetteer")
+    loading = pool.submit(load_bd_data)
+    pool.shutdown(wait=False)
+    return loading
 
-@st.cache_data
-def build_bd_data():
+if not st.session_state.get("authenticated"):
+    started = time.perf_counter()
+    metrics.start_server()
+    metrics.set_context(None, "Login")
     try:
-        div_raw = fetch_json(NUHIL_RAW['divisions'])
-        dist_raw = fetch_json(NUHIL_RAW['districts'])
-        upz_raw = fetch_json(NUHIL_RAW['upazilas'])
-        uni_raw = fetch_json(NUHIL_RAW['unions'])
-        
-        def extract_data(raw):
-            if isinstance(raw, list):
-                for item in raw:
-                    if isinstance(item, dict) and 'data' in item: return item['data']
-            if isinstance(raw, dict) and 'data' in raw: return raw['data']
-            return []
-
-        divs, dists, upzs, unis = extract_data(div_raw), extract_data(dist_raw), extract_data(upz_raw), extract_data(uni_raw)
-        div_map = {str(d['id']): d.get('bn_name') or d.get('name') for d in divs}
-        dist_map = {str(d['id']): {'bn_name': d.get('bn_name') or d.get('name'), 'division_id': str(d.get('division_id'))} for d in dists}
-        upz_map = {str(u['id']): {'bn_name': u.get('bn_name') or u.get('name'), 'district_id': str(u.get('district_id'))} for u in upzs}
-        
-        uni_map = {}
-        for u in unis:
-            upid = str(u.get('upazilla_id') or u.get('upazila_id') or '')
-            uni_map.setdefault(upid, []).append(u.get('bn_name') or u.get('name'))
-
-        data_tree = {}
-        for upz_id, upz in upz_map.items():
-            dist_id = upz.get('district_id')
-            dist_entry = dist_map.get(dist_id)
-            if not dist_entry: continue
-            div_name = div_map.get(dist_entry.get('division_id'), 'অন্যান্য')
-            dist_name = dist_entry.get('bn_name')
-            upz_name = upz.get('bn_name')
-            data_tree.setdefault(div_name, {}).setdefault(dist_name, {})[upz_name] = uni_map.get(upz_id, [])
-        return data_tree
-    except:
-        return {}
-
-BD_DATA = build_bd_data()
+        render_login()
+    finally:
+        metrics.record("script.run", time.perf_counter() - started)
+    st.stop()
+
+gazetteer_loader()  # parses while the imports below run
+
+import pandas as pd  # noqa: E402
+from streamlit_gsheets import GSheetsConnection  # noqa: E402
+
+from fiber_survey import (boundaries, bulk_import, dedup, distance_checks, explorer, export,  # noqa: E402
+                          geo_index, points, rollups, shared_cache, storage, validation)
+from fiber_survey.topology import Topology  # noqa: E402
+from fiber_survey.geo_index import OTHER, PLACEHOLDER, format_path  # noqa: E402
+from fiber_survey.mirror import Mirror  # noqa: E402
+from fiber_survey.config import EXPORT_MAX_ROWS, SHEETS_REPLICA  # noqa: E402
+from fiber_survey.outbox import Flusher, Outbox  # noqa: E402
+from fiber_survey.schema import (DB_COLUMNS, KM_COLUMNS, LINE_ID_COLUMN, MAIN_WORKSHEET, POINT_COLUMNS,  # noqa: E402
+                                 POINTS_WORKSHEET)
 
 # -----------------------------------------------------------------------------
-# DATABASE SCHEMA
+# 1. GEOGRAPHICAL DATA LOADER
 # -----------------------------------------------------------------------------
-DB_COLUMNS = [
-    "Timestamp", "নাম", "যোগাযোগ নম্বর", "পদবী", "কর্মস্থল", 
-    "উৎস বিভাগ", "উৎস জেলা", "উৎস উপজেলা", "উৎস ইউনিয়ন", 
-    "উৎস (Source Name)", "উৎস কোর টাইপ", "উৎস দূরত্ব (KM)", 
-    "গন্তব্য বিভাগ", "গন্তব্য জেলা", "গন্তব্য উপজেলা", "গন্তব্য ইউনিয়ন",
-    "গন্তব্য (Destination Name)", "গন্তব্য কোর টাইপ", "গন্তব্য দূরত্ব (KM)", 
-    "ডিপেন্ডেন্সি (KM)", "পয়েন্টসমূহ"
-]
+def get_bd_data():
+    # (tree, version) from the background load, waiting if it is still
+    # running; a failed load is dropped so the next rerun tries again
+    try:
+        return gazetteer_loader().result()
+    except gazetteer.GazetteerError:
+        gazetteer_loader.clear()
+        return {}, None
 
 # -----------------------------------------------------------------------------
 # 2. UI HELPERS
 # -----------------------------------------------------------------------------
-def smart_geo_input(label, options_list, key):
-    opts = ['-- নির্বাচন করুন --'] + (sorted(options_list) if options_list else []) + ['অন্যান্য']
+def get_geo_index():
+    # Presorted option tuples + search index, built once per gazetteer version;
+    # not st.cache_resource, which would keep a failed load's empty index
+    return geo_index.for_version(*get_bd_data())
+
+def get_gazetteer_keys():
+    # Hash sets for the gazetteer membership rule in fiber_survey.validation
+    return validation.gazetteer_keys_for_version(*get_bd_data())
+
+def smart_geo_input(label, opts, key):
+    # opts comes ready-made from GeoIndex.options (placeholder ... অন্যান্য)
     choice = st.selectbox(label, opts, key=key)
-    if choice == 'অন্যান্য':
+    if choice == OTHER:
         return st.text_input(f"অন্যান্য (লিখুন): {label}", key=f"{key}_other")
-    return "" if choice == '-- নির্বাচন করুন --' else choice
+    return "" if choice == PLACEHOLDER else choice
+
+GEO_LEVELS = ["div", "dist", "upz", "uni"]
+
+def apply_geo_search(key_prefix, i):
+    # Fills the Division -> Union selectboxes from the picked search result
+    label = st.session_state.get(f"{key_prefix}geo_pick_{i}")
+    path = st.session_state.get(f"{key_prefix}geo_matches_{i}", {}).get(label)
+    if not path:
+        return
+    for level, value in zip(GEO_LEVELS, path):
+        st.session_state[f"{key_prefix}geo_{level}_{i}"] = value
+    for level in GEO_LEVELS[len(path):]:
+        st.session_state.pop(f"{key_prefix}geo_{level}_{i}", None)
+    st.session_state[f"{key_prefix}geo_search_{i}"] = ""
+    st.session_state[f"{key_prefix}geo_pick_{i}"] = PLACEHOLDER
+
+def geo_search_box(geo, key_prefix, i):
+    query = st.text_input("🔎 ইউনিয়ন / উপজেলা খুঁজুন (Search)", key=f"{key_prefix}geo_search_{i}",
+                          placeholder="নামের অংশ লিখুন")
+    if query:
+        matches = {format_path(p): p for p in geo.search(query)}
+        if matches:
+            st.session_state[f"{key_prefix}geo_matches_{i}"] = matches
+            st.selectbox("ফলাফল থেকে বাছাই করুন", [PLACEHOLDER] + list(matches), key=f"{key_prefix}geo_pick_{i}",
+                         on_change=apply_geo_search, args=(key_prefix, i))
+        else:
+            st.caption("কোন মিল পাওয়া যায়নি")
+
+# -----------------------------------------------------------------------------
+# 3. SUBMISSION OUTBOX
+# -----------------------------------------------------------------------------
+@st.cache_resource
+def get_storage(_conn):
+    # Sheets or a database (FIBER_STORAGE_BACKEND); a database copies its rows
+    # on to the sheets in the background
+    backend = storage.from_config(_conn)
+    if isinstance(backend, storage.SQLStorage) and SHEETS_REPLICA and _conn is not None:
+        storage.Replicator(backend, storage.sheets_storage(_conn)).start()
+    return backend
+
+@st.cache_resource
+def get_outbox(_conn):
+    # One outbox + background flusher per process; submissions are committed
+    # locally and sent to the storage in batches.
+    outbox = Outbox()
+    Flusher(outbox, get_storage(_conn)).start()
+    return outbox
+
+def render_outbox_status(outbox, detailed=False):
+    stats = outbox.stats()
+    st.markdown("### 📤 জমার অবস্থা")
+    o1, o2 = st.columns(2)
+    o1.metric("অপেক্ষমান", stats["pending"])
+    o2.metric("পাঠানো হয়েছে", stats["flushed"])
+    if detailed:
+        if stats["oldest_pending"]:
+            st.caption(f"সবচেয়ে পুরনো অপেক্ষমান: {stats['oldest_pending']}")
+        if stats["last_flush"]:
+            st.caption(f"সর্বশেষ পাঠানো: {stats['last_flush']}")
+        if stats["retrying"]:
+            st.warning(f"⚠️ {stats['retrying']} টি রেকর্ড পুনরায় চেষ্টা করা হচ্ছে: {stats['last_error']}")
+        if st.button("এখনই পাঠান (Flush now)", key="flush_now"):
+            outbox.flush_now()
 
 # -----------------------------------------------------------------------------
 # 4. FUNCTION: RENDER SURVEY FORM (User & Admin both can use)
 # -----------------------------------------------------------------------------
+def add_point(i):
+    st.session_state.point_rows[i] = st.session_state.point_rows.get(i, 0) + 1
+
+def remove_point(i):
+    current_points = st.session_state.point_rows.get(i, 0)
+    if current_points > 0:
+        st.session_state.point_rows[i] = current_points - 1
+        # Clean up state
+        for prefix in ["p_name_", "p_core_", "p_dist_"]:
+            key_to_del = f"{prefix}{i}_{current_points - 1}"
+            if key_to_del in st.session_state: del st.session_state[key_to_del]
+
+@st.fragment
+def render_fiber_line(i):
+    # Rendered as a fragment: typing in a line or adding/removing its points
+    # reruns only this line, not the whole page. On a full rerun (submit)
+    # every line runs and returns its record.
+    geo = get_geo_index()
+    core_type_opts = ["-- নির্বাচন করুন --", "48", "24", "12"]
+
+    st.markdown(f'<div class="fiber-block">', unsafe_allow_html=True)
+    st.markdown(f"#### ফাইবার লাইন - {i+1}")
+
+    # --- GEOGRAPHY INFO ---
+    st.markdown('<div class="section-head">উৎস এলাকার তথ্য</div>', unsafe_allow_html=True)
+    geo_search_box(geo, "", i)
+    g1, g2, g3, g4 = st.columns(4)
+    with g1:
+        final_div = smart_geo_input('উৎস বিভাগ (Division)', geo.options(), f'geo_div_{i}')
+    with g2:
+        final_dist = smart_geo_input('উৎস জেলা (District)', geo.options(final_div), f'geo_dist_{i}')
+    with g3:
+        final_upz = smart_geo_input('উৎস উপজেলা (Upazila)', geo.options(final_div, final_dist), f'geo_upz_{i}')
+    with g4:
+        final_uni = smart_geo_input('উৎস ইউনিয়ন (Union)', geo.options(final_div, final_dist, final_upz), f'geo_uni_{i}')
+
+    s1, s2, s3 = st.columns(3)
+    with s1: s_name = st.text_input("উৎস (Source Name) *", key=f"s_name_{i}")
+    with s2: s_core = st.selectbox("উৎস কোর টাইপ *", core_type_opts, key=f"s_core_{i}")
+    with s3: s_dist = st.number_input("উৎস দূরত্ব / Distance (KM) *", min_value=0.0, step=0.1, key=f"s_dist_{i}")
+
+    # --- Intermediate Points ---
+    points_for_this_fiber = []
+    num_points = st.session_state.point_rows.get(i, 0)
+
+    if num_points > 0:
+        st.markdown('<div class="section-head" style="margin-top: 15px; margin-bottom: 10px;">পয়েন্টের তথ্য</div>', unsafe_allow_html=True)
+
+    for j in range(num_points):
+        st.markdown(f"<h6>&nbsp;&nbsp;&nbsp;পয়েন্ট - {j+1}</h6>", unsafe_allow_html=True)
+        p_c1, p_c2, p_c3 = st.columns(3)
+        with p_c1:
+            p_name = st.text_input(f"পয়েন্ট {j+1} এর নাম (Point {j+1} Name)", key=f"p_name_{i}_{j}")
+        with p_c2:
+            p_core = st.selectbox("পয়েন্ট কোর টাইপ", core_type_opts, key=f"p_core_{i}_{j}")
+        with p_c3:
+            p_dist = st.number_input("পয়েন্ট দূরত্ব / Point  Distance (KM)", min_value=0.0, step=0.1, key=f"p_dist_{i}_{j}")
+
+        points_for_this_fiber.append({
+            "name": p_name,
+            "core": p_core,
+            "dist": p_dist
+        })
+
+    # Add/Remove Point Buttons (callbacks, so only this line reruns)
+    p_btn1, p_btn2, p_btn_spacer = st.columns([2, 1, 3])
+    with p_btn1:
+        st.button("➕ পয়েন্টের তথ্য যোগ করুন", key=f"add_point_{i}", use_container_width=True, on_click=add_point, args=(i,))
+    with p_btn2:
+        st.button("➖ বাদ দিন", key=f"rem_point_{i}", use_container_width=True, on_click=remove_point, args=(i,))
+
+    st.markdown('<div class="section-head">গন্তব্য এলাকার তথ্য</div>', unsafe_allow_html=True)
+    geo_search_box(geo, "d_", i)
+    gd1, gd2, gd3, gd4 = st.columns(4)
+    with gd1:
+        d_final_div = smart_geo_input('গন্তব্য বিভাগ (Division)', geo.options(), f'd_geo_div_{i}')
+    with gd2:
+        d_final_dist = smart_geo_input('গন্তব্য জেলা (District)', geo.options(d_final_div), f'd_geo_dist_{i}')
+    with gd3:
+        d_final_upz = smart_geo_input('গন্তব্য উপজেলা (Upazila)', geo.options(d_final_div, d_final_dist), f'd_geo_upz_{i}')
+    with gd4:
+        d_final_uni = smart_geo_input('গন্তব্য ইউনিয়ন (Union)', geo.options(d_final_div, d_final_dist, d_final_upz), f'd_geo_uni_{i}')
+
+    d1, d2, d3 = st.columns(3)
+    with d1: d_name = st.text_input("গন্তব্য (Destination Name) *", key=f"d_name_{i}")
+    with d2: d_core = st.selectbox("গন্তব্য কোর টাইপ *", core_type_opts, key=f"d_core_{i}")
+    with d3: d_dist = st.number_input("গন্তব্য দূরত্ব / Distance (KM) *", min_value=0.0, step=0.1, key=f"d_dist_{i}")
+
+    dep_km = st.number_input(f"ডিপেন্ডেন্সি / Dependency (KM) *", min_value=0.0, step=0.1, key=f"dep_{i}")
+
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    return {
+        "div": final_div, "dist": final_dist, "upz": final_upz, "uni": final_uni,
+        "d_div": d_final_div, "d_district": d_final_dist, "d_upz": d_final_upz, "d_uni": d_final_uni,
+        "dep_km": dep_km,
+        "s_name": s_name, "s_core": s_core, "s_dist": s_dist,
+        "d_name": d_name, "d_core": d_core, "d_dist": d_dist,
+        "points": points_for_this_fiber
+    }
+
+def add_fiber_line():
+    st.session_state.fiber_rows += 1
+
+def remove_fiber_line():
+    if st.session_state.fiber_rows > 1:
+        st.session_state.fiber_rows -= 1
+
+FORM_LABELS = {
+    "নাম": "তথ্য প্রদানকারীর নাম (Name) *",
+    "যোগাযোগ নম্বর": "যোগাযোগ নম্বর *",
+    "পদবী": "পদবী (Designation) *",
+    "কর্মস্থল": "কর্মস্থলের নাম (Workplace Name) *",
+    "উৎস বিভাগ": "উৎস বিভাগ (Division)",
+    "উৎস জেলা": "উৎস জেলা (District)",
+    "উৎস উপজেলা": "উৎস উপজেলা (Upazila)",
+    "উৎস ইউনিয়ন": "উৎস ইউনিয়ন (Union)",
+    "উৎস (Source Name)": "উৎস (Source Name) *",
+    "উৎস কোর টাইপ": "উৎস কোর টাইপ *",
+    "গন্তব্য বিভাগ": "গন্তব্য বিভাগ (Division)",
+    "গন্তব্য জেলা": "গন্তব্য জেলা (District)",
+    "গন্তব্য উপজেলা": "গন্তব্য উপজেলা (Upazila)",
+    "গন্তব্য ইউনিয়ন": "গন্তব্য ইউনিয়ন (Union)",
+    "গন্তব্য (Destination Name)": "গন্তব্য (Destination Name) *",
+    "গন্তব্য কোর টাইপ": "গন্তব্য কোর টাইপ *",
+}
+OFFICER_FIELDS = ["নাম", "যোগাযোগ নম্বর", "পদবী", "কর্মস্থল"]
+
+def form_error_messages(report):
+    # Turns the validation report into the form's messages; officer fields
+    # are shared by all lines, so they are listed once without a line number
+    row_col, col_col, msg_col = validation.REPORT_COLUMNS[:3]
+    missing, others, seen = [], [], set()
+    ordered = report.sort_values(row_col, kind="stable")
+    for line, col, message in ordered[[row_col, col_col, msg_col]].itertuples(index=False, name=None):
+        label = FORM_LABELS.get(col, col)
+        if col not in OFFICER_FIELDS:
+            label = f"{label} (লাইন {line})"
+        if label in seen:
+            continue
+        seen.add(label)
+        if message == validation.Required(col).message:
+            missing.append(label)
+        else:
+            others.append(f"❌ {label}: {message}")
+    errors = []
+    if missing:
+        errors.append("দয়া করে নিচের তথ্যগুলো পূরণ করুন:\n" + ", ".join(missing))
+    return errors + others
+
 def render_survey_form(conn):
+    notice = st.session_state.pop('submit_notice', None)
+    if notice:
+        st.snow()
+        st.success("✅ সফলভাবে সংরক্ষিত হয়েছে! আপনার তথ্য গ্রহণ করা হয়েছে এবং ডাটাবেজে পাঠানো হচ্ছে।")
+        if notice["skipped"]:
+            st.warning(f"⚠️ লাইন {', '.join(map(str, notice['skipped']))} আগেই জমা দেওয়া হয়েছে, তাই আবার সংরক্ষণ করা হয়নি।")
+        if notice["near"]:
+            st.info(f"ℹ️ লাইন {', '.join(map(str, notice['near']))} এর উৎস ও গন্তব্য আগের একটি এন্ট্রির সাথে মিলে যায়; "
+                    "এডমিন যাচাই করবেন।")
+
     if 'fiber_rows' not in st.session_state:
         st.session_state.fiber_rows = 1
     if 'point_rows' not in st.session_state:
@@ -208,116 +450,18 @@ def render_survey_form(conn):
 
     # --- FIBER CONNECTION INFO ---
     st.markdown('<div class="section-head">ফাইবার কোর কানেকশনের তথ্য</div>', unsafe_allow_html=True)
-    core_type_opts = ["-- নির্বাচন করুন --", "48", "24", "12"]
+    if not get_bd_data()[0]:
+        st.warning("⚠️ এলাকার তালিকা লোড করা যায়নি। 'অন্যান্য' নির্বাচন করে নাম লিখুন।")
     fiber_records = []
-    
     for i in range(st.session_state.fiber_rows):
-        st.markdown(f'<div class="fiber-block">', unsafe_allow_html=True)
-        st.markdown(f"#### ফাইবার লাইন - {i+1}")
-        
-        # --- GEOGRAPHY INFO ---
-        st.markdown('<div class="section-head">উৎস এলাকার তথ্য</div>', unsafe_allow_html=True)
-        g1, g2, g3, g4 = st.columns(4)
-        with g1:
-            div_list = list(BD_DATA.keys())
-            final_div = smart_geo_input('উৎস বিভাগ (Division)', div_list, f'geo_div_{i}')
-        with g2:
-            dist_opts = list(BD_DATA[final_div].keys()) if final_div in BD_DATA else []
-            final_dist = smart_geo_input('উৎস জেলা (District)', dist_opts, f'geo_dist_{i}')
-        with g3:
-            upz_opts = list(BD_DATA[final_div][final_dist].keys()) if (final_div in BD_DATA and final_dist in BD_DATA[final_div]) else []
-            final_upz = smart_geo_input('উৎস উপজেলা (Upazila)', upz_opts, f'geo_upz_{i}')
-        with g4:
-            uni_opts = BD_DATA[final_div][final_dist][final_upz] if (final_div in BD_DATA and final_dist in BD_DATA[final_div] and final_upz in BD_DATA[final_div][final_dist]) else []
-            final_uni = smart_geo_input('উৎস ইউনিয়ন (Union)', uni_opts, f'geo_uni_{i}')
-
-        s1, s2, s3 = st.columns(3)
-        with s1: s_name = st.text_input("উৎস (Source Name) *", key=f"s_name_{i}")
-        with s2: s_core = st.selectbox("উৎস কোর টাইপ *", core_type_opts, key=f"s_core_{i}")
-        with s3: s_dist = st.number_input("উৎস দূরত্ব / Distance (KM) *", min_value=0.0, step=0.1, key=f"s_dist_{i}")
-
-        # --- Intermediate Points ---
-        points_for_this_fiber = []
-        num_points = st.session_state.point_rows.get(i, 0)
-
-        if num_points > 0:
-            st.markdown('<div class="section-head" style="margin-top: 15px; margin-bottom: 10px;">পয়েন্টের তথ্য</div>', unsafe_allow_html=True)
-
-        for j in range(num_points):
-            st.markdown(f"<h6>&nbsp;&nbsp;&nbsp;পয়েন্ট - {j+1}</h6>", unsafe_allow_html=True)
-            p_c1, p_c2, p_c3 = st.columns(3)
-            with p_c1:
-                p_name = st.text_input(f"পয়েন্ট {j+1} এর নাম (Point {j+1} Name)", key=f"p_name_{i}_{j}")
-            with p_c2:
-                p_core = st.selectbox("পয়েন্ট কোর টাইপ", core_type_opts, key=f"p_core_{i}_{j}")
-            with p_c3:
-                p_dist = st.number_input("পয়েন্ট দূরত্ব / Point  Distance (KM)", min_value=0.0, step=0.1, key=f"p_dist_{i}_{j}")
-            
-            points_for_this_fiber.append({
-                "name": p_name,
-                "core": p_core,
-                "dist": p_dist
-            })
-
-        # Add/Remove Point Buttons
-        p_btn1, p_btn2, p_btn_spacer = st.columns([2, 1, 3])
-        with p_btn1:
-            if st.button("➕ পয়েন্টের তথ্য যোগ করুন", key=f"add_point_{i}", use_container_width=True):
-                st.session_state.point_rows[i] = st.session_state.point_rows.get(i, 0) + 1
-                st.rerun()
-        with p_btn2:
-            if st.button("➖ বাদ দিন", key=f"rem_point_{i}", use_container_width=True) and st.session_state.point_rows.get(i, 0) > 0:
-                current_points = st.session_state.point_rows.get(i, 0)
-                st.session_state.point_rows[i] = current_points - 1
-                # Clean up state
-                for prefix in ["p_name_", "p_core_", "p_dist_"]:
-                    key_to_del = f"{prefix}{i}_{current_points - 1}"
-                    if key_to_del in st.session_state: del st.session_state[key_to_del]
-                st.rerun()
-
-        st.markdown('<div class="section-head">গন্তব্য এলাকার তথ্য</div>', unsafe_allow_html=True)
-        gd1, gd2, gd3, gd4 = st.columns(4)
-        with gd1:
-            d_div_list = list(BD_DATA.keys())
-            d_final_div = smart_geo_input('গন্তব্য বিভাগ (Division)', d_div_list, f'd_geo_div_{i}')
-        with gd2:
-            d_dist_opts = list(BD_DATA[d_final_div].keys()) if d_final_div in BD_DATA else []
-            d_final_dist = smart_geo_input('গন্তব্য জেলা (District)', d_dist_opts, f'd_geo_dist_{i}')
-        with gd3:
-            d_upz_opts = list(BD_DATA[d_final_div][d_final_dist].keys()) if (d_final_div in BD_DATA and d_final_dist in BD_DATA[d_final_div]) else []
-            d_final_upz = smart_geo_input('গন্তব্য উপজেলা (Upazila)', d_upz_opts, f'd_geo_upz_{i}')
-        with gd4:
-            d_uni_opts = BD_DATA[d_final_div][d_final_dist][d_final_upz] if (d_final_div in BD_DATA and d_final_dist in BD_DATA[d_final_div] and d_final_upz in BD_DATA[d_final_div][d_final_dist]) else []
-            d_final_uni = smart_geo_input('গন্তব্য ইউনিয়ন (Union)', d_uni_opts, f'd_geo_uni_{i}')
-
-        d1, d2, d3 = st.columns(3)
-        with d1: d_name = st.text_input("গন্তব্য (Destination Name) *", key=f"d_name_{i}")
-        with d2: d_core = st.selectbox("গন্তব্য কোর টাইপ *", core_type_opts, key=f"d_core_{i}")
-        with d3: d_dist = st.number_input("গন্তব্য দূরত্ব / Distance (KM) *", min_value=0.0, step=0.1, key=f"d_dist_{i}")
-        
-        dep_km = st.number_input(f"ডিপেন্ডেন্সি / Dependency (KM) *", min_value=0.0, step=0.1, key=f"dep_{i}")
-
-        st.markdown('</div>', unsafe_allow_html=True)
-
-        fiber_records.append({
-            "div": final_div, "dist": final_dist, "upz": final_upz, "uni": final_uni,
-            "d_div": d_final_div, "d_district": d_final_dist, "d_upz": d_final_upz, "d_uni": d_final_uni,
-            "dep_km": dep_km,
-            "s_name": s_name, "s_core": s_core, "s_dist": s_dist,
-            "d_name": d_name, "d_core": d_core, "d_dist": d_dist,
-            "points": points_for_this_fiber
-        })
+        fiber_records.append(render_fiber_line(i))
 
     # Add/Remove Line Buttons
     _, btn_add, btn_rem = st.columns([4, 1, 1])
     with btn_add:
-        if st.button("➕ আরও ফাইবার লাইন যোগ করুন", use_container_width=True):
-            st.session_state.fiber_rows += 1
-            st.rerun()
+        st.button("➕ আরও ফাইবার লাইন যোগ করুন", use_container_width=True, on_click=add_fiber_line)
     with btn_rem:
-        if st.button("➖ বাদ দিন", use_container_width=True) and st.session_state.fiber_rows > 1:
-            st.session_state.fiber_rows -= 1
-            st.rerun()
+        st.button("➖ বাদ দিন", use_container_width=True, on_click=remove_fiber_line)
 
     # --- SUBMIT ---
     st.markdown("<br>", unsafe_allow_html=True)
@@ -326,240 +470,680 @@ def render_survey_form(conn):
         submit_btn = st.button("জমা দিন", use_container_width=True, type="primary")
 
     if submit_btn:
-        officer_contact_valid = user_contact.isdigit() and len(user_contact) == 11 if user_contact else False
-        
-        validation_errors = []
-        missing_fields = []
-        if not name: missing_fields.append("তথ্য প্রদানকারীর নাম (Name) *")
-        if not user_contact: missing_fields.append("যোগাযোগ নম্বর *")
-        if not designation: missing_fields.append("পদবী (Designation) *")
-        if not workplace: missing_fields.append("কর্মস্থলের নাম (Workplace Name) *")
-
-        # Validate Fiber fields
-        for idx, rec in enumerate(fiber_records):
-            if not rec["div"]: missing_fields.append(f"উৎস বিভাগ (Division) (লাইন {idx+1})")
-            if not rec["dist"]: missing_fields.append(f"উৎস জেলা (District) (লাইন {idx+1})")
-            if not rec["upz"]: missing_fields.append(f"উৎস উপজেলা (Upazila) (লাইন {idx+1})")
-            if not rec["uni"]: missing_fields.append(f"উৎস ইউনিয়ন (Union) (লাইন {idx+1})")
-            if not rec["d_div"]: missing_fields.append(f"গন্তব্য বিভাগ (Division) (লাইন {idx+1})")
-            if not rec["d_district"]: missing_fields.append(f"গন্তব্য জেলা (District) (লাইন {idx+1})")
-            if not rec["d_upz"]: missing_fields.append(f"গন্তব্য উপজেলা (Upazila) (লাইন {idx+1})")
-            if not rec["d_uni"]: missing_fields.append(f"গন্তব্য ইউনিয়ন (Union) (লাইন {idx+1})")
-            if not rec["s_name"]: missing_fields.append(f"উৎস (Source Name) * (লাইন {idx+1})")
-            if rec["s_core"] == "-- নির্বাচন করুন --": missing_fields.append(f"উৎস কোর টাইপ * (লাইন {idx+1})")
-            if not rec["d_name"]: missing_fields.append(f"গন্তব্য (Destination Name) * (লাইন {idx+1})")
-            if rec["d_core"] == "-- নির্বাচন করুন --": missing_fields.append(f"গন্তব্য কোর টাইপ * (লাইন {idx+1})")
-
-        all_errors = []
-        if missing_fields:
-            all_errors.append("দয়া করে নিচের তথ্যগুলো পূরণ করুন:\n" + ", ".join(missing_fields))
-        if validation_errors:
-            all_errors.extend(validation_errors)
+        records_to_save = []
+        points_to_save = []
+        for rec in fiber_records:
+            line_id = points.new_line_id()
+            points_to_save.extend(points.point_rows(line_id, rec.get("points") or []))
+            records_to_save.append({
+                "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "নাম": name,
+                "যোগাযোগ নম্বর": user_contact,
+                "পদবী": designation,
+                "কর্মস্থল": workplace,
+                "উৎস বিভাগ": rec["div"],
+                "উৎস জেলা": rec["dist"],
+                "উৎস উপজেলা": rec["upz"],
+                "উৎস ইউনিয়ন": rec["uni"],
+                "উৎস (Source Name)": rec["s_name"],
+                "উৎস কোর টাইপ": rec["s_core"],
+                "উৎস দূরত্ব (KM)": rec["s_dist"],
+                "গন্তব্য বিভাগ": rec["d_div"],
+                "গন্তব্য জেলা": rec["d_district"],
+                "গন্তব্য উপজেলা": rec["d_upz"],
+                "গন্তব্য ইউনিয়ন": rec["d_uni"],
+                "গন্তব্য (Destination Name)": rec["d_name"],
+                "গন্তব্য কোর টাইপ": rec["d_core"],
+                "গন্তব্য দূরত্ব (KM)": rec["d_dist"],
+                "ডিপেন্ডেন্সি (KM)": rec["dep_km"],
+                "পয়েন্টসমূহ": "",
+                "Line ID": line_id
+            })
+
+        # Same rules as bulk import; rows are numbered by fiber line
+        submission = validation.normalize_frame(pd.DataFrame(records_to_save), DB_COLUMNS)
+        submission.index = pd.RangeIndex(1, len(submission) + 1)
+        report = validation.errors_only(validation.validate(submission, gazetteer_key_sets=get_gazetteer_keys()))
+        all_errors = form_error_messages(report)
 
         if all_errors:
             st.error("\n\n".join(all_errors))
-        elif not officer_contact_valid:
-            st.error("❌ যোগাযোগ নম্বর সঠিক নয় (১১ ডিজিট ও শুধুমাত্র সংখ্যা হতে হবে)।")
         else:
-            submission_success = False
-            try:
-                records_to_save = []
-                for rec in fiber_records:
-                    records_to_save.append({
-                        "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "নাম": name,
-                        "যোগাযোগ নম্বর": user_contact,
-                        "পদবী": designation,
-                        "কর্মস্থল": workplace,
-                        "উৎস বিভাগ": rec["div"],
-                        "উৎস জেলা": rec["dist"],
-                        "উৎস উপজেলা": rec["upz"],
-                        "উৎস ইউনিয়ন": rec["uni"],
-                        "উৎস (Source Name)": rec["s_name"],
-                        "উৎস কোর টাইপ": rec["s_core"],
-                        "উৎস দূরত্ব (KM)": rec["s_dist"],
-                        "গন্তব্য বিভাগ": rec["d_div"],
-                        "গন্তব্য জেলা": rec["d_district"],
-                        "গন্তব্য উপজেলা": rec["d_upz"],
-                        "গন্তব্য ইউনিয়ন": rec["d_uni"],
-                        "গন্তব্য (Destination Name)": rec["d_name"],
-                        "গন্তব্য কোর টাইপ": rec["d_core"],
-                        "গন্তব্য দূরত্ব (KM)": rec["d_dist"],
-                        "ডিপেন্ডেন্সি (KM)": rec["dep_km"],
-                        "পয়েন্টসমূহ": json.dumps(rec["points"], ensure_ascii=False) if rec.get("points") else ""
-                    })
-                
-                new_record = pd.DataFrame(records_to_save)
-                
-                existing_data = conn.read(worksheet="Main List", ttl=0)
-                if existing_data is not None and not existing_data.empty:
-                    updated_df = pd.concat([existing_data, new_record], ignore_index=True)
-                else:
-                    updated_df = new_record
-                
-                expected_order = DB_COLUMNS
-                
-                final_columns = [c for c in expected_order if c in updated_df.columns] + [c for c in updated_df.columns if c not in expected_order]
-                updated_df = updated_df[final_columns]
+            # Exact copies of stored or queued lines (a double submit, a rerun)
+            # are dropped; lines with known endpoints are saved and flagged
+            status = get_mirror().query(dedup.claim, submission)
+            keep = (status != dedup.DUPLICATE).to_numpy()
+            skipped = list(status.index[~keep])
+            near = list(status.index[(status == dedup.NEAR).to_numpy()])
+            records_to_save = [rec for rec, k in zip(records_to_save, keep) if k]
+            kept_ids = {rec["Line ID"] for rec in records_to_save}
+            points_to_save = [p for p in points_to_save if p["Line ID"] in kept_ids]
 
-                conn.update(worksheet="Main List", data=updated_df)
-                submission_success = True
+            submission_success = False
+            if not records_to_save:
+                st.error(f"❌ এই তথ্য আগেই জমা দেওয়া হয়েছে (লাইন {', '.join(map(str, skipped))})।")
+            else:
+                try:
+                    # Committed to the local outbox; the flusher appends lines and points
+                    get_outbox(conn).enqueue_many({MAIN_WORKSHEET: records_to_save, POINTS_WORKSHEET: points_to_save})
+                    submission_success = True
 
-            except Exception as e:
-                st.error(f"Error during submission: {e}")
+                except Exception as e:
+                    get_mirror().query(dedup.release, submission[keep])
+                    st.error(f"Error during submission: {e}")
 
             if submission_success:
-                st.snow()
-                success_message = """
-                    <div style="position: fixed; top: 0; left: 0; width: 100%; height: 100%; background-color: rgba(0, 0, 0, 0.6); z-index: 999999; display: flex; align-items: center; justify-content: center;">
-                        <div style="background-color: #FFFFFF; padding: 40px; border-radius: 20px; border: 3px solid #006400; text-align: center; box-shadow: 0 4px 20px rgba(0,0,0,0.3); max-width: 500px; width: 90%;">
-                            <h1 style="color: #006400; font-family: 'Calibri', 'Nikosh', sans-serif; font-size: 40px; margin: 0; font-weight: 700;">✅ সফলভাবে সংরক্ষিত হয়েছে! 🎆</h1>
-                            <p style="color: #000000; font-size: 20px; margin-top: 15px; font-weight: 500;">আপনার তথ্য ডাটাবেজে জমা হয়েছে।</p>
-                        </div>
-                    </div>
-                """
-                placeholder = st.empty()
-                placeholder.markdown(success_message, unsafe_allow_html=True)
-                time.sleep(3)
-                placeholder.empty()
-                
                 # Clear all state except authentication
                 for key in list(st.session_state.keys()):
                     if key not in ['authenticated', 'user_role']:
                         del st.session_state[key]
 
-                st.markdown("<meta http-equiv='refresh' content='0'>", unsafe_allow_html=True)
+                st.session_state.submit_notice = {"saved": len(records_to_save), "skipped": skipped, "near": near}
+                st.rerun()
 
 # -----------------------------------------------------------------------------
 # 5. FUNCTION: RENDER ADMIN DASHBOARD
 # -----------------------------------------------------------------------------
+@st.cache_resource
+def get_mirror():
+    # Aggregates are kept up to date as rows are mirrored
+    return Mirror(worksheet=MAIN_WORKSHEET, hooks=[rollups.Rollups(), rollups.AreaRollups(), dedup.LineHashes()],
+                  indexes=explorer.INDEXES)
+
+@st.cache_resource
+def get_points_mirror():
+    # Same database file as the Main List mirror, so points join against it
+    return Mirror(worksheet=POINTS_WORKSHEET, columns=POINT_COLUMNS, table=points.POINTS_TABLE,
+                  indexes=[(LINE_ID_COLUMN,)])
+
+@st.cache_resource
+def get_topology():
+    # Network graph shared by all sessions; sync() only reads new rows
+    return Topology()
+
+@st.cache_data(max_entries=4)
+def build_dashboard_figures(data_version, points_version=None):
+    # Rebuilt only when the mirrored data changes
+    import plotly.express as px
+
+    mirror = get_mirror()
+    figures = {}
+
+    # Chart: Entries by Division (Source)
+    div_counts = mirror.query(rollups.counts_by, "division")
+    div_counts.columns = ["Division", "Count"]
+    figures["division"] = px.bar(div_counts, x="Division", y="Count", 
+                                 title="বিভাগ অনুযায়ী এন্ট্রি (Source Division)",
+                                 color="Count", color_continuous_scale="Greens")
+
+    # Chart: Core Type Distribution
+    core_counts = mirror.query(rollups.counts_by, "core")
+    core_counts.columns = ["Core Type", "Count"]
+    figures["core"] = px.pie(core_counts, values="Count", names="Core Type", 
+                             title="কোর টাইপ অনুপাত (Source Core Type)",
+                             hole=0.4, color_discrete_sequence=px.colors.sequential.Greens_r)
+
+    # Chart: Entries over Time
+    daily_entries = mirror.query(rollups.daily_entries)
+    if not daily_entries.empty:
+        fig_time = px.line(daily_entries, x='Date', y='Count', 
+                           title="দৈনিক এন্ট্রি (Entries per Day)",
+                           markers=True)
+        fig_time.update_layout(xaxis_title="তারিখ", yaxis_title="এন্ট্রির সংখ্যা")
+        figures["time"] = fig_time
+
+    # Chart: Top 10 Users by Submissions
+    user_counts = mirror.query(rollups.top_officers, 10)
+    fig_user = px.bar(user_counts.sort_values('Count', ascending=True), 
+                      x="Count", y="User", orientation='h',
+                      title="সর্বাধিক তথ্য প্রদানকারী (Top 10 Users)",
+                      color="Count", color_continuous_scale="Blues")
+    fig_user.update_layout(xaxis_title="এন্ট্রির সংখ্যা", yaxis_title="ব্যবহারকারী")
+    figures["users"] = fig_user
+
+    # Chart: Intermediate points (joined from the Points table)
+    per_line = mirror.query(points.points_per_line)
+    if not per_line.empty:
+        figures["points"] = px.bar(per_line, x="Points", y="Lines",
+                                   title="লাইন প্রতি পয়েন্ট সংখ্যা (Points per Line)",
+                                   color_discrete_sequence=["#006400"])
+    transitions = mirror.query(points.core_transitions)
+    if not transitions.empty:
+        matrix = transitions.pivot(index="From", columns="To", values="Count").fillna(0)
+        figures["transitions"] = px.imshow(matrix, text_auto=True, color_continuous_scale="Greens",
+                                           title="কোর টাইপ পরিবর্তন (Core Type Transitions)")
+    return figures
+
+@st.cache_data(max_entries=2)
+def validate_main_list(data_version):
+    # Full-table rule check over the mirror; cached until new rows arrive, and
+    # shared with the other workers, which see the same mirror version
+    def run():
+        frame = validation.normalize_frame(get_mirror().read_frame(), DB_COLUMNS)
+        return validation.validate(frame, gazetteer_key_sets=get_gazetteer_keys())
+    return shared_cache.get("main_list_validation", (data_version, get_bd_data()[1]), run)
+
+def render_data_quality(data_version):
+    st.markdown("### ডাটা যাচাই (Data Quality)")
+    if not st.button("পুরো Main List যাচাই করুন", key="validate_main_list"):
+        return
+    with st.spinner("যাচাই করা হচ্ছে..."):
+        report = validate_main_list(data_version)
+    if report.empty:
+        st.success("✅ কোন সমস্যা পাওয়া যায়নি।")
+        return
+    row_col, col_col, msg_col, sev_col = validation.REPORT_COLUMNS
+    n_err = validation.errors_only(report)[row_col].nunique()
+    q1, q2 = st.columns(2)
+    q1.metric("ত্রুটিযুক্ত সারি (Errors)", n_err)
+    q2.metric("সতর্কতাযুক্ত সারি (Warnings)", report.loc[report[sev_col] == validation.WARNING, row_col].nunique())
+    summary = report.groupby([sev_col, col_col, msg_col]).size().reset_index(name="Count")
+    st.dataframe(summary.sort_values("Count", ascending=False), use_container_width=True, hide_index=True)
+    st.download_button("⬇️ যাচাই রিপোর্ট (Validation report)", report.to_csv(index=False).encode("utf-8-sig"),
+                       file_name="main-list-validation.csv", mime="text/csv")
+
+@st.cache_data(max_entries=2)
+def duplicate_review(data_version):
+    mirror = get_mirror()
+    return mirror.query(dedup.totals), mirror.query(dedup.review, mirror.table)
+
+def render_duplicates(data_version):
+    st.markdown("### সম্ভাব্য ডুপ্লিকেট (Possible duplicates)")
+    totals, groups = duplicate_review(data_version)
+    d1, d2 = st.columns(2)
+    d1.metric("হুবহু পুনরাবৃত্ত সারি (Exact copies)", totals["copies"],
+              help="একই লাইনের অতিরিক্ত কপি; মোট হিসাবে এগুলোও গোনা হচ্ছে")
+    d2.metric("একই লিংকের গ্রুপ (Same-link groups)", totals["groups"],
+              help="একই উৎস ও গন্তব্য (যেকোনো দিকে) একাধিকবার জমা হয়েছে")
+    if groups.empty:
+        return
+    with st.expander(f"যাচাইয়ের তালিকা (বড় {groups['group'].max()} টি গ্রুপ)"):
+        st.dataframe(groups.rename(columns={"group": "গ্রুপ", "kind": "ধরন", "_row": "সারি (Row)"}),
+                     use_container_width=True, hide_index=True)
+        st.download_button("⬇️ ডুপ্লিকেট রিপোর্ট (Duplicates report)", groups.to_csv(index=False).encode("utf-8-sig"),
+                           file_name="main-list-duplicates.csv", mime="text/csv")
+
+@st.cache_data(max_entries=2)
+def distance_review(data_version, points_version):
+    # Whole-survey KM checks; rerun only when either table changes
+    return shared_cache.get("distance_checks", (data_version, points_version),
+                            lambda: get_mirror().query(distance_checks.scan))
+
+def render_distance_checks(data_version, points_version):
+    st.markdown("### দূরত্ব যাচাই (Distance checks)")
+    findings = distance_review(data_version, points_version)
+    counts = distance_checks.summary(findings)
+    for col, check in zip(st.columns(len(counts)), counts):
+        col.metric(distance_checks.MESSAGES[check], counts[check])
+    if findings.empty:
+        return
+    with st.expander(f"যাচাইয়ের তালিকা ({findings['_row'].nunique()} টি লাইন)"):
+        st.dataframe(findings.drop(columns="check").rename(columns={"_row": "সারি (Row)", "message": "সমস্যা",
+                                                                   "detail": "বিস্তারিত"}),
+                     use_container_width=True, hide_index=True)
+        st.download_button("⬇️ দূরত্ব রিপোর্ট (Distance report)", findings.to_csv(index=False).encode("utf-8-sig"),
+                           file_name="main-list-distance-checks.csv", mime="text/csv")
+
+def render_points_migration(conn):
+    # Rows saved before the Points worksheet still carry their points as JSON
+    if conn is None:
+        return
+    with st.expander("পুরনো পয়েন্ট স্থানান্তর (Migrate legacy points)"):
+        st.caption("'পয়েন্টসমূহ' কলামের JSON থেকে পয়েন্টগুলো 'Points' শিটে লেখা হবে। একাধিকবার চালানো নিরাপদ।")
+        if st.button("স্থানান্তর করুন (Migrate)", key="migrate_points"):
+            try:
+                with st.spinner("স্থানান্তর হচ্ছে..."):
+                    result = points.migrate(conn)
+            except Exception as e:
+                st.error(f"❌ স্থানান্তর ব্যর্থ হয়েছে: {e}")
+                return
+            st.success(f"✅ {result['lines']} টি লাইনে Line ID, {result['points']} টি পয়েন্ট স্থানান্তরিত।")
+
+def render_sheets_import(conn):
+    # Moving to the database: copy what is already in the sheets, once
+    backend = get_storage(conn)
+    if conn is None or not isinstance(backend, storage.SQLStorage):
+        return
+    with st.expander("শিট থেকে ডাটাবেজে কপি (Import sheets into database)"):
+        st.caption("নতুন (খালি) ডাটাবেজে বর্তমান 'Main List' ও 'Points' শিটের সব সারি কপি করা হবে। "
+                   "প্রথম জমা দেওয়ার আগেই একবার চালান।")
+        if st.button("কপি করুন (Import)", key="import_sheets"):
+            try:
+                with st.spinner("কপি হচ্ছে..."):
+                    copied = backend.import_from(storage.sheets_storage(conn))
+            except Exception as e:
+                st.error(f"❌ কপি ব্যর্থ হয়েছে: {e}")
+                return
+            get_mirror().sync(backend, force=True)
+            get_points_mirror().sync(backend, force=True)
+            st.success("✅ " + ", ".join(f"{ws}: {n} টি সারি" for ws, n in copied.items()))
+
+MAP_METRICS = {
+    "মোট ফাইবার (KM)": "km",
+    "লিংক সংখ্যা": "entries",
+    "প্রধান কোর টাইপ": "core",
+}
+
+@st.cache_resource
+def get_boundaries(level):
+    # Simplified polygons keyed to the gazetteer's Bangla names
+    return boundaries.keyed(level, gazetteer.load_names())
+
+@st.cache_data(max_entries=8)
+def build_coverage_map(data_version, level, metric, division):
+    # Only one aggregate row per area (and its simplified outline) reaches the browser
+    import plotly.express as px
+
+    shapes = get_boundaries(level)
+    if division:
+        districts = set(get_bd_data()[0].get(division, {}))
+        features = [f for f in shapes["features"] if f["id"].split("|")[0] in districts]
+    else:
+        features = [f for f in shapes["features"] if f["id"]]
+    if not features:
+        return None
+    totals = get_mirror().query(rollups.area_totals, level, division)
+    totals["key"] = totals["district"] + ("|" + totals["upazila"] if level == "upazila" else "")
+    areas = pd.DataFrame({"key": [f["id"] for f in features]})
+    areas = areas.merge(totals[["key", "km", "entries", "core"]], on="key", how="left")
+    areas = areas.fillna({"km": 0, "entries": 0, "core": "—"})
+    areas["name"] = areas["key"].str.split("|").str[-1]
+    areas["km"] = areas["km"].round(2)
+
+    column = MAP_METRICS[metric]
+    options = dict(geojson={"type": "FeatureCollection", "features": features}, locations="key",
+                   featureidkey="id", hover_name="name", hover_data={"key": False, "km": True, "entries": True,
+                                                                     "core": True},
+                   labels={"km": "KM", "entries": "লিংক", "core": "কোর"})
+    if column == "core":
+        fig = px.choropleth(areas, color="core", color_discrete_map={"48": "#006400", "24": "#66bb6a",
+                                                                     "12": "#c8e6c9", "—": "#eeeeee"}, **options)
+    else:
+        fig = px.choropleth(areas, color=column, color_continuous_scale="Greens", **options)
+    fig.update_geos(fitbounds="locations", visible=False)
+    fig.update_layout(height=650, margin=dict(l=0, r=0, t=30, b=0), title=metric)
+    return fig
+
+def render_coverage_map(data_version):
+    st.markdown("### কভারেজ ম্যাপ (Coverage Map)")
+    m1, m2, m3 = st.columns(3)
+    with m1:
+        level = st.radio("স্তর", ["district", "upazila"], horizontal=True, key="map_level",
+                         format_func={"district": "জেলা", "upazila": "উপজেলা"}.get)
+    with m2:
+        metric = st.selectbox("রং (Color by)", list(MAP_METRICS), key="map_metric")
+    with m3:
+        # Upazila shapes for the whole country are heavy; default to one division
+        divisions = sorted(get_bd_data()[0])
+        division = st.selectbox("বিভাগ", ([""] if level == "district" else []) + divisions, key=f"map_div_{level}",
+                                format_func=lambda d: d or "সব বিভাগ")
+    try:
+        with metrics.timer("map.build", level=level):
+            fig = build_coverage_map(data_version, level, metric, division)
+    except (boundaries.BoundaryError, gazetteer.GazetteerError) as e:
+        st.info(f"ম্যাপের সীমানা লোড করা যায়নি: {e}")
+        return
+    if fig is None:
+        st.info("ম্যাপের সীমানার সাথে এলাকার নাম মেলানো যায়নি।")
+        return
+    with metrics.timer("map.plotly_render", level=level):
+        st.plotly_chart(fig, use_container_width=True)
+
+def render_topology(mirror, points_mirror):
+    st.markdown("### নেটওয়ার্ক টপোলজি (Fiber Topology)")
+    topo = get_topology()
+    generations = tuple((m.state() or {}).get("generation", 0) for m in (mirror, points_mirror))
+    mirror.query(topo.sync, generations)
+    summary = topo.summary()
+    if not summary["links"]:
+        st.info("টপোলজি তৈরির জন্য পর্যাপ্ত তথ্য নেই।")
+        return
+
+    t1, t2, t3, t4 = st.columns(4)
+    t1.metric("নোড (Nodes)", summary["nodes"])
+    t2.metric("লিংক (Links)", summary["links"])
+    t3.metric("আলাদা নেটওয়ার্ক (Components)", summary["components"])
+    t4.metric("সিঙ্গেল পয়েন্ট অব ফেইলিউর", summary["spof"])
+
+    # Only the selected analysis is computed
+    view = st.radio("বিশ্লেষণ", ["জেলাভিত্তিক নেটওয়ার্ক", "দীর্ঘতম রুট", "কোর ক্যাপাসিটি হ্রাস",
+                                 "সিঙ্গেল পয়েন্ট অব ফেইলিউর", "সংক্ষিপ্ততম পথ"],
+                    horizontal=True, label_visibility="collapsed", key="topology_view")
+    if view == "জেলাভিত্তিক নেটওয়ার্ক":
+        st.dataframe(topo.components_by_district(), use_container_width=True, hide_index=True)
+    elif view == "দীর্ঘতম রুট":
+        st.dataframe(topo.longest_routes(20), use_container_width=True, hide_index=True)
+    elif view == "কোর ক্যাপাসিটি হ্রাস":
+        st.dataframe(topo.capacity_drops(), use_container_width=True, hide_index=True)
+    elif view == "সিঙ্গেল পয়েন্ট অব ফেইলিউর":
+        st.caption("এই নোডগুলো বিচ্ছিন্ন হলে 'Cut off nodes' সংখ্যক নোড বাকি নেটওয়ার্ক থেকে আলাদা হয়ে যাবে।")
+        st.dataframe(topo.single_points_of_failure(), use_container_width=True, hide_index=True)
+    else:
+        districts = topo.districts()
+        ends = []
+        for col, side in zip(st.columns(2), ["শুরু (From)", "শেষ (To)"]):
+            with col:
+                district = st.selectbox(f"{side} জেলা", districts, key=f"topo_dist_{side}")
+                nodes = topo.nodes_in(district)
+                ends.append(st.selectbox(f"{side} নোড", nodes, format_func=topo.label, key=f"topo_node_{side}")
+                            if nodes else None)
+        if all(ends):
+            km, path = topo.shortest_path(*ends)
+            if km is None:
+                st.warning("এই দুই নোডের মধ্যে কোন সংযোগ নেই।")
+            else:
+                st.success(f"সংক্ষিপ্ততম পথ: {km:.2f} KM, {len(path) - 1} টি লিংক")
+                st.write(" → ".join(topo.label(k) for k in path))
+
 def render_dashboard(conn):
     st.markdown("## 📊 এডমিন ড্যাশবোর্ড (Admin Statistics)")
-    
-    # 1. Fetch Data
+    mirror = get_mirror()
+
+    # 1. Fetch Data (only rows added since the last sync)
+    r1, r2, r3 = st.columns([4, 1, 1])
+    with r2:
+        refresh = st.button("Refresh Data", use_container_width=True)
+    with r3:
+        full_resync = st.button("Full Resync", use_container_width=True)
+    points_mirror = get_points_mirror()
+    source = get_storage(conn)
     with st.spinner("ডাটা লোড হচ্ছে..."):
-        df = conn.read(worksheet="Main List", ttl=0) 
-    
-    if df is None or df.empty:
+        for m in (mirror, points_mirror):
+            if full_resync:
+                m.sync(source, force=True)
+            else:
+                m.sync(source, min_interval=0 if refresh else None)
+    data_version = mirror.version()
+
+    # 2. KPIs (from the rollup tables)
+    totals = mirror.query(rollups.totals)
+    with r1:
+        sync_state = mirror.state()
+        if sync_state:
+            st.caption(f"🔄 সর্বশেষ সিঙ্ক (Last synced): {sync_state['last_synced']} · {totals['entries']} টি সারি")
+
+    if not totals["entries"]:
         st.warning("⚠️ ডাটাবেজে কোন তথ্য পাওয়া যায়নি।")
+        render_sheets_import(conn)
         return
 
-    # 2. Data Cleaning for Stats
-    # Convert numeric columns safely
-    numeric_cols = ["উৎস দূরত্ব (KM)", "গন্তব্য দূরত্ব (KM)", "ডিপেন্ডেন্সি (KM)"]
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    
-    # 3. KPIs
-    total_entries = len(df)
-    total_source_dist = df["উৎস দূরত্ব (KM)"].sum()
-    total_dest_dist = df["গন্তব্য দূরত্ব (KM)"].sum()
-    total_dependency = df["ডিপেন্ডেন্সি (KM)"].sum()
-    total_km = total_source_dist + total_dest_dist
-    unique_users = df["নাম"].nunique() if "নাম" in df.columns else 0
+    total_km = totals["src_km"] + totals["dst_km"]
 
     # KPI Cards
     k1, k2, k3, k4 = st.columns(4)
-    k1.metric("মোট এন্ট্রি", total_entries)
+    k1.metric("মোট এন্ট্রি", totals["entries"])
     k2.metric("মোট দূরত্ব (Source+Dest)", f"{total_km:.2f} KM")
-    k3.metric("মোট ডিপেন্ডেন্সি", f"{total_dependency:.2f} KM")
-    k4.metric("তথ্য প্রদানকারী", unique_users)
+    k3.metric("মোট ডিপেন্ডেন্সি", f"{totals['dep_km']:.2f} KM")
+    k4.metric("তথ্য প্রদানকারী", totals["officers"])
 
     st.markdown("---")
 
-    # 4. Graphs
+    # 3. Graphs (cache lookup and chart serialization are timed separately)
+    with metrics.timer("dashboard.figures"):
+        figures = build_dashboard_figures(data_version, points_mirror.version())
+    render_started = time.perf_counter()
     c1, c2 = st.columns(2)
-    
     with c1:
-        # Chart: Entries by Division (Source)
-        if "উৎস বিভাগ" in df.columns:
-            div_counts = df["উৎস বিভাগ"].value_counts().reset_index()
-            div_counts.columns = ["Division", "Count"]
-            fig_div = px.bar(div_counts, x="Division", y="Count", 
-                             title="বিভাগ অনুযায়ী এন্ট্রি (Source Division)",
-                             color="Count", color_continuous_scale="Greens")
-            st.plotly_chart(fig_div, use_container_width=True)
-
+        st.plotly_chart(figures["division"], use_container_width=True)
     with c2:
-        # Chart: Core Type Distribution
-        if "উৎস কোর টাইপ" in df.columns:
-            core_counts = df["উৎস কোর টাইপ"].value_counts().reset_index()
-            core_counts.columns = ["Core Type", "Count"]
-            fig_core = px.pie(core_counts, values="Count", names="Core Type", 
-                              title="কোর টাইপ অনুপাত (Source Core Type)",
-                              hole=0.4, color_discrete_sequence=px.colors.sequential.Greens_r)
-            st.plotly_chart(fig_core, use_container_width=True)
+        st.plotly_chart(figures["core"], use_container_width=True)
 
     st.markdown("---")
 
     # Additional Graphs
     c3, c4 = st.columns(2)
-
     with c3:
-        # Chart: Entries over Time
-        if "Timestamp" in df.columns:
-            df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
-            df_time = df.dropna(subset=['Timestamp'])
-            if not df_time.empty:
-                daily_entries = df_time.set_index('Timestamp').resample('D').size().reset_index(name='Count')
-                daily_entries.columns = ["Date", "Count"]
-                fig_time = px.line(daily_entries, x='Date', y='Count', 
-                                   title="দৈনিক এন্ট্রি (Entries per Day)",
-                                   markers=True)
-                fig_time.update_layout(xaxis_title="তারিখ", yaxis_title="এন্ট্রির সংখ্যা")
-                st.plotly_chart(fig_time, use_container_width=True)
-
+        if "time" in figures:
+            st.plotly_chart(figures["time"], use_container_width=True)
     with c4:
-        # Chart: Top 10 Users by Submissions
-        if "নাম" in df.columns:
-            user_counts = df["নাম"].value_counts().nlargest(10).reset_index()
-            user_counts.columns = ["User", "Count"]
-            fig_user = px.bar(user_counts.sort_values('Count', ascending=True), 
-                              x="Count", y="User", orientation='h',
-                              title="সর্বাধিক তথ্য প্রদানকারী (Top 10 Users)",
-                              color="Count", color_continuous_scale="Blues")
-            fig_user.update_layout(xaxis_title="এন্ট্রির সংখ্যা", yaxis_title="ব্যবহারকারী")
-            st.plotly_chart(fig_user, use_container_width=True)
+        st.plotly_chart(figures["users"], use_container_width=True)
+
+    if "points" in figures or "transitions" in figures:
+        c5, c6 = st.columns(2)
+        with c5:
+            if "points" in figures:
+                st.plotly_chart(figures["points"], use_container_width=True)
+        with c6:
+            if "transitions" in figures:
+                st.plotly_chart(figures["transitions"], use_container_width=True)
+    metrics.record("dashboard.plotly_render", time.perf_counter() - render_started)
 
     # Data Table Preview
     st.markdown("### সাম্প্রতিক এন্ট্রি সমূহ")
-    st.dataframe(df.tail(10))
+    st.dataframe(mirror.tail(10))
 
-    if st.button("Refresh Data"):
+    st.markdown("---")
+    render_coverage_map(data_version)
+
+    st.markdown("---")
+    render_topology(mirror, points_mirror)
+
+    st.markdown("---")
+    render_data_quality(data_version)
+    render_duplicates(data_version)
+    render_distance_checks(data_version, points_mirror.version())
+    render_points_migration(conn)
+    render_sheets_import(conn)
+
+# -----------------------------------------------------------------------------
+# 6. FUNCTION: RENDER BULK IMPORT (User & Admin both can use)
+# -----------------------------------------------------------------------------
+def render_bulk_import(conn):
+    st.markdown('<div class="section-head">একসাথে অনেক লাইন জমা (Bulk Import)</div>', unsafe_allow_html=True)
+    st.caption("CSV অথবা XLSX ফাইলের কলামগুলো টেমপ্লেটের মতো হতে হবে। পয়েন্টসমূহ কলামে JSON তালিকা দিন, যেমন "
+               '[{"name": "পয়েন্ট ১", "core": "24", "dist": 1.5}]')
+    st.download_button("⬇️ টেমপ্লেট (Template CSV)", bulk_import.template_csv(), file_name="fiber-survey-template.csv",
+                       mime="text/csv")
+
+    uploaded = st.file_uploader("ফাইল নির্বাচন করুন", type=["csv", "xlsx"], key="bulk_file")
+    if uploaded is None:
+        return
+
+    b1, b2, _ = st.columns([1, 1, 3])
+    with b1:
+        check = st.button("যাচাই করুন (Validate)", use_container_width=True)
+    with b2:
+        do_import = st.button("আমদানি করুন (Import)", use_container_width=True, type="primary")
+    if not (check or do_import):
+        return
+
+    try:
+        uploaded.seek(0)
+        with st.spinner("ফাইল যাচাই করা হচ্ছে..."):
+            result = bulk_import.run_import(uploaded, uploaded.name, get_outbox(conn) if do_import else None,
+                                            gazetteer_key_sets=get_gazetteer_keys(), mirror=get_mirror())
+    except bulk_import.BulkImportError as e:
+        st.error(f"❌ {e}")
+        return
+
+    errors = result["errors"]
+    m1, m2, m3 = st.columns(3)
+    m1.metric("মোট সারি", result["total"])
+    m2.metric("সঠিক সারি", result["valid"])
+    m3.metric("বাতিল সারি", validation.errors_only(errors)[bulk_import.ERROR_COLUMNS[0]].nunique())
+    if do_import and result["valid"]:
+        st.success(f"✅ {result['valid']} টি লাইন গ্রহণ করা হয়েছে এবং ডাটাবেজে পাঠানো হচ্ছে।")
+    if not errors.empty:
+        st.dataframe(errors, use_container_width=True, hide_index=True)
+        st.download_button("⬇️ ত্রুটির রিপোর্ট (Error report)", errors.to_csv(index=False).encode("utf-8-sig"),
+                           file_name="bulk-import-errors.csv", mime="text/csv")
+
+# -----------------------------------------------------------------------------
+# 7. DATA EXPLORER (ADMIN)
+# -----------------------------------------------------------------------------
+ALL = "-- সব --"
+
+def explorer_filters():
+    # Filter widgets; option lists come from the indexed mirror, narrowed by
+    # the geo levels chosen above them
+    mirror = get_mirror()
+    filters = []
+    geo_labels = ["বিভাগ (Division)", "জেলা (District)", "উপজেলা (Upazila)", "ইউনিয়ন (Union)"]
+    for col, label, slot in zip(explorer.GEO_COLUMNS, geo_labels, st.columns(4)):
+        options = mirror.query(explorer.distinct, mirror.table, col, filters)
+        with slot:
+            value = st.selectbox(label, [ALL] + options, key=f"explore_{col}")
+        if value == ALL:
+            break
+        filters.append((col, "=", value))
+
+    f1, f2, f3 = st.columns([1, 2, 2])
+    with f1:
+        cores = st.multiselect("কোর টাইপ", mirror.query(explorer.distinct, mirror.table, explorer.CORE_COLUMN),
+                               key="explore_core")
+    with f2:
+        officers = st.multiselect("তথ্য প্রদানকারী (Officer)",
+                                  mirror.query(explorer.distinct, mirror.table, explorer.OFFICER_COLUMN),
+                                  key="explore_officer")
+    with f3:
+        first, last = mirror.query(explorer.date_range, mirror.table)
+        days = ()
+        if first and last:
+            lo, hi = pd.to_datetime([first, last], errors="coerce")
+            if not (pd.isna(lo) or pd.isna(hi)):
+                days = st.date_input("তারিখ (Date range)", (), min_value=lo.date(), max_value=hi.date(),
+                                     key="explore_dates")
+    if cores:
+        filters.append((explorer.CORE_COLUMN, "in", cores))
+    if officers:
+        filters.append((explorer.OFFICER_COLUMN, "in", officers))
+    if len(days) >= 1:
+        filters.append((explorer.TIME_COLUMN, ">=", days[0].strftime("%Y-%m-%d")))
+    if len(days) == 2:
+        filters.append((explorer.TIME_COLUMN, "<", (days[1] + timedelta(days=1)).strftime("%Y-%m-%d")))
+
+    with st.expander("দূরত্ব (KM)"):
+        for col, slot in zip(KM_COLUMNS, st.columns(len(KM_COLUMNS))):
+            with slot:
+                low = st.number_input(f"{col} ≥", min_value=0.0, value=None, key=f"explore_min_{col}")
+                high = st.number_input(f"{col} ≤", min_value=0.0, value=None, key=f"explore_max_{col}")
+            if low is not None:
+                filters.append((col, ">=", low))
+            if high is not None:
+                filters.append((col, "<=", high))
+    return filters
+
+def render_explorer(conn):
+    st.markdown("## 🔎 ডাটা এক্সপ্লোরার (Data Explorer)")
+    mirror = get_mirror()
+    with st.spinner("ডাটা লোড হচ্ছে..."):
+        mirror.sync(get_storage(conn))
+    if not mirror.row_count():
+        st.warning("⚠️ ডাটাবেজে কোন তথ্য পাওয়া যায়নি।")
+        return
+
+    filters = explorer_filters()
+    columns = [c for c in DB_COLUMNS if c not in explorer.HIDDEN_COLUMNS]
+    s1, s2, s3 = st.columns([3, 1, 1])
+    with s1:
+        order_by = st.selectbox("সাজান (Sort by)", columns, index=columns.index(explorer.TIME_COLUMN),
+                                key="explore_sort")
+    with s2:
+        descending = st.toggle("উল্টো ক্রম (Descending)", value=True, key="explore_desc")
+    with s3:
+        page_size = st.selectbox("প্রতি পাতায়", explorer.PAGE_SIZES, index=1, key="explore_page_size")
+
+    # Back to the first page whenever the filters or the sort change
+    signature = repr((filters, order_by, descending, page_size))
+    if st.session_state.get("explore_signature") != signature:
+        st.session_state.explore_signature = signature
+        st.session_state.explore_page = 1
+
+    with metrics.timer("explorer.page"):
+        total = mirror.query(explorer.count, mirror.table, filters)
+        pages = max(1, -(-total // page_size))
+        st.session_state.explore_page = min(st.session_state.get("explore_page", 1), pages)
+        p1, p2 = st.columns([1, 4])
+        with p1:
+            current = st.number_input("পাতা (Page)", min_value=1, max_value=pages, step=1, key="explore_page")
+        with p2:
+            st.caption(f"{total} টি সারি · পাতা {current}/{pages}")
+        rows = mirror.query(explorer.page, mirror.table, filters, order_by, descending, page_size,
+                            (current - 1) * page_size)
+    st.dataframe(rows, use_container_width=True)
+    render_export(filters, total)
+
+@st.cache_resource
+def get_area_places():
+    # Upazila and district interior points for GeoJSON links
+    names = gazetteer.load_names()
+    return {**boundaries.centroids("district", names), **boundaries.centroids("upazila", names)}
+
+def export_file(mirror, fmt, filters, places):
+    # Runs when the download button is clicked; the file is written chunk by
+    # chunk on disk, then read whole for Streamlit (hence EXPORT_MAX_ROWS) and
+    # removed
+    with metrics.timer("export.write", format=fmt):
+        path = export.export(mirror, points.POINTS_TABLE, fmt, filters, places=places)
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+def render_export(filters, total):
+    st.markdown("### এক্সপোর্ট (Export)")
+    e1, e2 = st.columns([1, 3])
+    with e1:
+        fmt = st.selectbox("ফরম্যাট (Format)", list(export.FORMATS), key="export_format")
+    places = None
+    if fmt == "GeoJSON":
+        try:
+            places = get_area_places()
+        except (boundaries.BoundaryError, gazetteer.GazetteerError) as e:
+            st.info(f"এলাকার সীমানা লোড করা যায়নি, লিংকগুলোর জ্যামিতি থাকবে না: {e}")
+    too_many = bool(EXPORT_MAX_ROWS) and total > EXPORT_MAX_ROWS
+    with e2:
+        st.caption(f"উপরের ফিল্টার অনুযায়ী {total} টি সারি; পয়েন্টগুলো প্রতি লাইনের সাথে তালিকা হিসেবে থাকবে।")
+        if too_many:
+            st.warning(f"একবারে সর্বোচ্চ {EXPORT_MAX_ROWS} টি সারি এক্সপোর্ট করা যায়; ফিল্টার দিয়ে ভাগে ভাগে ডাউনলোড করুন।")
+    suffix, mime = export.FORMATS[fmt]
+    mirror = get_mirror()
+    st.download_button(f"⬇️ {fmt} ডাউনলোড", lambda: export_file(mirror, fmt, filters, places),
+                       file_name=f"main-list{suffix}", mime=mime, on_click="ignore", key="export_download",
+                       disabled=not total or too_many)
+
+# -----------------------------------------------------------------------------
+# 8. DIAGNOSTICS (ADMIN)
+# -----------------------------------------------------------------------------
+def render_diagnostics():
+    st.markdown("## ⏱️ ডায়াগনস্টিকস (Diagnostics)")
+    st.caption(f"এই প্রসেসের সাম্প্রতিক {metrics.WINDOW} টি নমুনা (প্রতি অপারেশন); "
+               f"সব নমুনা {metrics.METRICS_LOG} ফাইলে লেখা হয়।")
+    if st.button("Refresh", key="refresh_diagnostics"):
         st.rerun()
+    table = metrics.summary()
+    if table.empty:
+        st.info("এখনো কোনো টাইমিং রেকর্ড হয়নি।")
+        return
+    ops = sorted(table["Operation"].unique())
+    selected = st.multiselect("অপারেশন (Operation)", ops, key="diagnostics_ops")
+    if selected:
+        table = table[table["Operation"].isin(selected)]
+    st.dataframe(table, hide_index=True, use_container_width=True)
+    with st.expander("Prometheus"):
+        if metrics.METRICS_PORT:
+            st.caption(f"http://<server>:{metrics.METRICS_PORT}/metrics")
+        st.code(metrics.prometheus_text(), language="text")
 
 # -----------------------------------------------------------------------------
-# 6. MAIN FUNCTION (UPDATED)
+# 9. MAIN FUNCTION (UPDATED)
 # -----------------------------------------------------------------------------
 def main():
-    # Authentication Check
-    if 'authenticated' not in st.session_state:
-        st.session_state.authenticated = False
-
-    if not st.session_state.authenticated:
-        st.markdown("<br><br>", unsafe_allow_html=True)
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            with st.form("login_form"):
-                st.markdown("<h2 style='text-align: center; color: #006400;'>লগইন করুন</h2>", unsafe_allow_html=True)
-                password = st.text_input("পাসওয়ার্ড (Password)", type="password", key="auth_pass")
-                submitted = st.form_submit_button("প্রবেশ করুন (Login)", use_container_width=True)
-                if submitted:
-                    if password == 'Bccuser2026':
-                        st.session_state.authenticated = True
-                        st.session_state.user_role = 'USER'
-                        st.rerun()
-                    elif password == 'Bccadmin2026':
-                        st.session_state.authenticated = True
-                        st.session_state.user_role = 'ADMIN'
-                        st.rerun()
-                    else:
-                        st.error("❌ ভুল পাসওয়ার্ড! আবার চেষ্টা করুন।")
-        return
+    # Whole-rerun time, tagged with the role and page the rerun ended on
+    started = time.perf_counter()
+    metrics.start_server()
+    metrics.set_context(st.session_state.get("user_role") if st.session_state.get("authenticated") else None,
+                        "Login")
+    try:
+        render_app()
+    finally:
+        metrics.record("script.run", time.perf_counter() - started)
 
-    # Connect to Google Sheets
-    conn = st.connection("gsheets", type=GSheetsConnection)
+def render_app():
+    # Logged in (the login page stops the script above the imports)
+    # Connect to Google Sheets (not needed with a database and no sheet replica)
+    conn = st.connection("gsheets", type=GSheetsConnection) if storage.uses_sheets() else None
 
     # Header Image & Title
     st.markdown("""
@@ -582,8 +1166,13 @@ def main():
         # Sidebar for Admin
         with st.sidebar:
             st.markdown("### 🔐 Admin Panel")
-            nav_option = st.radio("নেভিগেশন (Navigation)", ["Dashboard", "Survey Form"])
+            nav_option = st.radio("নেভিগেশন (Navigation)", ["Dashboard", "Survey Form", "Bulk Import", "Explorer",
+                                                              "Diagnostics"])
+            metrics.set_context("ADMIN", nav_option)
             
+            st.markdown("---")
+            render_outbox_status(get_outbox(conn), detailed=True)
+
             st.markdown("---")
             if st.button("Log Out", key="logout_admin"):
                 st.session_state.authenticated = False
@@ -592,18 +1181,31 @@ def main():
 
         if nav_option == "Dashboard":
             render_dashboard(conn)
+        elif nav_option == "Bulk Import":
+            render_bulk_import(conn)
+        elif nav_option == "Explorer":
+            render_explorer(conn)
+        elif nav_option == "Diagnostics":
+            render_diagnostics()
         else:
             render_survey_form(conn)
             
     else:
         # User Logic (No Sidebar, just Form)
         with st.sidebar:
+             render_outbox_status(get_outbox(conn))
              if st.button("Log Out", key="logout_user"):
                 st.session_state.authenticated = False
                 st.session_state.user_role = None
                 st.rerun()
         
-        render_survey_form(conn)
+        entry_mode = st.radio("জমা দেওয়ার ধরন", ["Survey Form", "Bulk Import"], horizontal=True,
+                              label_visibility="collapsed", key="entry_mode")
+        metrics.set_context("USER", entry_mode)
+        if entry_mode == "Bulk Import":
+            render_bulk_import(conn)
+        else:
+            render_survey_form(conn)
 
     # Footer
     st.markdown("---")
@@ -0,0 +1 @@
+"""Data and storage helpers for the fiber core survey app."""
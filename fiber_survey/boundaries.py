@@ -0,0 +1,235 @@
+"""District and upazila polygons for the coverage map.
+
+Boundaries come from geoBoundaries (gbOpen, BGD ADM2/ADM3). They are fetched
+once, simplified (Douglas-Peucker, coordinates rounded to ~10 m) and cached
+as gzipped GeoJSON under ``DATA_DIR/boundaries``; the map only ever sends
+these small shapes plus one aggregate row per area to the browser.
+
+geoBoundaries names are English, the survey uses the Bangla names from the
+gazetteer; ``keyed`` matches them through the gazetteer's English names,
+``ALIASES`` for known spelling differences and a close-match fallback.
+"""
+import difflib
+import gzip
+import json
+import os
+import re
+import tempfile
+import time
+
+from .config import DATA_DIR
+from .gazetteer import fetch_json
+
+API = "https://www.geoboundaries.org/api/current/gbOpen/BGD/{level}/"
+LEVELS = {"district": "ADM2", "upazila": "ADM3"}
+TOLERANCE = {"district": 0.005, "upazila": 0.002}  # degrees; ~500 m / ~200 m
+PRECISION = 4
+CACHE_DIR = os.path.join(DATA_DIR, "boundaries")
+RETRY_AFTER = 600  # seconds between download attempts after a failure
+
+_failures = {}
+
+# Old and new romanizations used by the two sources
+ALIASES = {
+    "chattogram": "chittagong", "cumilla": "comilla", "barishal": "barisal", "jashore": "jessore",
+    "bogura": "bogra", "jhalokathi": "jhalokati", "maulvibazar": "moulvibazar", "netrakona": "netrokona",
+    "brahamanbaria": "brahmanbaria", "nawabganj": "chapainawabganj", "chapainababganj": "chapainawabganj",
+}
+
+
+class BoundaryError(Exception):
+    pass
+
+
+def _name_key(name):
+    key = re.sub(r"[^a-z0-9]", "", str(name).lower())
+    return ALIASES.get(key, key)
+
+
+# --- geometry ----------------------------------------------------------------
+def _simplify_line(points, tol):
+    # Iterative Douglas-Peucker; first and last points are kept
+    if len(points) < 3:
+        return points
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    tol2 = tol * tol
+    while stack:
+        start, end = stack.pop()
+        (x1, y1), (x2, y2) = points[start], points[end]
+        dx, dy = x2 - x1, y2 - y1
+        norm = dx * dx + dy * dy
+        best, index = -1.0, None
+        for i in range(start + 1, end):
+            px, py = points[i]
+            if norm:
+                t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / norm))
+                ex, ey = x1 + t * dx - px, y1 + t * dy - py
+            else:
+                ex, ey = px - x1, py - y1
+            d2 = ex * ex + ey * ey
+            if d2 > best:
+                best, index = d2, i
+        if index is not None and best > tol2:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def _simplify_polygon(rings, tol):
+    out = []
+    for ring in rings:
+        ring = [(round(x, PRECISION), round(y, PRECISION)) for x, y in (p[:2] for p in ring)]
+        ring = _simplify_line(ring, tol)
+        if len(ring) >= 4:
+            out.append([list(p) for p in ring])
+        elif not out:
+            return None  # outer ring collapsed: the polygon is smaller than tol
+    return out
+
+
+def simplify_geometry(geometry, tol):
+    if geometry["type"] == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        return None
+    polygons = [p for p in (_simplify_polygon(rings, tol) for rings in polygons) if p]
+    if not polygons:
+        return None
+    if len(polygons) == 1:
+        return {"type": "Polygon", "coordinates": polygons[0]}
+    return {"type": "MultiPolygon", "coordinates": polygons}
+
+
+def _outer_rings(geometry):
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"][0]]
+    return [p[0] for p in geometry["coordinates"]]
+
+
+def _inside(point, ring):
+    x, y = point
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _interior_point(geometry):
+    # Vertex mean of the largest outer ring; good enough for locating an
+    # upazila inside its district
+    ring = max(_outer_rings(geometry), key=len)
+    return sum(p[0] for p in ring) / len(ring), sum(p[1] for p in ring) / len(ring)
+
+
+# --- download and cache ------------------------------------------------------
+def _cache_path(level):
+    return os.path.join(CACHE_DIR, f"BGD_{LEVELS[level]}.geojson.gz")
+
+
+def _write(path, doc):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(gzip.compress(json.dumps(doc, separators=(",", ":")).encode("utf-8"), mtime=0))
+    os.replace(tmp, path)
+
+
+def fetch(level):
+    meta = fetch_json(API.format(level=LEVELS[level]))
+    url = meta.get("simplifiedGeometryGeoJSON") or meta.get("gjDownloadURL")
+    if not url:
+        raise BoundaryError(f"geoBoundaries returned no GeoJSON link for {LEVELS[level]}")
+    raw = fetch_json(url, timeout=120)
+    features = []
+    for f in raw.get("features", []):
+        geometry = simplify_geometry(f["geometry"], TOLERANCE[level]) if f.get("geometry") else None
+        if geometry:
+            features.append({"type": "Feature", "properties": {"name": f["properties"].get("shapeName", "")},
+                             "geometry": geometry})
+    if not features:
+        raise BoundaryError(f"No usable {level} polygons in {url}")
+    return {"type": "FeatureCollection", "features": features}
+
+
+def load(level):
+    # Cached simplified shapes; upazilas carry the English name of their district
+    path = _cache_path(level)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return json.loads(gzip.decompress(f.read()).decode("utf-8"))
+    # Offline servers should not retry the download on every dashboard rerun
+    failed = _failures.get(level)
+    if failed and time.time() - failed[0] < RETRY_AFTER:
+        raise BoundaryError(failed[1])
+    try:
+        doc = fetch(level)
+    except Exception as e:
+        message = str(e) if isinstance(e, BoundaryError) else f"Cannot download {level} boundaries: {e}"
+        _failures[level] = (time.time(), message)
+        raise BoundaryError(message)
+    if level == "upazila":
+        districts = [(f["properties"]["name"], _outer_rings(f["geometry"])) for f in load("district")["features"]]
+        for f in doc["features"]:
+            point = _interior_point(f["geometry"])
+            f["properties"]["district"] = next(
+                (name for name, rings in districts if any(_inside(point, r) for r in rings)), ""
+            )
+    _write(path, doc)
+    return doc
+
+
+# --- matching to gazetteer names ---------------------------------------------
+def _matcher(english_by_bangla):
+    exact = {}
+    for bangla, english in english_by_bangla.items():
+        exact.setdefault(_name_key(english), bangla)
+    keys = list(exact)
+
+    def match(name):
+        key = _name_key(name)
+        if key in exact:
+            return exact[key]
+        close = difflib.get_close_matches(key, keys, n=1, cutoff=0.85)
+        return exact[close[0]] if close else None
+    return match
+
+
+def keyed(level, names):
+    # Copy of the shapes with properties.key set to the Bangla key used by
+    # rollups.area_totals ("district" or "district|upazila"); unmatched
+    # polygons keep an empty key and are drawn without data
+    doc = load(level)
+    match_district = _matcher(names.get("districts", {}))
+    upazilas_by_district = {}
+    for key, english in names.get("upazilas", {}).items():
+        district, upazila = key.split("|", 1)
+        upazilas_by_district.setdefault(district, {})[upazila] = english
+    matchers = {d: _matcher(u) for d, u in upazilas_by_district.items()}
+
+    features = []
+    for f in doc["features"]:
+        props = f["properties"]
+        if level == "district":
+            key = match_district(props["name"]) or ""
+        else:
+            district = match_district(props.get("district", ""))
+            upazila = matchers[district](props["name"]) if district in matchers else None
+            key = f"{district}|{upazila}" if upazila else ""
+        features.append({"type": "Feature", "id": key,
+                         "properties": dict(props, key=key), "geometry": f["geometry"]})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def centroids(level, names):
+    # {key: (lon, lat)} of an interior point of every matched area
+    return {f["id"]: _interior_point(f["geometry"]) for f in keyed(level, names)["features"] if f["id"]}
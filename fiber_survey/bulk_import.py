@@ -0,0 +1,117 @@
+"""Bulk CSV/XLSX import of fiber lines.
+
+Files laid out per ``DB_COLUMNS`` are read in chunks, each chunk is checked
+with the shared rules in ``validation``, and the valid rows of a chunk are queued in
+the outbox as one batch (JSON points become rows of the "Points" worksheet). Memory use depends on the chunk size, not the file.
+Given the mirror, lines already stored or queued are rejected and lines
+sharing their endpoints with a stored one get a warning (see ``dedup``).
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from . import dedup, points, validation
+from .schema import DB_COLUMNS, KM_COLUMNS, MAIN_WORKSHEET, POINTS_WORKSHEET
+from .validation import REQUIRED_COLUMNS
+
+CHUNK_SIZE = 5000
+ERROR_COLUMNS = validation.REPORT_COLUMNS
+LINE_LABEL = "(পুরো লাইন)"
+DUPLICATE_MESSAGE = "আগেই জমা দেওয়া হয়েছে (Duplicate)"
+NEAR_MESSAGE = "একই উৎস ও গন্তব্যের লাইন আগে থেকেই আছে"
+
+
+class BulkImportError(Exception):
+    pass
+
+
+def template_csv():
+    return (",".join(DB_COLUMNS) + "\n").encode("utf-8-sig")
+
+
+def iter_chunks(file, filename, chunksize=CHUNK_SIZE):
+    name = filename.lower()
+    if name.endswith(".csv"):
+        reader = pd.read_csv(file, dtype=str, keep_default_na=False, chunksize=chunksize, encoding="utf-8-sig")
+        for chunk in reader:
+            yield chunk
+    elif name.endswith(".xlsx"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise BulkImportError("XLSX ফাইলের জন্য openpyxl প্রয়োজন (pip install openpyxl)")
+        wb = load_workbook(file, read_only=True, data_only=True)
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+        buf = []
+        for row in rows:
+            values = ["" if v is None else str(v) for v in row[:len(header)]]
+            buf.append(values + [""] * (len(header) - len(values)))
+            if len(buf) >= chunksize:
+                yield pd.DataFrame(buf, columns=header)
+                buf = []
+        if buf:
+            yield pd.DataFrame(buf, columns=header)
+        wb.close()
+    else:
+        raise BulkImportError("শুধুমাত্র CSV অথবা XLSX ফাইল গ্রহণযোগ্য")
+
+
+def validate_chunk(df, first_row, gazetteer_key_sets=None):
+    # first_row: file row number of df's first record (header is row 1)
+    df = df.rename(columns=lambda c: str(c).strip())
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise BulkImportError("ফাইলে এই কলামগুলো নেই: " + ", ".join(missing))
+    df = validation.normalize_frame(df, DB_COLUMNS)
+    df.index = pd.RangeIndex(first_row, first_row + len(df))
+    df = df[(df != "").any(axis=1)]
+
+    report = validation.validate(df, gazetteer_key_sets=gazetteer_key_sets)
+    valid = df.drop(index=validation.errors_only(report)[ERROR_COLUMNS[0]].unique())
+    for col in KM_COLUMNS:
+        valid[col] = pd.to_numeric(valid[col].replace("", "0"))
+    valid.loc[valid["Timestamp"] == "", "Timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return valid, report
+
+
+def duplicate_report(status):
+    # Report rows for the dedup status of each valid line
+    flagged = status[status != dedup.NEW]
+    return pd.DataFrame({
+        ERROR_COLUMNS[0]: flagged.index, ERROR_COLUMNS[1]: LINE_LABEL,
+        ERROR_COLUMNS[2]: flagged.map({dedup.DUPLICATE: DUPLICATE_MESSAGE, dedup.NEAR: NEAR_MESSAGE}).to_numpy(),
+        ERROR_COLUMNS[3]: flagged.map({dedup.DUPLICATE: validation.ERROR, dedup.NEAR: validation.WARNING}).to_numpy(),
+    })
+
+
+def run_import(file, filename, outbox=None, chunksize=CHUNK_SIZE, gazetteer_key_sets=None, mirror=None):
+    # Without an outbox this is a dry run that only reports problems.
+    # Rows with warnings (e.g. names outside the gazetteer) are still imported.
+    total = accepted = 0
+    reports = []
+    next_row = 2
+    for chunk in iter_chunks(file, filename, chunksize):
+        valid, errors = validate_chunk(chunk, next_row, gazetteer_key_sets)
+        next_row += len(chunk)
+        total += len(chunk)
+        if not errors.empty:
+            reports.append(errors)
+        if mirror is not None and not valid.empty:
+            # A dry run only looks; an import also registers the lines it queues
+            status = mirror.query(dedup.claim if outbox is not None else dedup.check, valid)
+            flagged = duplicate_report(status)
+            if not flagged.empty:
+                reports.append(flagged)
+            valid = valid[status != dedup.DUPLICATE]
+        accepted += len(valid)
+        if outbox is not None and not valid.empty:
+            lines, point_rows = points.split_records(valid.to_dict("records"))
+            try:
+                outbox.enqueue_many({MAIN_WORKSHEET: lines, POINTS_WORKSHEET: point_rows})
+            except Exception:
+                if mirror is not None:
+                    mirror.query(dedup.release, valid)
+                raise
+    errors = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=ERROR_COLUMNS)
+    return {"total": total, "valid": accepted, "errors": errors.sort_values(ERROR_COLUMNS[0], kind="stable")}
@@ -0,0 +1,46 @@
+"""Deployment settings, read from the environment."""
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Local state (outbox, mirrors, caches) lives here
+DATA_DIR = os.environ.get("FIBER_SURVEY_DATA_DIR", os.path.join(BASE_DIR, "local_data"))
+
+# "append" sends only new rows; "rewrite" is the old read/concat/update path
+SHEETS_WRITE_MODE = os.environ.get("FIBER_SHEETS_WRITE_MODE", "append")
+
+# Outbox flusher
+FLUSH_BATCH_SIZE = int(os.environ.get("FIBER_FLUSH_BATCH_SIZE", "500"))
+FLUSH_INTERVAL = float(os.environ.get("FIBER_FLUSH_INTERVAL", "2"))
+FLUSH_MAX_BACKOFF = float(os.environ.get("FIBER_FLUSH_MAX_BACKOFF", "300"))
+
+# "division_month" appends "Main List" rows to one worksheet per source
+# division and month (see shards); "" keeps the single worksheet
+SHEETS_SHARDING = os.environ.get("FIBER_SHEETS_SHARDING", "")
+# Shard worksheets fetched at the same time by a full read
+SHARD_READ_WORKERS = int(os.environ.get("FIBER_SHARD_READ_WORKERS", "8"))
+
+# Minimum seconds between automatic incremental syncs of the local mirror
+MIRROR_SYNC_INTERVAL = float(os.environ.get("FIBER_MIRROR_SYNC_INTERVAL", "30"))
+
+# Timing metrics: rotating JSON-lines log in DATA_DIR, and a Prometheus text
+# endpoint on this port (0 = off)
+METRICS_PORT = int(os.environ.get("FIBER_METRICS_PORT", "0"))
+METRICS_LOG_MAX_BYTES = int(os.environ.get("FIBER_METRICS_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+METRICS_LOG_BACKUPS = int(os.environ.get("FIBER_METRICS_LOG_BACKUPS", "3"))
+
+# Largest Explorer export, in rows (0 = no limit); the finished file is held
+# in memory while Streamlit sends it
+EXPORT_MAX_ROWS = int(os.environ.get("FIBER_EXPORT_MAX_ROWS", "200000"))
+
+# Where submissions are stored: "gsheets" (the worksheets themselves) or "sql"
+# (FIBER_DATABASE_URL, sqlite:///path or postgresql://...; the worksheets are
+# then kept as a replica unless FIBER_SHEETS_REPLICA=0)
+STORAGE_BACKEND = os.environ.get("FIBER_STORAGE_BACKEND", "gsheets")
+DATABASE_URL = os.environ.get("FIBER_DATABASE_URL", "sqlite:///" + os.path.join(DATA_DIR, "survey.sqlite3"))
+DB_POOL_SIZE = int(os.environ.get("FIBER_DB_POOL_SIZE", "5"))
+SHEETS_REPLICA = os.environ.get("FIBER_SHEETS_REPLICA", "1").lower() not in ("0", "false", "no", "")
+
+# Pickled gazetteer and derived tables shared by all app processes on the host
+# ("" keeps them per process)
+SHARED_CACHE_DIR = os.environ.get("FIBER_SHARED_CACHE_DIR", os.path.join(DATA_DIR, "cache"))
@@ -0,0 +1,216 @@
+"""Content hashes of fiber lines, for duplicate detection.
+
+Every line gets two keys built from normalized values (see
+``geo_index.normalize``), with core types read as numbers and distances
+rounded to the metre:
+
+* ``hash`` covers the source and destination geo, names, core types and
+  distances, in that direction. Two rows with the same hash are the same
+  report entered twice.
+* ``link`` covers only the two endpoints (geo + name), in either order. Rows
+  that share a link but not a hash describe the same physical link, e.g. a
+  reversed entry or the same link reported by another officer.
+
+``LineHashes`` is a mirror hook that keeps both keys of every stored row in an
+indexed table. ``claim`` looks a submission up there before it is queued,
+rejects exact copies and registers the rest as pending, so a resubmitted form
+is caught before the flusher has written the first copy to the sheet.
+"""
+import hashlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .geo_index import normalize
+from .schema import CORE_COLUMNS, DEST_GEO, DEST_NAME, KM_COLUMNS, SOURCE_GEO, SOURCE_NAME
+from .sqlutil import table_columns
+
+SOURCE_COLUMNS = [*SOURCE_GEO, SOURCE_NAME]
+DEST_COLUMNS = [*DEST_GEO, DEST_NAME]
+REVIEW_COLUMNS = [
+    "Timestamp", "নাম", "উৎস উপজেলা", "উৎস (Source Name)", "গন্তব্য উপজেলা", "গন্তব্য (Destination Name)",
+    "উৎস কোর টাইপ", "উৎস দূরত্ব (KM)", "গন্তব্য দূরত্ব (KM)", "Line ID",
+]
+NEW, NEAR, DUPLICATE = "new", "near", "duplicate"
+PENDING_TTL = timedelta(days=1)  # queued hashes not seen in the sheet by then are dropped
+_SEP = "\x1f"
+_BATCH = 500  # keys per IN (...) lookup
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS line_hashes (
+    hash TEXT NOT NULL,
+    link TEXT NOT NULL,
+    row INTEGER UNIQUE,   -- mirror row; NULL while the line is still in the outbox
+    added TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS line_hashes_hash ON line_hashes (hash);
+CREATE INDEX IF NOT EXISTS line_hashes_link ON line_hashes (link);
+"""
+
+
+def _norm(df, col):
+    # normalize() once per distinct value; survey columns repeat a lot
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    codes, uniques = pd.factorize(df[col].fillna("").astype(str))
+    if not len(uniques):
+        return pd.Series("", index=df.index, dtype=object)
+    values = np.array([normalize(v) for v in uniques], dtype=object)[codes]
+    return pd.Series(values, index=df.index, dtype=object)
+
+
+def _core(df, col):
+    return _norm(df, col).str.replace(r"\.0+$", "", regex=True)
+
+
+def _metres(df, col):
+    if col not in df.columns:
+        return pd.Series("0", index=df.index, dtype=object)
+    km = pd.to_numeric(df[col], errors="coerce")
+    # "inf", "1e400" and the like parse; they hash as 0 like any other bad value
+    km = km.where(np.isfinite(km) & (km.abs() < 1e12)).fillna(0)
+    return (km * 1000).round().astype("int64").astype(str).astype(object)
+
+
+def _join(parts):
+    out = parts[0]
+    for part in parts[1:]:
+        out = out + _SEP + part
+    return out
+
+
+def _digest(keys):
+    return [hashlib.blake2b(k.encode("utf-8"), digest_size=10).hexdigest() for k in keys]
+
+
+def content_keys(df):
+    # DataFrame with "hash" and "link" per row of df (survey columns, any dtype)
+    if df.empty:
+        return pd.DataFrame({"hash": [], "link": []}, index=df.index, dtype=object)
+    source = _join([_norm(df, c) for c in SOURCE_COLUMNS])
+    dest = _join([_norm(df, c) for c in DEST_COLUMNS])
+    content = _join([source, dest] + [_core(df, c) for c in CORE_COLUMNS] + [_metres(df, c) for c in KM_COLUMNS])
+    forward = (source <= dest).to_numpy()
+    link = pd.Series(np.where(forward, source + _SEP + dest, dest + _SEP + source), index=df.index, dtype=object)
+    return pd.DataFrame({"hash": _digest(content), "link": _digest(link)}, index=df.index)
+
+
+class LineHashes:
+    # Mirror hook; queued (row IS NULL) hashes survive a full resync until the
+    # sheet row shows up or PENDING_TTL passes
+    def setup(self, con):
+        con.executescript(_SCHEMA)
+
+    def reset(self, con):
+        cutoff = (datetime.now() - PENDING_TTL).strftime("%Y-%m-%d %H:%M:%S")
+        con.execute("DELETE FROM line_hashes WHERE row IS NOT NULL OR added < ?", (cutoff,))
+
+    def apply(self, con, frame):
+        if frame is None or frame.empty:
+            return
+        keys = content_keys(frame)
+        added = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        con.executemany(
+            "INSERT OR REPLACE INTO line_hashes (hash, link, row, added) VALUES (?, ?, ?, ?)",
+            [(h, link, int(row), added) for row, h, link in keys.itertuples(name=None)],
+        )
+        con.execute(
+            "DELETE FROM line_hashes WHERE row IS NULL "
+            "AND hash IN (SELECT hash FROM line_hashes WHERE row IS NOT NULL)"
+        )
+
+
+# --- submit time -------------------------------------------------------------
+def _known(con, column, values):
+    found = set()
+    values = list(dict.fromkeys(values))
+    for start in range(0, len(values), _BATCH):
+        batch = values[start:start + _BATCH]
+        found.update(r[0] for r in con.execute(
+            f"SELECT DISTINCT {column} FROM line_hashes WHERE {column} IN ({', '.join('?' * len(batch))})", batch
+        ))
+    return found
+
+
+def check(con, df):
+    # Status per row of df: DUPLICATE if the same line is stored, queued or
+    # repeated earlier in df; NEAR if only its endpoints are; otherwise NEW
+    return _status(con, content_keys(df))
+
+
+def _status(con, keys):
+    duplicate = keys["hash"].isin(_known(con, "hash", keys["hash"])) | keys["hash"].duplicated()
+    near = keys["link"].isin(_known(con, "link", keys["link"])) | keys["link"].duplicated()
+    status = pd.Series(NEW, index=keys.index, dtype=object)
+    status[near] = NEAR
+    status[duplicate] = DUPLICATE
+    return status
+
+
+def claim(con, df):
+    # check() and register the non-duplicate rows as queued in one write
+    # transaction. BEGIN IMMEDIATE takes the database's write lock before the
+    # lookup, so a double submit cannot pass twice, even through two worker
+    # processes sharing the mirror file.
+    keys = content_keys(df)
+    added = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        status = _status(con, keys)
+        con.executemany(
+            "INSERT INTO line_hashes (hash, link, row, added) VALUES (?, ?, NULL, ?)",
+            [(h, link, added) for h, link in keys[status != DUPLICATE].itertuples(index=False, name=None)],
+        )
+    except BaseException:
+        con.rollback()
+        raise
+    con.commit()
+    return status
+
+
+def release(con, df):
+    # Undoes claim() for rows that could not be queued after all
+    hashes = list(content_keys(df)["hash"])
+    with con:
+        for start in range(0, len(hashes), _BATCH):
+            batch = hashes[start:start + _BATCH]
+            con.execute(f"DELETE FROM line_hashes WHERE row IS NULL AND hash IN ({', '.join('?' * len(batch))})",
+                        batch)
+
+
+# --- admin review ------------------------------------------------------------
+def totals(con):
+    # Extra copies of identical lines, and endpoint pairs stored more than once
+    copies = con.execute(
+        "SELECT COUNT(*) - COUNT(DISTINCT hash) FROM line_hashes WHERE row IS NOT NULL"
+    ).fetchone()[0]
+    groups = con.execute(
+        "SELECT COUNT(*) FROM (SELECT link FROM line_hashes WHERE row IS NOT NULL "
+        "GROUP BY link HAVING COUNT(*) > 1)"
+    ).fetchone()[0]
+    return {"copies": copies, "groups": groups}
+
+
+def review(con, table="main_list", limit=200):
+    # Stored rows of the largest duplicate groups, one group per link; "kind"
+    # is DUPLICATE for rows whose hash repeats within the group, else NEAR
+    existing = table_columns(con, table)
+    columns = [c for c in REVIEW_COLUMNS if c in existing]
+    select = ", ".join(f'm."{c}"' for c in columns)
+    df = pd.read_sql_query(
+        f"""WITH groups AS (
+                SELECT link, COUNT(*) AS n FROM line_hashes WHERE row IS NOT NULL
+                GROUP BY link HAVING COUNT(*) > 1 ORDER BY n DESC, link LIMIT ?
+            )
+            SELECT h.link, h.hash, g.n, h.row AS _row{', ' + select if select else ''}
+            FROM groups g JOIN line_hashes h ON h.link = g.link JOIN {table} m ON m._row = h.row
+            ORDER BY g.n DESC, h.link, h.row""",
+        con, params=(limit,),
+    )
+    if df.empty:
+        return pd.DataFrame(columns=["group", "kind", "_row"] + columns)
+    df.insert(0, "group", pd.factorize(df["link"])[0] + 1)
+    repeated = df.duplicated(["link", "hash"], keep=False)
+    df.insert(1, "kind", np.where(repeated, DUPLICATE, NEAR))
+    return df.drop(columns=["link", "hash", "n"])
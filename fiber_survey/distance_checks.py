@@ -0,0 +1,182 @@
+"""Distance consistency checks over the whole mirrored survey.
+
+A line is ``উৎস দূরত্ব + গন্তব্য দূরত্ব`` KM long and each intermediate
+point's KM is its distance from the source (as in ``topology``). ``scan``
+reads the KM columns of every line and every point once and flags, with
+column operations only:
+
+* points that lie beyond the end of their line;
+* points whose distances go backwards along the sequence;
+* a dependency longer than the line itself;
+* lines of 0 KM;
+* lines whose length is an outlier for their source district, by robust
+  z-score (median and MAD), in districts with at least ``MIN_GROUP`` lines.
+
+Points come from the "Points" table; lines saved before it existed are read
+from their legacy JSON. The result is one review row per finding, with
+enough of the line to find it in the sheet.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from . import frames
+from .points import DIST, MAIN_TABLE, POINTS_TABLE, SEQ
+from .schema import (DEPENDENCY_KM, DEST_GEO, DEST_KM, DEST_NAME, LINE_ID_COLUMN, POINTS_COLUMN, SOURCE_GEO,
+                     SOURCE_KM, SOURCE_NAME)
+from .sqlutil import quote, table_columns
+
+DISTRICT_COLUMN = SOURCE_GEO[1]
+REVIEW_COLUMNS = [
+    "Timestamp", "নাম", *SOURCE_GEO[1:3], SOURCE_NAME, DEST_GEO[2], DEST_NAME,
+    SOURCE_KM, DEST_KM, DEPENDENCY_KM, LINE_ID_COLUMN,
+]
+POINT_BEYOND, POINT_ORDER, DEPENDENCY, ZERO_LENGTH, OUTLIER = (
+    "point_beyond_link", "point_order", "dependency_exceeds_link", "zero_length", "length_outlier",
+)
+MESSAGES = {
+    POINT_BEYOND: "পয়েন্টের দূরত্ব লাইনের দৈর্ঘ্যের বেশি",
+    POINT_ORDER: "পয়েন্টের দূরত্ব ক্রম অনুযায়ী কমেছে",
+    DEPENDENCY: "ডিপেন্ডেন্সি লাইনের দৈর্ঘ্যের বেশি",
+    ZERO_LENGTH: "লাইনের দৈর্ঘ্য ০ KM",
+    OUTLIER: "জেলার অন্যান্য লাইনের তুলনায় অস্বাভাবিক দৈর্ঘ্য",
+}
+CHECKS = list(MESSAGES)
+FINDING_COLUMNS = ["_row", "check", "message", "detail"]
+TOLERANCE = 0.01  # KM; entries are typed with two decimals
+MIN_GROUP = 8  # lines a district needs before its outliers are judged
+Z_LIMIT = 3.5  # |modified z-score| above this is an outlier (Iglewicz and Hoaglin)
+
+
+def _km(df, col):
+    if col not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    return frames.km(df[col], "float64").fillna(0.0)
+
+
+def _read_lines(con, table):
+    # Only what the checks use; the review columns are read for flagged rows
+    known = table_columns(con, table)
+    wanted = [c for c in (LINE_ID_COLUMN, DISTRICT_COLUMN, SOURCE_KM, DEST_KM, DEPENDENCY_KM, POINTS_COLUMN) if c in known]
+    lines = pd.read_sql_query(f"SELECT _row, {', '.join(quote(c) for c in wanted)} FROM {table}", con,
+                              index_col="_row")
+    lines["total"] = _km(lines, SOURCE_KM) + _km(lines, DEST_KM)
+    return lines
+
+
+def _read_review(con, table, rows):
+    known = table_columns(con, table)
+    review = [c for c in REVIEW_COLUMNS if c in known]
+    return pd.read_sql_query(
+        f"SELECT _row, {', '.join(quote(c) for c in review)} FROM {table} "
+        "WHERE _row IN (SELECT value FROM json_each(?))",
+        con, params=(json.dumps([int(r) for r in rows]),), index_col="_row",
+    )
+
+
+def _legacy_points(lines, stored_ids):
+    # (_row, seq, dist) from the JSON of rows whose points are not in the table
+    if POINTS_COLUMN not in lines.columns:
+        return pd.DataFrame(columns=["_row", "seq", "dist"])
+    raw = lines[POINTS_COLUMN].fillna("")
+    pending = raw[raw != ""]
+    if LINE_ID_COLUMN in lines.columns:
+        pending = pending[~lines.loc[pending.index, LINE_ID_COLUMN].isin(stored_ids)]
+    rows = []
+    for row, text in pending.items():
+        try:
+            entered = json.loads(text)
+        except ValueError:
+            continue  # reported by the PointsJson validation rule
+        if not isinstance(entered, list):
+            continue
+        for seq, p in enumerate((p for p in entered if isinstance(p, dict)), start=1):
+            rows.append((row, seq, p.get("dist")))
+    return pd.DataFrame(rows, columns=["_row", "seq", "dist"])
+
+
+def _read_points(con, points_table, lines):
+    # (_row, seq, dist) per point, from the Points table and legacy JSON
+    stored = pd.DataFrame(columns=["_row", "seq", "dist"])
+    stored_ids = set()
+    if LINE_ID_COLUMN in lines.columns and {LINE_ID_COLUMN, SEQ, DIST} <= set(table_columns(con, points_table)):
+        pts = pd.read_sql_query(
+            f"SELECT {quote(LINE_ID_COLUMN)} AS line_id, {quote(SEQ)} AS seq, {quote(DIST)} AS dist FROM {points_table}", con
+        )
+        stored_ids = set(pts["line_id"])
+        rows = pd.Series(lines.index, index=lines[LINE_ID_COLUMN])
+        rows = rows[(rows.index != "") & ~rows.index.duplicated()]
+        stored = pts.assign(_row=pts["line_id"].map(rows)).dropna(subset=["_row"])[["_row", "seq", "dist"]]
+    pts = pd.concat([stored, _legacy_points(lines, stored_ids)], ignore_index=True)
+    pts["_row"] = pts["_row"].astype("int64")
+    pts["seq"] = pd.to_numeric(pts["seq"], errors="coerce")
+    pts["dist"] = frames.km(pts["dist"], "float64")
+    return pts.dropna(subset=["dist"]).sort_values(["_row", "seq"], kind="stable")
+
+
+def _finding(rows, check, detail):
+    return pd.DataFrame({"_row": np.asarray(rows, dtype="int64"), "check": check, "message": MESSAGES[check],
+                         "detail": list(detail)})
+
+
+def _point_findings(lines, pts):
+    if pts.empty:
+        return []
+    total = pts["_row"].map(lines["total"])
+    beyond = pts[pts["dist"] > total + TOLERANCE]
+    beyond = beyond.groupby("_row")["dist"].max()
+    out = [_finding(beyond.index, POINT_BEYOND, (
+        f"{d:.2f} KM > {t:.2f} KM" for d, t in zip(beyond, lines.loc[beyond.index, "total"])))]
+    step = pts.groupby("_row")["dist"].diff()
+    backwards = pts[step < -TOLERANCE].groupby("_row")["seq"].first()
+    out.append(_finding(backwards.index, POINT_ORDER, (f"ক্রম {s:g}" for s in backwards)))
+    return out
+
+
+def _outliers(lines, min_group, z_limit):
+    # Modified z-score of line length within each source district; MAD of 0
+    # falls back to the mean absolute deviation, then the district is skipped
+    if DISTRICT_COLUMN not in lines.columns:
+        return _finding([], OUTLIER, [])
+    km = lines["total"]
+    district = lines[DISTRICT_COLUMN].fillna("")
+    groups = km.groupby(district)
+    median = groups.transform("median")
+    deviation = (km - median).abs()
+    by_district = deviation.groupby(district)
+    scale = by_district.transform("median") * 1.4826
+    scale = scale.where(scale > 0, by_district.transform("mean") * 1.2533)
+    z = (km - median) / scale.where(scale > 0)
+    judged = (groups.transform("size") >= min_group) & (district != "") & (km > 0)
+    flagged = z[judged & (z.abs() > z_limit)]
+    return _finding(flagged.index, OUTLIER, (
+        f"{k:.2f} KM (জেলার মধ্যমা {m:.2f} KM, z = {v:+.1f})"
+        for k, m, v in zip(km[flagged.index], median[flagged.index], flagged)))
+
+
+def scan(con, table=MAIN_TABLE, points_table=POINTS_TABLE, min_group=MIN_GROUP, z_limit=Z_LIMIT):
+    # One row per finding: _row, check, message, detail and REVIEW_COLUMNS,
+    # ordered by check then sheet row
+    lines = _read_lines(con, table)
+    if lines.empty:
+        review = [c for c in REVIEW_COLUMNS if c in table_columns(con, table)]
+        return pd.DataFrame(columns=FINDING_COLUMNS + review)
+    dep = _km(lines, DEPENDENCY_KM)
+    over = lines.index[(dep > lines["total"] + TOLERANCE).to_numpy()]
+    zero = lines.index[(lines["total"] <= 0).to_numpy()]
+    parts = _point_findings(lines, _read_points(con, points_table, lines)) + [
+        _finding(over, DEPENDENCY, (f"{d:.2f} KM > {t:.2f} KM" for d, t in zip(dep[over], lines.loc[over, "total"]))),
+        _finding(zero, ZERO_LENGTH, ("" for _ in zero)),
+        _outliers(lines, min_group, z_limit),
+    ]
+    findings = pd.concat([p for p in parts if len(p)] or [_finding([], OUTLIER, [])], ignore_index=True)
+    findings["order"] = findings["check"].map({c: i for i, c in enumerate(CHECKS)})
+    findings = findings.sort_values(["order", "_row"], kind="stable").drop(columns="order")
+    return findings.join(_read_review(con, table, findings["_row"].unique()), on="_row").reset_index(drop=True)
+
+
+def summary(findings):
+    # {check: number of lines flagged}, every check present
+    counts = findings.groupby("check")["_row"].nunique() if len(findings) else {}
+    return {check: int(counts.get(check, 0)) for check in CHECKS}
@@ -0,0 +1,95 @@
+"""Filtered, sorted and paginated reads of the mirrored Main List.
+
+Every function takes the mirror connection (run them through
+``Mirror.query``), builds one SQL statement and returns only what the admin
+explorer shows: the distinct values for a filter, the row count of a filter
+and one page of rows. Equality filters and the default sort use the indexes
+in ``INDEXES``, which the mirror keeps on its table.
+
+Filters are ``storage``-style ``[(column, op, value), ...]`` lists. KM
+columns compare and sort as numbers; everything else, including the
+"YYYY-MM-DD HH:MM:SS" timestamps, as text.
+"""
+import pandas as pd
+
+from .schema import KM_COLUMNS, POINTS_COLUMN, SOURCE_CORE, SOURCE_GEO
+from .sqlutil import quote, table_columns
+from .storage import normalize_filters
+
+GEO_COLUMNS = SOURCE_GEO
+CORE_COLUMN = SOURCE_CORE
+OFFICER_COLUMN = "নাম"
+TIME_COLUMN = "Timestamp"
+INDEXES = [tuple(GEO_COLUMNS), (TIME_COLUMN,), (CORE_COLUMN,), (OFFICER_COLUMN,)]
+HIDDEN_COLUMNS = [POINTS_COLUMN]  # only filled on legacy rows; see "Points" instead
+PAGE_SIZES = [25, 50, 100, 200]
+
+
+class ExplorerError(ValueError):
+    pass
+
+
+def _expr(column):
+    if column in KM_COLUMNS:
+        return f"CAST(NULLIF({quote(column)}, '') AS REAL)"
+    return quote(column)
+
+
+def where(filters, known):
+    clauses, params = [], []
+    for column, op, value in normalize_filters(filters):
+        if column not in known:
+            raise ExplorerError(f"Unknown column {column!r}")
+        numeric = column in KM_COLUMNS
+        if op == "in":
+            values = [float(v) if numeric else str(v) for v in value]
+            if not values:
+                clauses.append("1 = 0")
+                continue
+            clauses.append(f"{_expr(column)} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        else:
+            clauses.append(f"{_expr(column)} {op.upper()} ?")
+            params.append(float(value) if numeric and op != "like" else str(value))
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def distinct(con, table, column, filters=None):
+    # Sorted non-blank values of column among the rows matching filters
+    known = table_columns(con, table)
+    if column not in known:
+        return []
+    clause, params = where(filters, known)
+    clause = (clause + " AND " if clause else " WHERE ") + f"{quote(column)} != ''"
+    rows = con.execute(f"SELECT DISTINCT {quote(column)} FROM {table}{clause} ORDER BY 1", params)
+    return [r[0] for r in rows]
+
+
+def count(con, table, filters=None):
+    clause, params = where(filters, table_columns(con, table))
+    return con.execute(f"SELECT COUNT(*) FROM {table}{clause}", params).fetchone()[0]
+
+
+def date_range(con, table):
+    # (first, last) timestamp text, or (None, None) when there are none
+    if TIME_COLUMN not in table_columns(con, table):
+        return None, None
+    return con.execute(
+        f"SELECT MIN({quote(TIME_COLUMN)}), MAX({quote(TIME_COLUMN)}) FROM {table} WHERE {quote(TIME_COLUMN)} != ''"
+    ).fetchone()
+
+
+def page(con, table, filters=None, order_by=TIME_COLUMN, descending=True, limit=PAGE_SIZES[1], offset=0):
+    # One page of rows, indexed by sheet row; ties are broken by row so pages
+    # do not overlap
+    known = table_columns(con, table)
+    if order_by not in known:
+        order_by = None
+    clause, params = where(filters, known)
+    direction = "DESC" if descending else "ASC"
+    order = f"{_expr(order_by)} {direction}, _row {direction}" if order_by else f"_row {direction}"
+    shown = [c for c in known if c not in HIDDEN_COLUMNS]
+    return pd.read_sql_query(
+        f"SELECT _row, {', '.join(quote(c) for c in shown)} FROM {table}{clause} ORDER BY {order} LIMIT ? OFFSET ?",
+        con, params=params + [int(limit), int(offset)], index_col="_row",
+    )
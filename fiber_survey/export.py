@@ -0,0 +1,226 @@
+"""Chunked export of the mirrored Main List to CSV, Parquet and GeoJSON.
+
+Rows are read from the mirror ``CHUNK_SIZE`` at a time in row order (keyset
+paging, with the explorer's filters), get their intermediate points from the
+mirrored "Points" table and are appended to a file under ``EXPORT_DIR``. Only
+one chunk is in memory while the file is written; the download itself hands
+the whole file to Streamlit, so the app caps exports at ``EXPORT_MAX_ROWS``.
+
+The points column holds the line's points as a list of
+``{"seq", "name", "core", "dist"}``: JSON text in CSV, a list of structs in
+Parquet and an array property in GeoJSON. Lines still carrying legacy JSON
+points get them from there. GeoJSON links run between interior points of the
+source and destination upazilas (or districts) from ``boundaries``; links
+whose areas have no shape get a null geometry.
+"""
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from . import explorer, frames
+from .config import DATA_DIR
+from .points import CORE, DIST, NAME, SEQ, point_rows
+from .schema import DB_COLUMNS, DEST_GEO, KM_COLUMNS, LINE_ID_COLUMN, POINTS_COLUMN, SOURCE_GEO
+from .sqlutil import quote, table_columns
+
+EXPORT_DIR = os.path.join(DATA_DIR, "exports")
+CHUNK_SIZE = 20000
+MAX_AGE = 3600  # seconds an unfinished or abandoned export file is kept
+FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "GeoJSON": (".geojson", "application/geo+json"),
+}
+SOURCE_AREA = SOURCE_GEO[1:3]  # district, upazila
+DEST_AREA = DEST_GEO[1:3]
+_LOOKUP_BATCH = 500
+
+
+class ExportError(Exception):
+    pass
+
+
+# --- reading -----------------------------------------------------------------
+def _point_lists(con, points_table, line_ids):
+    # {line_id: [{"seq", "name", "core", "dist"}, ...]} from the Points table
+    out = {}
+    if not line_ids or LINE_ID_COLUMN not in table_columns(con, points_table):
+        return out
+    for start in range(0, len(line_ids), _LOOKUP_BATCH):
+        batch = line_ids[start:start + _LOOKUP_BATCH]
+        rows = con.execute(
+            f"SELECT {', '.join(quote(c) for c in (LINE_ID_COLUMN, SEQ, NAME, CORE, DIST))} FROM {points_table} "
+            f"WHERE {quote(LINE_ID_COLUMN)} IN ({', '.join('?' * len(batch))})",
+            batch,
+        )
+        for line_id, seq, name, core, dist in rows:
+            out.setdefault(line_id, []).append({"seq": seq, "name": name, "core": core, "dist": dist})
+    return out
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number == number else None
+
+
+def _clean_point(p):
+    seq, dist = _number(p["seq"]), _number(p["dist"])
+    return {"seq": None if seq is None else int(seq), "name": str(p["name"] or ""),
+            "core": str(p["core"] or ""), "dist": dist}
+
+
+def _legacy_points(line_id, raw):
+    try:
+        entered = json.loads(raw)
+    except ValueError:
+        return []
+    if not isinstance(entered, list):
+        return []
+    return [_clean_point({"seq": r[SEQ], "name": r[NAME], "core": r[CORE], "dist": r[DIST]})
+            for r in point_rows(line_id, [p for p in entered if isinstance(p, dict)])]
+
+
+def read_chunk(con, table, points_table, filters=None, after_row=0, limit=CHUNK_SIZE):
+    # Up to limit matching rows above after_row, indexed by row, with KM as
+    # numbers and the points column as lists
+    known = table_columns(con, table)
+    clause, params = explorer.where(filters, known)
+    clause = (clause + " AND " if clause else " WHERE ") + "_row > ?"
+    columns = [c for c in DB_COLUMNS if c in known] + [c for c in known if c not in DB_COLUMNS]
+    df = pd.read_sql_query(
+        f"SELECT _row, {', '.join(quote(c) for c in columns)} FROM {table}{clause} ORDER BY _row LIMIT ?",
+        con, params=params + [after_row, limit], index_col="_row",
+    )
+    for col in KM_COLUMNS:
+        if col in df.columns:
+            df[col] = frames.km(df[col], "float64")
+    ids = df[LINE_ID_COLUMN] if LINE_ID_COLUMN in df.columns else pd.Series("", index=df.index)
+    stored = _point_lists(con, points_table, [i for i in ids.unique() if i])
+    legacy = df[POINTS_COLUMN] if POINTS_COLUMN in df.columns else pd.Series("", index=df.index)
+    df[POINTS_COLUMN] = [
+        sorted((_clean_point(p) for p in stored[i]), key=lambda p: p["seq"] or 0) if i in stored
+        else _legacy_points(i, raw) if raw else []
+        for i, raw in zip(ids, legacy)
+    ]
+    return df
+
+
+def iter_chunks(mirror, points_table, filters=None, chunk_size=CHUNK_SIZE):
+    # The mirror lock is held per chunk, not for the whole export
+    after = 0
+    while True:
+        chunk = mirror.query(read_chunk, mirror.table, points_table, filters, after, chunk_size)
+        if chunk.empty:
+            return
+        yield chunk
+        after = int(chunk.index[-1])
+
+
+# --- writers -----------------------------------------------------------------
+def write_csv(chunks, path):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        header = True
+        for chunk in chunks:
+            chunk = chunk.copy()
+            chunk[POINTS_COLUMN] = [json.dumps(p, ensure_ascii=False) if p else "" for p in chunk[POINTS_COLUMN]]
+            chunk.to_csv(f, index=False, header=header)
+            header = False
+        if header:
+            f.write(",".join(DB_COLUMNS) + "\n")
+
+
+def _arrow_schema(pa, columns):
+    point = pa.struct([("seq", pa.int32()), ("name", pa.string()), ("core", pa.string()), ("dist", pa.float64())])
+    types = {col: pa.float64() for col in KM_COLUMNS}
+    types["Timestamp"] = pa.timestamp("s")
+    types[POINTS_COLUMN] = pa.list_(point)
+    return pa.schema([(col, types.get(col, pa.string())) for col in columns])
+
+
+def write_parquet(chunks, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Parquet এক্সপোর্টের জন্য pyarrow প্রয়োজন (pip install pyarrow)")
+    writer = None
+    try:
+        for chunk in chunks:
+            if "Timestamp" in chunk.columns:
+                chunk = chunk.assign(Timestamp=frames.timestamps(chunk["Timestamp"]))
+            if writer is None:
+                schema = _arrow_schema(pa, list(chunk.columns))
+                writer = pq.ParquetWriter(path, schema, compression="zstd")
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        if writer is None:
+            pq.write_table(_arrow_schema(pa, DB_COLUMNS).empty_table(), path)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _places(chunk, columns, places):
+    district, upazila = (chunk[c] if c in chunk.columns else pd.Series("", index=chunk.index) for c in columns)
+    return [places.get(f"{d}|{u}") or places.get(d) for d, u in zip(district, upazila)]
+
+
+def write_geojson(chunks, path, places=None):
+    # places: {"district" or "district|upazila": (lon, lat)}
+    places = places or {}
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        first = True
+        for chunk in chunks:
+            src, dst = _places(chunk, SOURCE_AREA, places), _places(chunk, DEST_AREA, places)
+            records = chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+            for props, a, b in zip(records, src, dst):
+                geometry = {"type": "LineString", "coordinates": [list(a), list(b)]} if a and b else None
+                feature = {"type": "Feature", "geometry": geometry, "properties": props}
+                f.write(("" if first else ",\n") + json.dumps(feature, ensure_ascii=False, default=str))
+                first = False
+        f.write("\n]}\n")
+
+
+# --- files -------------------------------------------------------------------
+def _clean_old(now=None):
+    now = now or time.time()
+    try:
+        names = os.listdir(EXPORT_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > MAX_AGE:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def export(mirror, points_table, fmt, filters=None, places=None, chunk_size=CHUNK_SIZE):
+    # Writes the export to a new file under EXPORT_DIR and returns its path;
+    # the caller removes it once it has been sent
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown export format {fmt!r}")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _clean_old()
+    fd, path = tempfile.mkstemp(dir=EXPORT_DIR, prefix="main-list-", suffix=FORMATS[fmt][0])
+    os.close(fd)
+    chunks = iter_chunks(mirror, points_table, filters, chunk_size)
+    try:
+        if fmt == "CSV":
+            write_csv(chunks, path)
+        elif fmt == "Parquet":
+            write_parquet(chunks, path)
+        else:
+            write_geojson(chunks, path, places)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
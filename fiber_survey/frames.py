@@ -0,0 +1,99 @@
+"""Typed, memory-compact frames of the "Main List".
+
+Sheets and the mirror hand back every cell as text. ``typed`` converts a
+frame column by column, following ``DB_COLUMNS``:
+
+* geo columns become categoricals with one category set per level (division,
+  district, upazila, union), shared by the source and destination column and
+  seeded from the gazetteer (``geo_categories``), so the two sides compare
+  and group on the same codes;
+* core types, officer names, designations and workplaces become categoricals
+  of the values present;
+* KM columns become float32, with NaN for blank, malformed or non-finite
+  cells;
+* "Timestamp" becomes datetime64, with NaT where it cannot be parsed;
+* free text (point names, phone numbers, Line ID, legacy points) stays text.
+
+Place names outside the gazetteer (typed under "অন্যান্য") are appended to
+their level's categories rather than lost. ``load`` reads the mirrored table
+this way; ``km`` and ``timestamps`` are also the parsers behind the distance
+checks and the exports.
+"""
+import numpy as np
+import pandas as pd
+
+from .schema import CORE_COLUMNS, DEST_GEO, KM_COLUMNS, SOURCE_GEO
+from .validation import CORE_TYPES
+
+LEVELS = ["division", "district", "upazila", "union"]
+GEO_COLUMNS = {level: [SOURCE_GEO[i], DEST_GEO[i]] for i, level in enumerate(LEVELS)}
+ENUM_COLUMNS = ["নাম", "পদবী", "কর্মস্থল"]
+TIME_COLUMN = "Timestamp"
+
+
+def geo_categories(tree):
+    # {level: sorted names} over the whole gazetteer; build once per snapshot
+    names = {level: set() for level in LEVELS}
+    for div, districts in tree.items():
+        names["division"].add(div)
+        for dist, upazilas in districts.items():
+            names["district"].add(dist)
+            for upz, unions in upazilas.items():
+                names["upazila"].add(upz)
+                names["union"].update(unions)
+    return {level: sorted(values) for level, values in names.items()}
+
+
+def _text(series):
+    return series.fillna("").astype(str)
+
+
+def categorical(columns, known=()):
+    # The given Series as categoricals over one category set: known first,
+    # then every other value present, sorted
+    texts = [_text(s) for s in columns]
+    present = set()
+    for s in texts:
+        present.update(s.unique())
+    seen = set(known)
+    dtype = pd.CategoricalDtype(list(known) + sorted(present - seen))
+    return [s.astype(dtype) for s in texts]
+
+
+def km(series, dtype="float32"):
+    # "inf" and "1e400" parse as numbers; they are as unusable as "abc"
+    values = pd.to_numeric(series, errors="coerce").astype("float64")
+    return values.where(np.isfinite(values)).astype(dtype)
+
+
+def timestamps(series):
+    # "YYYY-MM-DD HH:MM:SS" as written by the form, plain dates from imports
+    return pd.to_datetime(_text(series), format="ISO8601", errors="coerce")
+
+
+def typed(df, geo=None):
+    # df with geo and enum columns as categoricals, KM as float32 and the
+    # timestamp as datetime64; geo is geo_categories() of the gazetteer
+    geo = geo or {}
+    out = dict(df.items())
+    for level, columns in GEO_COLUMNS.items():
+        present = [c for c in columns if c in out]
+        for col, values in zip(present, categorical([out[c] for c in present], geo.get(level, ()))):
+            out[col] = values
+    present = [c for c in CORE_COLUMNS if c in out]
+    for col, values in zip(present, categorical([out[c] for c in present], CORE_TYPES)):
+        out[col] = values
+    for col in ENUM_COLUMNS:
+        if col in out:
+            out[col] = categorical([out[col]])[0]
+    for col in KM_COLUMNS:
+        if col in out:
+            out[col] = km(out[col])
+    if TIME_COLUMN in out:
+        out[TIME_COLUMN] = timestamps(out[TIME_COLUMN])
+    return pd.DataFrame(out, index=df.index)
+
+
+def load(mirror, geo=None):
+    # The whole mirrored table, typed; indexed by sheet row
+    return typed(mirror.read_frame(), geo)
@@ -0,0 +1,232 @@
+"""Offline Division -> District -> Upazila -> Union gazetteer.
+
+The app loads a prebuilt, checksummed snapshot (gzipped JSON) instead of
+pulling four JSON files from GitHub at every cold start. Rebuild it from the
+upstream sources with::
+
+    python -m fiber_survey.gazetteer refresh
+    python -m fiber_survey.gazetteer verify
+
+The parsed snapshot goes through ``shared_cache``, so the app processes on a
+host read and verify it once; replacing the snapshot file invalidates it.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from . import shared_cache
+from .config import BASE_DIR, DATA_DIR
+
+FORMAT = 1
+
+NUHIL_RAW = {
+    "divisions": "https://raw.githubusercontent.com/nuhil/bangladesh-geocode/master/divisions/divisions.json",
+    "districts": "https://raw.githubusercontent.com/nuhil/bangladesh-geocode/master/districts/districts.json",
+    "upazilas": "https://raw.githubusercontent.com/nuhil/bangladesh-geocode/master/upazilas/upazilas.json",
+    "unions": "https://raw.githubusercontent.com/nuhil/bangladesh-geocode/master/unions/unions.json",
+}
+
+# Shipped with the repo; a copy fetched at runtime is kept under DATA_DIR
+SNAPSHOT_PATH = os.path.join(BASE_DIR, "data", "gazetteer.json.gz")
+LOCAL_SNAPSHOT_PATH = os.path.join(DATA_DIR, "gazetteer.json.gz")
+FETCH_RETRY_AFTER = 300  # seconds a failed live fetch is not tried again
+
+_fetch_failed = None  # (time.monotonic(), message) of the last failed live fetch
+
+
+class GazetteerError(Exception):
+    pass
+
+
+def fetch_json(url, timeout=30, retries=3):
+    for attempt in range(retries):
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as r:
+                return json.loads(r.read().decode('utf-8'))
+        except Exception:
+            if attempt == retries - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+
+def extract_data(raw):
+    if isinstance(raw, list):
+        for item in raw:
+            if isinstance(item, dict) and 'data' in item: return item['data']
+    if isinstance(raw, dict) and 'data' in raw: return raw['data']
+    return []
+
+
+def build_tree(div_raw, dist_raw, upz_raw, uni_raw):
+    divs, dists, upzs, unis = extract_data(div_raw), extract_data(dist_raw), extract_data(upz_raw), extract_data(uni_raw)
+    div_map = {str(d['id']): d.get('bn_name') or d.get('name') for d in divs}
+    dist_map = {str(d['id']): {'bn_name': d.get('bn_name') or d.get('name'), 'division_id': str(d.get('division_id'))} for d in dists}
+    upz_map = {str(u['id']): {'bn_name': u.get('bn_name') or u.get('name'), 'district_id': str(u.get('district_id'))} for u in upzs}
+
+    uni_map = {}
+    for u in unis:
+        upid = str(u.get('upazilla_id') or u.get('upazila_id') or '')
+        uni_map.setdefault(upid, []).append(u.get('bn_name') or u.get('name'))
+
+    data_tree = {}
+    for upz_id, upz in upz_map.items():
+        dist_id = upz.get('district_id')
+        dist_entry = dist_map.get(dist_id)
+        if not dist_entry: continue
+        div_name = div_map.get(dist_entry.get('division_id'), 'অন্যান্য')
+        dist_name = dist_entry.get('bn_name')
+        upz_name = upz.get('bn_name')
+        data_tree.setdefault(div_name, {}).setdefault(dist_name, {})[upz_name] = uni_map.get(upz_id, [])
+    return data_tree
+
+
+def build_names(dist_raw, upz_raw):
+    # Bangla -> English names, used to match boundary polygons (see boundaries)
+    dists = {str(d['id']): d for d in extract_data(dist_raw)}
+    names = {"districts": {}, "upazilas": {}}
+    for d in dists.values():
+        if d.get('bn_name') and d.get('name'):
+            names["districts"][d['bn_name']] = d['name']
+    for u in extract_data(upz_raw):
+        dist = dists.get(str(u.get('district_id')))
+        if dist and u.get('bn_name') and u.get('name'):
+            names["upazilas"][f"{dist.get('bn_name')}|{u['bn_name']}"] = u['name']
+    return names
+
+
+def local_sources(directory):
+    # file:// URLs of the four files in a checkout of nuhil/bangladesh-geocode
+    return {k: pathlib.Path(directory, k, f"{k}.json").resolve().as_uri() for k in NUHIL_RAW}
+
+
+def build_from_sources(sources=NUHIL_RAW):
+    # Returns (tree, English names)
+    keys = ["divisions", "districts", "upazilas", "unions"]
+    with ThreadPoolExecutor(max_workers=len(keys)) as pool:
+        raws = list(pool.map(lambda k: fetch_json(sources[k]), keys))
+    tree = build_tree(*raws)
+    if not tree:
+        raise GazetteerError("Upstream sources returned an empty gazetteer")
+    return tree, build_names(raws[1], raws[2])
+
+
+def checksum(tree):
+    canonical = json.dumps(tree, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def write_snapshot(tree, path=SNAPSHOT_PATH, sources=NUHIL_RAW, names=None):
+    digest = checksum(tree)
+    doc = {
+        "format": FORMAT,
+        "version": f"{datetime.now():%Y%m%d}-{digest[:8]}",
+        "sha256": digest,
+        "sources": sources,
+        "tree": tree,
+        "en_names": names or {},
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(gzip.compress(json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), mtime=0))
+    os.replace(tmp, path)
+    return doc
+
+
+def read_snapshot(path=SNAPSHOT_PATH):
+    try:
+        with open(path, "rb") as f:
+            doc = json.loads(gzip.decompress(f.read()).decode("utf-8"))
+    except (OSError, ValueError) as e:
+        raise GazetteerError(f"Cannot read gazetteer snapshot {path}: {e}")
+    if doc.get("format") != FORMAT:
+        raise GazetteerError(f"Unsupported gazetteer format {doc.get('format')!r} in {path}")
+    if checksum(doc["tree"]) != doc.get("sha256"):
+        raise GazetteerError(f"Checksum mismatch in {path}")
+    return doc
+
+
+def _snapshot_version():
+    for path in (SNAPSHOT_PATH, LOCAL_SNAPSHOT_PATH):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        return path, st.st_mtime_ns, st.st_size
+    return None
+
+
+def load_document():
+    version = _snapshot_version()
+    if version is None:
+        return _load_document()  # first fetch; writes the runtime copy
+    return shared_cache.get("gazetteer", version, _load_document)
+
+
+def _load_document():
+    # Shipped snapshot, then the runtime copy, then (last resort) the network;
+    # a failed fetch is remembered so offline reruns fail fast instead of
+    # waiting out the timeouts again
+    global _fetch_failed
+    errors = []
+    for path in (SNAPSHOT_PATH, LOCAL_SNAPSHOT_PATH):
+        if os.path.exists(path):
+            try:
+                return read_snapshot(path)
+            except GazetteerError as e:
+                errors.append(str(e))
+    if _fetch_failed and time.monotonic() - _fetch_failed[0] < FETCH_RETRY_AFTER:
+        raise GazetteerError("; ".join(errors + [_fetch_failed[1]]))
+    try:
+        tree, names = build_from_sources()
+    except Exception as e:
+        _fetch_failed = (time.monotonic(), f"Live fetch failed: {e}")
+        raise GazetteerError("; ".join(errors + [_fetch_failed[1]]))
+    _fetch_failed = None
+    return write_snapshot(tree, LOCAL_SNAPSHOT_PATH, names=names)
+
+
+def load():
+    return load_document()["tree"]
+
+
+def load_names():
+    # Snapshots written before the names were added have none
+    return load_document().get("en_names") or {"districts": {}, "upazilas": {}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m fiber_survey.gazetteer")
+    sub = parser.add_subparsers(dest="command", required=True)
+    refresh = sub.add_parser("refresh", help="rebuild the snapshot from the upstream JSON files")
+    refresh.add_argument("--output", default=SNAPSHOT_PATH)
+    refresh.add_argument("--source", help="local checkout of nuhil/bangladesh-geocode instead of GitHub")
+    verify = sub.add_parser("verify", help="check a snapshot's format and checksum")
+    verify.add_argument("path", nargs="?", default=SNAPSHOT_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "refresh":
+        sources = local_sources(args.source) if args.source else NUHIL_RAW
+        tree, names = build_from_sources(sources)
+        doc = write_snapshot(tree, args.output, names=names)
+    else:
+        doc = read_snapshot(args.path)
+    tree = doc["tree"]
+    n_dist = sum(len(d) for d in tree.values())
+    n_upz = sum(len(u) for d in tree.values() for u in d.values())
+    n_uni = sum(len(x) for d in tree.values() for u in d.values() for x in u.values())
+    print(f"{doc['version']}: {len(tree)} divisions, {n_dist} districts, {n_upz} upazilas, {n_uni} unions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
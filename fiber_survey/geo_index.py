@@ -0,0 +1,113 @@
+"""Presorted option lists and union search over the gazetteer tree.
+
+``GeoIndex`` is built once per process. Every Division -> Union selectbox
+then gets a ready-made immutable tuple instead of copying and sorting the
+names on each rerun, and ``search`` finds a union (or upazila) by typing part
+of its name.
+"""
+import bisect
+import re
+import unicodedata
+
+from . import shared_cache
+
+PLACEHOLDER = '-- নির্বাচন করুন --'
+OTHER = 'অন্যান্য'
+
+_INVISIBLE = re.compile(r"[\u200b\u200c\u200d\ufeff\s]+")
+# Vowel signs, hasanta, chandrabindu/anusvara/visarga, nukta and length mark
+_DIACRITICS = re.compile(r"[\u0981-\u0983\u09bc\u09be-\u09cc\u09cd\u09d7]")
+# Letters that are commonly swapped when typing Bangla names
+_SKELETON_MAP = str.maketrans({
+    "ঈ": "ই", "ঊ": "উ", "ঐ": "এ", "ঔ": "ও", "আ": "অ",
+    "ষ": "স", "শ": "স", "ণ": "ন", "য": "জ", "ৎ": "ত",
+    "ঢ": "ড", "ধ": "দ", "ঘ": "গ", "ঝ": "জ", "ঠ": "ট", "থ": "ত", "ফ": "প", "ভ": "ব", "খ": "ক", "ছ": "চ",
+})
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFC", str(text or ""))
+    return _INVISIBLE.sub("", text).casefold()
+
+
+def skeleton(text):
+    # Spelling-insensitive key: no diacritics, aspirates and sibilants folded
+    decomposed = unicodedata.normalize("NFD", normalize(text))
+    return _DIACRITICS.sub("", decomposed).translate(_SKELETON_MAP)
+
+
+class GeoIndex:
+    def __init__(self, tree):
+        self._children = {}
+        self._options = {}
+        entries = []
+        self._add((), tree.keys())
+        for div, districts in tree.items():
+            self._add((div,), districts.keys())
+            for dist, upazilas in districts.items():
+                self._add((div, dist), upazilas.keys())
+                for upz, unions in upazilas.items():
+                    self._add((div, dist, upz), unions)
+                    entries.append((upz, (div, dist, upz)))
+                    entries.extend((uni, (div, dist, upz, uni)) for uni in unions if uni)
+        # Prefix search over normalized names, skeleton keys for the fuzzy pass
+        entries = sorted(((normalize(name), name, path) for name, path in entries), key=lambda e: (e[0], e[2]))
+        self._keys = [e[0] for e in entries]
+        self._entries = [(e[1], e[2]) for e in entries]
+        self._skeletons = [skeleton(e[1]) for e in entries]
+
+    def _add(self, path, names):
+        children = tuple(sorted(n for n in set(names) if n))
+        self._children[path] = children
+        self._options[path] = (PLACEHOLDER,) + children + (OTHER,)
+
+    def children(self, *path):
+        return self._children.get(tuple(path), ())
+
+    def options(self, *path):
+        return self._options.get(tuple(path), (PLACEHOLDER, OTHER))
+
+    def contains(self, *path):
+        path = tuple(path)
+        return path[-1] in self._children.get(path[:-1], ())
+
+    def search(self, query, limit=15):
+        key = normalize(query)
+        if not key:
+            return []
+        results, seen = [], set()
+
+        def take(i):
+            path = self._entries[i][1]
+            if path not in seen:
+                seen.add(path)
+                results.append(path)
+
+        start = bisect.bisect_left(self._keys, key)
+        for i in range(start, len(self._keys)):
+            if not self._keys[i].startswith(key) or len(results) >= limit:
+                break
+            take(i)
+        if len(results) < limit:
+            skel = skeleton(query)
+            if len(skel) >= 2:
+                hits = [i for i, s in enumerate(self._skeletons) if skel in s]
+                # Skeleton prefix matches rank above matches in the middle of a name
+                hits.sort(key=lambda i: not self._skeletons[i].startswith(skel))
+                for i in hits:
+                    if len(results) >= limit:
+                        break
+                    take(i)
+        return results
+
+
+def format_path(path):
+    return ", ".join(reversed(path))
+
+
+def for_version(tree, version):
+    # The host's index of one gazetteer version (see shared_cache); the empty
+    # tree of a failed load is never cached, so the retry's tree is picked up
+    if not tree:
+        return GeoIndex({})
+    return shared_cache.get("geo_index", version, lambda: GeoIndex(tree))
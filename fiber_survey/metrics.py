@@ -0,0 +1,173 @@
+"""Timings of the slow calls on the request path.
+
+``timer`` wraps a call (gazetteer load, sheet reads and writes, ``pd.concat``,
+figure building and rendering, a whole script rerun) and records its
+duration with the role and page of the current rerun (see ``set_context``).
+Each sample is written as one JSON line to a rotating log under ``DATA_DIR``
+and kept in a per-process window from which ``summary`` computes
+p50/p95/p99. The same numbers are served in Prometheus text format when
+``FIBER_METRICS_PORT`` is set.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+from .config import DATA_DIR, METRICS_LOG_BACKUPS, METRICS_LOG_MAX_BYTES, METRICS_PORT
+
+METRICS_LOG = os.path.join(DATA_DIR, "metrics.log")
+WINDOW = 1000  # samples kept per (name, role, page) for the percentiles
+QUANTILES = (0.5, 0.95, 0.99)
+SUMMARY_COLUMNS = ["Operation", "Role", "Page", "Count", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)"]
+
+_context = contextvars.ContextVar("metrics_context", default=None)
+_lock = threading.Lock()
+_samples = {}  # (name, role, page) -> deque of seconds
+_totals = {}   # (name, role, page) -> [count, sum] since process start
+_logger = None
+_server = None
+
+
+def set_context(role=None, page=None):
+    # Called at the top of each rerun; background threads record without tags
+    _context.set({"role": role or "", "page": page or ""})
+
+
+def _tags():
+    return _context.get() or {"role": "", "page": ""}
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("fiber_survey.metrics")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        if not logger.handlers:
+            try:
+                os.makedirs(DATA_DIR, exist_ok=True)
+                handler = RotatingFileHandler(METRICS_LOG, maxBytes=METRICS_LOG_MAX_BYTES,
+                                              backupCount=METRICS_LOG_BACKUPS, encoding="utf-8")
+            except OSError:
+                handler = logging.NullHandler()  # read-only disk: keep the in-memory numbers
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def record(name, seconds, **extra):
+    tags = _tags()
+    key = (name, tags["role"], tags["page"])
+    with _lock:
+        window = _samples.get(key)
+        if window is None:
+            window = _samples[key] = deque(maxlen=WINDOW)
+            _totals[key] = [0, 0.0]
+        window.append(seconds)
+        _totals[key][0] += 1
+        _totals[key][1] += seconds
+    line = {"ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3], "op": name,
+            "ms": round(seconds * 1000, 2), **tags, **extra}
+    _get_logger().info(json.dumps(line, ensure_ascii=False, default=str))
+
+
+class timer:
+    # with metrics.timer("sheets.read"): ...   or   @metrics.timer("figures.build")
+    def __init__(self, name, **extra):
+        self.name = name
+        self.extra = extra
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        extra = dict(self.extra, error=exc_type.__name__) if exc_type else self.extra
+        record(self.name, time.perf_counter() - self._start, **extra)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(self.name, **self.extra):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def summary():
+    # One row per (operation, role, page) over the recent window; numpy and
+    # pandas are imported here, as the login page records before loading them
+    import numpy as np
+    import pandas as pd
+
+    with _lock:
+        windows = {k: np.fromiter(v, dtype=float) for k, v in _samples.items()}
+    rows = []
+    for (name, role, page), values in sorted(windows.items()):
+        p50, p95, p99 = np.quantile(values, QUANTILES) * 1000
+        rows.append([name, role, page, len(values), p50, p95, p99, values.max() * 1000])
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS).round(1)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    import numpy as np
+
+    with _lock:
+        windows = {k: np.fromiter(v, dtype=float) for k, v in _samples.items()}
+        totals = {k: list(v) for k, v in _totals.items()}
+    out = [
+        "# HELP fiber_survey_duration_seconds Duration of instrumented calls.",
+        "# TYPE fiber_survey_duration_seconds summary",
+    ]
+    for key, values in sorted(windows.items()):
+        labels = 'op="{}",role="{}",page="{}"'.format(*(_label(v) for v in key))
+        for q, v in zip(QUANTILES, np.quantile(values, QUANTILES)):
+            out.append(f'fiber_survey_duration_seconds{{{labels},quantile="{q}"}} {v:.6f}')
+        count, total = totals[key]
+        out.append(f"fiber_survey_duration_seconds_sum{{{labels}}} {total:.6f}")
+        out.append(f"fiber_survey_duration_seconds_count{{{labels}}} {count}")
+    return "\n".join(out) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=METRICS_PORT):
+    # Idempotent; port 0 (the default) disables the endpoint. With several
+    # app processes only the first one to bind the port serves it.
+    global _server
+    if not port:
+        return None
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+            except OSError:
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-endpoint", daemon=True).start()
+    return _server
@@ -0,0 +1,419 @@
+"""Local SQLite mirror of a survey worksheet.
+
+``Mirror.sync`` fetches only the rows below the last mirrored one. The fetch
+starts one row early (the "anchor") and, if that row no longer matches what
+was stored, the sheet has been edited above the tail and a full resync runs
+instead. Rows are stored as text under their sheet row number. When the
+survey is stored in a database (``storage.SQLStorage``) the mirror reads
+rows by id from there instead.
+
+Hooks (e.g. ``rollups.Rollups``) see every batch of new rows inside the same
+transaction that stores them, and are rebuilt from the table on a full resync.
+``indexes`` lists column tuples to index on the table; they are created after
+the rows of a full sync are in.
+
+A sharded "Main List" (``storage.ShardedSheetsStorage``) is synced shard by
+shard the same way, every shard's new rows fetched in one batch request, and
+stored under ``shards`` row numbers.
+
+All app processes on a host share the database file. A sync holds a file lock
+next to it, so two workers never apply the same rows (and hooks) twice, and
+the sync interval is measured from the last sync by any of them.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from . import metrics, shards, sheets, storage
+from .shared_cache import FileLock
+from .config import DATA_DIR, MIRROR_SYNC_INTERVAL
+from .schema import DB_COLUMNS, MAIN_WORKSHEET
+from .sqlutil import quote, table_columns
+
+MIRROR_PATH = os.path.join(DATA_DIR, "mirror.sqlite3")
+MMAP_SIZE = 256 * 1024 * 1024
+
+_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    worksheet TEXT PRIMARY KEY,
+    header TEXT NOT NULL,
+    synced_rows INTEGER NOT NULL,
+    anchor TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    last_synced TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shard_state (
+    worksheet TEXT NOT NULL,
+    shard TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    header TEXT NOT NULL,
+    synced_rows INTEGER NOT NULL,
+    anchor TEXT NOT NULL,
+    PRIMARY KEY (worksheet, shard)
+);
+CREATE TABLE IF NOT EXISTS hook_state (
+    name TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+);
+"""
+
+
+def _trim(row):
+    row = [str(v) for v in row]
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def _col_letter(n):
+    letters = ""
+    while n:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _timestamp(state):
+    try:
+        return datetime.strptime(state["last_synced"], "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return 0.0
+
+
+class SyncResult:
+    def __init__(self, new_rows, full):
+        self.new_rows = new_rows  # DataFrame of the rows added by this sync
+        self.full = full
+
+
+class Mirror:
+    def __init__(self, path=MIRROR_PATH, worksheet=MAIN_WORKSHEET, columns=DB_COLUMNS, table="main_list",
+                 hooks=(), indexes=()):
+        self.path = path
+        self.worksheet = worksheet
+        self.columns = list(columns)
+        self.table = table
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._con = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute(f"PRAGMA mmap_size={MMAP_SIZE}")  # pages shared with the other workers
+        self._con.executescript(_STATE_SCHEMA)
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(path + ".lock")
+        self._last_attempt = 0.0
+        self._ensure_table(self.columns)
+        self.indexes = [tuple(cols) for cols in indexes]
+        with self._con:
+            self._ensure_indexes()
+        self.hooks = list(hooks)
+        with self._file_lock:
+            for hook in self.hooks:
+                hook.setup(self._con)
+            self._catch_up_hooks()
+
+    # --- storage -------------------------------------------------------------
+    def _ensure_table(self, header):
+        cols = ", ".join(f"{quote(c)} TEXT" for c in header)
+        self._con.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (_row INTEGER PRIMARY KEY, {cols})")
+        existing = set(table_columns(self._con, self.table))
+        for c in header:
+            if c not in existing:
+                self._con.execute(f"ALTER TABLE {self.table} ADD COLUMN {quote(c)} TEXT")
+
+    def _ensure_indexes(self):
+        existing = set(table_columns(self._con, self.table))
+        for cols in self.indexes:
+            if all(c in existing for c in cols):
+                name = quote(f"{self.table}:{'|'.join(cols)}")
+                self._con.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {self.table} ({', '.join(map(quote, cols))})")
+
+    def state(self):
+        with self._lock:
+            row = self._con.execute(
+                "SELECT header, synced_rows, anchor, generation, last_synced FROM sync_state WHERE worksheet = ?",
+                (self.worksheet,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "header": json.loads(row[0]), "synced_rows": row[1], "anchor": json.loads(row[2]),
+            "generation": row[3], "last_synced": row[4],
+        }
+
+    def version(self):
+        state = self.state()
+        return f"{state['generation']}:{state['synced_rows']}" if state else "0:0"
+
+    def _catch_up_hooks(self):
+        # A hook added after the mirror was built starts from the stored rows
+        state = self.state()
+        generation = state["generation"] if state else 0
+        stale = [h for h in self.hooks if self._hook_generation(h) != generation]
+        if stale:
+            frame = self.read_frame()
+            with self._con:
+                self._run_hooks(frame, True, generation, stale)
+
+    def _hook_generation(self, hook):
+        row = self._con.execute("SELECT generation FROM hook_state WHERE name = ?", (type(hook).__name__,)).fetchone()
+        return row[0] if row else None
+
+    def _run_hooks(self, frame, full, generation, hooks=None):
+        for hook in self.hooks if hooks is None else hooks:
+            if full:
+                hook.reset(self._con)
+                self._con.execute(
+                    "INSERT OR REPLACE INTO hook_state (name, generation) VALUES (?, ?)",
+                    (type(hook).__name__, generation),
+                )
+            hook.apply(self._con, frame)
+
+    def _save_state(self, header, synced_rows, anchor, generation):
+        self._con.execute(
+            """INSERT OR REPLACE INTO sync_state (worksheet, header, synced_rows, anchor, generation, last_synced)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (self.worksheet, json.dumps(header, ensure_ascii=False), synced_rows,
+             json.dumps(anchor, ensure_ascii=False), generation, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+
+    def _insert(self, header, numbered_rows):
+        # numbered_rows: [(sheet_row, [values...]), ...]; blank rows are skipped
+        width = len(header)
+        params = []
+        for row_no, values in numbered_rows:
+            values = list(values)[:width]
+            if not any(str(v).strip() for v in values):
+                continue
+            params.append([row_no] + values + [""] * (width - len(values)))
+        if params:
+            cols = ", ".join(["_row"] + [quote(c) for c in header])
+            marks = ", ".join("?" * (width + 1))
+            self._con.executemany(f"INSERT OR REPLACE INTO {self.table} ({cols}) VALUES ({marks})", params)
+        return pd.DataFrame([p[1:] for p in params], columns=header, index=[p[0] for p in params])
+
+    # --- sync ----------------------------------------------------------------
+    def sync(self, conn, force=False, min_interval=None):
+        if min_interval is None:
+            min_interval = MIRROR_SYNC_INTERVAL
+        with self._lock, self._file_lock:
+            state = self.state()
+            if not force and state and time.time() - max(self._last_attempt, _timestamp(state)) < min_interval:
+                return SyncResult(pd.DataFrame(columns=state["header"]), False)
+            self._last_attempt = time.time()
+            with metrics.timer("mirror.sync", worksheet=self.worksheet):
+                if isinstance(conn, storage.SQLStorage):
+                    return self._sync_from_sql(conn, state, force)
+                if isinstance(conn, storage.ShardedSheetsStorage) and conn.sharded(self.worksheet):
+                    return self._sync_from_shards(conn, state, force)
+                if isinstance(conn, storage.SheetsStorage):
+                    conn = conn.conn
+                try:
+                    ws = sheets.get_worksheet(conn, self.worksheet, create=True)
+                except RuntimeError:
+                    # Public sheet: no ranged reads, mirror the whole frame
+                    with metrics.timer("sheets.read", worksheet=self.worksheet):
+                        df = conn.read(worksheet=self.worksheet, ttl=0)
+                    return self._replace_from_frame(df, state)
+                if force or state is None:
+                    return self._full_sync(ws, state)
+
+                anchor_row = state["synced_rows"] + 1
+                width = max(getattr(ws, "col_count", 0) or 0, len(state["header"]), 1)
+                with metrics.timer("sheets.read", worksheet=self.worksheet):
+                    fetched = ws.get(f"A{anchor_row}:{_col_letter(width)}")
+                if not fetched or _trim(fetched[0]) != state["anchor"]:
+                    return self._full_sync(ws, state)
+                new = fetched[1:]
+                if any(len(_trim(r)) > len(state["header"]) for r in new):
+                    # Columns were added to the sheet; pick up the new header
+                    return self._full_sync(ws, state)
+                with self._con:
+                    frame = self._insert(state["header"], [(anchor_row + 1 + i, r) for i, r in enumerate(new)])
+                    anchor = _trim(new[-1]) if new else state["anchor"]
+                    self._save_state(state["header"], state["synced_rows"] + len(new), anchor, state["generation"])
+                    self._run_hooks(frame, False, state["generation"])
+                return SyncResult(frame, False)
+
+    def _full_sync(self, ws, state):
+        with metrics.timer("sheets.read", worksheet=self.worksheet, full=True):
+            values = ws.get_all_values()
+        header = _trim(values[0]) if values else list(self.columns)
+        rows = values[1:]
+        generation = (state["generation"] + 1) if state else 1
+        with self._con:
+            self._con.execute(f"DROP TABLE IF EXISTS {self.table}")
+            self._ensure_table(header)
+            frame = self._insert(header, [(2 + i, r) for i, r in enumerate(rows)])
+            self._ensure_indexes()
+            anchor = _trim(rows[-1]) if rows else header
+            self._save_state(header, len(rows), anchor, generation)
+            self._run_hooks(frame, True, generation)
+        return SyncResult(frame, True)
+
+    def _sync_from_sql(self, source, state, force):
+        # Database rows are append-only with increasing ids, so "synced_rows"
+        # is the last id seen and no anchor check is needed; the anchor
+        # records the source so switching backends forces a full sync
+        header = source.columns(self.worksheet)
+        anchor = ["sql", source.url]
+        full = (force or state is None or state["anchor"] != anchor or state["header"] != header
+                or source.last_row(self.worksheet) < state["synced_rows"])
+        after = 0 if full else state["synced_rows"]
+        rows = source.read_since(self.worksheet, after)
+        generation = (state["generation"] + 1) if full and state else (state["generation"] if state else 1)
+        with self._con:
+            if full:
+                self._con.execute(f"DROP TABLE IF EXISTS {self.table}")
+                self._ensure_table(header)
+            frame = self._insert(header, zip(rows.index, rows.itertuples(index=False, name=None)))
+            if full:
+                self._ensure_indexes()
+            synced = int(rows.index.max()) if len(rows) else after
+            self._save_state(header, synced, anchor, generation)
+            self._run_hooks(frame, full, generation)
+        return SyncResult(frame, full)
+
+    def _shard_state(self):
+        rows = self._con.execute(
+            "SELECT shard, number, header, synced_rows, anchor FROM shard_state WHERE worksheet = ?",
+            (self.worksheet,),
+        ).fetchall()
+        return {r[0]: {"number": r[1], "header": json.loads(r[2]), "synced_rows": r[3], "anchor": json.loads(r[4])}
+                for r in rows}
+
+    def _save_shard(self, title, number, header, synced_rows, anchor):
+        self._con.execute(
+            """INSERT OR REPLACE INTO shard_state (worksheet, shard, number, header, synced_rows, anchor)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (self.worksheet, title, number, json.dumps(header, ensure_ascii=False), synced_rows,
+             json.dumps(anchor, ensure_ascii=False)),
+        )
+
+    def _shard_rows(self, header, shard_header, first_row, number, rows):
+        # Rows of one shard in the table's column order, under global numbers
+        pos = [shard_header.index(c) if c in shard_header else None for c in header]
+        base = number * shards.SHARD_ROWS + first_row
+        return [(base + i, [r[p] if p is not None and p < len(r) else "" for p in pos]) for i, r in enumerate(rows)]
+
+    def _sync_from_shards(self, source, state, force):
+        # Each shard is checked at its anchor row like a worksheet of its own;
+        # an edited or removed shard, or one with new columns, means a full
+        # sync. New shards are numbered after the known ones, so row numbers
+        # stay put until the next full sync renumbers them in shard order.
+        spreadsheet = sheets.get_spreadsheet(source.conn)
+        listed = shards.list_shards(spreadsheet, self.worksheet)
+        known = self._shard_state()
+        anchor = ["shards"]
+        if (force or state is None or state["anchor"] != anchor
+                or set(known) - {s.title for s in listed}):
+            return self._full_sync_shards(listed, state)
+        fetched = shards.batch_tails(spreadsheet, [
+            (s, known[s.title]["synced_rows"] + 1 if s.title in known else 1) for s in listed
+        ])
+        header = state["header"]
+        next_number = max([k["number"] for k in known.values()] + [0]) + 1
+        updates, numbered = [], []
+        for shard in listed:
+            values = fetched.get(shard.title, [])
+            seen = known.get(shard.title)
+            if seen is None:
+                shard_header = shards.header(values)
+                if not shard_header:
+                    continue  # created, header not written yet
+                if any(c not in header for c in shard_header):
+                    return self._full_sync_shards(listed, state)
+                number, first_row, synced = next_number, 2, 0
+                next_number += 1
+            else:
+                if not values or _trim(values[0]) != seen["anchor"]:
+                    return self._full_sync_shards(listed, state)
+                shard_header, number = seen["header"], seen["number"]
+                synced = seen["synced_rows"]
+                first_row = synced + 2
+            new = values[1:]
+            if any(len(_trim(r)) > len(shard_header) for r in new):
+                return self._full_sync_shards(listed, state)
+            if seen is not None and not new:
+                continue
+            numbered += self._shard_rows(header, shard_header, first_row, number, new)
+            updates.append((shard.title, number, shard_header, synced + len(new),
+                            _trim(new[-1]) if new else shard_header))
+        with self._con:
+            frame = self._insert(header, numbered)
+            for update in updates:
+                self._save_shard(*update)
+            added = sum(u[3] for u in updates) - sum(known[u[0]]["synced_rows"] for u in updates if u[0] in known)
+            self._save_state(header, state["synced_rows"] + added, anchor, state["generation"])
+            self._run_hooks(frame, False, state["generation"])
+        return SyncResult(frame, False)
+
+    def _full_sync_shards(self, listed, state):
+        values = shards.fetch(listed)
+        header = []
+        for shard in listed:
+            header += [c for c in shards.header(values[shard.title]) if c not in header]
+        header = header or list(self.columns)
+        numbers = shards.numbers(listed)
+        generation = (state["generation"] + 1) if state else 1
+        with self._con:
+            self._con.execute(f"DROP TABLE IF EXISTS {self.table}")
+            self._con.execute("DELETE FROM shard_state WHERE worksheet = ?", (self.worksheet,))
+            self._ensure_table(header)
+            numbered, total = [], 0
+            for shard in listed:
+                shard_values = values[shard.title]
+                shard_header = shards.header(shard_values)
+                if not shard_header:
+                    continue
+                rows = shard_values[1:]
+                numbered += self._shard_rows(header, shard_header, 2, numbers[shard.title], rows)
+                self._save_shard(shard.title, numbers[shard.title], shard_header, len(rows),
+                                 _trim(rows[-1]) if rows else shard_header)
+                total += len(rows)
+            frame = self._insert(header, numbered)
+            self._ensure_indexes()
+            self._save_state(header, total, ["shards"], generation)
+            self._run_hooks(frame, True, generation)
+        return SyncResult(frame, True)
+
+    def _replace_from_frame(self, df, state):
+        df = df if df is not None else pd.DataFrame(columns=self.columns)
+        df = df.dropna(how="all").fillna("").astype(str)
+        header = [str(c) for c in df.columns] or list(self.columns)
+        generation = (state["generation"] + 1) if state else 1
+        with self._con:
+            self._con.execute(f"DROP TABLE IF EXISTS {self.table}")
+            self._ensure_table(header)
+            frame = self._insert(header, [(2 + i, r) for i, r in enumerate(df.itertuples(index=False, name=None))])
+            self._ensure_indexes()
+            self._save_state(header, len(df), _trim(df.iloc[-1]) if len(df) else header, generation)
+            self._run_hooks(frame, True, generation)
+        return SyncResult(frame, True)
+
+    # --- reads ---------------------------------------------------------------
+    def read_frame(self):
+        with self._lock:
+            df = pd.read_sql_query(f"SELECT * FROM {self.table} ORDER BY _row", self._con, index_col="_row")
+        return df
+
+    def tail(self, n=10):
+        with self._lock:
+            df = pd.read_sql_query(
+                f"SELECT * FROM (SELECT * FROM {self.table} ORDER BY _row DESC LIMIT ?) ORDER BY _row",
+                self._con, params=(n,), index_col="_row",
+            )
+        return df
+
+    def query(self, fn, *args, **kwargs):
+        # Runs fn(connection, ...) against the mirror database
+        with self._lock:
+            return fn(self._con, *args, **kwargs)
+
+    def row_count(self):
+        with self._lock:
+            return self._con.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
@@ -0,0 +1,212 @@
+"""Durable local outbox for survey submissions.
+
+The submit button only commits rows to a local SQLite file (WAL, fsync on
+commit), which takes milliseconds. A background ``Flusher`` thread drains the
+outbox to the configured storage (Google Sheets or a database, see
+``storage``) in batches and backs off when it is slow or over quota, so a
+Sheets error no longer loses an officer's entry.
+
+Rows move ``pending`` -> ``sending`` -> ``flushed``. A ``sending`` claim that
+is older than ``CLAIM_TIMEOUT`` is picked up again, so several app processes
+can share one outbox file without sending the same rows twice.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from . import metrics
+from .config import DATA_DIR, FLUSH_BATCH_SIZE, FLUSH_INTERVAL, FLUSH_MAX_BACKOFF
+from .schema import DB_COLUMNS, MAIN_WORKSHEET, WORKSHEET_COLUMNS
+
+OUTBOX_PATH = os.path.join(DATA_DIR, "outbox.sqlite3")
+CLAIM_TIMEOUT = 300  # seconds
+KEEP_FLUSHED_DAYS = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id TEXT NOT NULL,
+    worksheet TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    claim TEXT,
+    claimed_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    flushed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, id);
+"""
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Outbox:
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._con = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA synchronous=FULL")
+        self._con.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.flush_requested = threading.Event()  # "Flush now"; also cuts a backoff short
+
+    def enqueue(self, records, worksheet=MAIN_WORKSHEET):
+        return self.enqueue_many({worksheet: records})
+
+    def enqueue_many(self, batches):
+        # batches: {worksheet: records}; committed together, e.g. lines + points
+        batch_id = uuid.uuid4().hex
+        created_at = _now()
+        rows = [
+            (batch_id, worksheet, json.dumps(r, ensure_ascii=False, default=str), created_at)
+            for worksheet, records in batches.items() for r in records
+        ]
+        with metrics.timer("outbox.enqueue", rows=len(rows)), self._lock, self._con:
+            self._con.executemany(
+                "INSERT INTO outbox (batch_id, worksheet, payload, created_at) VALUES (?, ?, ?, ?)", rows
+            )
+        self.wakeup.set()
+        return batch_id
+
+    def flush_now(self):
+        self.flush_requested.set()
+        self.wakeup.set()
+
+    def claim(self, limit=FLUSH_BATCH_SIZE):
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._con:
+            self._con.execute(
+                """UPDATE outbox SET status = 'sending', claim = ?, claimed_at = ?
+                   WHERE id IN (
+                       SELECT id FROM outbox
+                       WHERE status = 'pending' OR (status = 'sending' AND claimed_at < ?)
+                       ORDER BY id LIMIT ?)""",
+                (token, now, now - CLAIM_TIMEOUT, limit),
+            )
+            rows = self._con.execute(
+                "SELECT id, worksheet, payload FROM outbox WHERE claim = ? ORDER BY id", (token,)
+            ).fetchall()
+        return rows
+
+    def mark_flushed(self, ids):
+        with self._lock, self._con:
+            self._con.executemany(
+                "UPDATE outbox SET status = 'flushed', flushed_at = ?, claim = NULL WHERE id = ?",
+                [(_now(), i) for i in ids],
+            )
+
+    def release(self, ids, error):
+        with self._lock, self._con:
+            self._con.executemany(
+                """UPDATE outbox SET status = 'pending', claim = NULL, attempts = attempts + 1, last_error = ?
+                   WHERE id = ?""",
+                [(str(error)[:500], i) for i in ids],
+            )
+
+    def prune(self, days=KEEP_FLUSHED_DAYS):
+        cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock, self._con:
+            self._con.execute("DELETE FROM outbox WHERE status = 'flushed' AND flushed_at < ?", (cutoff,))
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._con.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+            oldest, retrying = self._con.execute(
+                "SELECT MIN(created_at), SUM(attempts > 0) FROM outbox WHERE status != 'flushed'"
+            ).fetchone()
+            last_error = self._con.execute(
+                "SELECT last_error FROM outbox WHERE status != 'flushed' AND last_error IS NOT NULL "
+                "ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+            last_flush = self._con.execute("SELECT MAX(flushed_at) FROM outbox").fetchone()[0]
+        return {
+            "pending": counts.get("pending", 0) + counts.get("sending", 0),
+            "flushed": counts.get("flushed", 0),
+            "retrying": retrying or 0,
+            "oldest_pending": oldest,
+            "last_flush": last_flush,
+            "last_error": last_error[0] if last_error else None,
+        }
+
+
+class Flusher(threading.Thread):
+    def __init__(self, outbox, storage, batch_size=FLUSH_BATCH_SIZE, interval=FLUSH_INTERVAL,
+                 max_backoff=FLUSH_MAX_BACKOFF):
+        # storage: a storage.Storage (SheetsStorage wraps the gsheets connection)
+        super().__init__(name="outbox-flusher", daemon=True)
+        self.outbox = outbox
+        self.storage = storage
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.stopped = threading.Event()
+
+    def stop(self):
+        # Ends run() after the current batch
+        self.stopped.set()
+        self.outbox.flush_now()
+
+    def flush_once(self):
+        rows = self.outbox.claim(self.batch_size)
+        if not rows:
+            return 0
+        # One append per worksheet (or shard, see Storage.route), keeping
+        # submission order
+        by_sheet = {}
+        for row_id, worksheet, payload in rows:
+            record = json.loads(payload)
+            by_sheet.setdefault((worksheet, self.storage.route(worksheet, record)), []).append((row_id, record))
+        sent_ids = []
+        try:
+            for (worksheet, target), items in by_sheet.items():
+                self.storage.append(target, [r for _, r in items], WORKSHEET_COLUMNS.get(worksheet, DB_COLUMNS))
+                ids = [i for i, _ in items]
+                self.outbox.mark_flushed(ids)
+                sent_ids.extend(ids)
+        except Exception as e:
+            done = set(sent_ids)
+            self.outbox.release([row[0] for row in rows if row[0] not in done], e)
+            raise
+        return len(sent_ids)
+
+    def run(self):
+        delay = 0
+        last_prune = 0
+        while not self.stopped.is_set():
+            if self.failures:
+                # New submissions wait out the backoff; "Flush now" retries at
+                # once and starts the backoff over
+                if self.outbox.flush_requested.wait(delay):
+                    self.failures = 0
+            else:
+                self.outbox.wakeup.wait(timeout=delay or self.interval)
+            self.outbox.wakeup.clear()
+            self.outbox.flush_requested.clear()
+            if self.stopped.is_set():
+                return
+            try:
+                sent = self.flush_once()
+            except Exception:
+                # Exponential backoff with jitter, capped
+                self.failures += 1
+                delay = min(self.max_backoff, self.interval * 2 ** self.failures) * random.uniform(0.5, 1.0)
+                continue
+            self.failures = 0
+            # A full batch means more is probably waiting
+            delay = 0.01 if sent >= self.batch_size else 0
+            if time.time() - last_prune > 3600:
+                self.outbox.prune()
+                last_prune = time.time()
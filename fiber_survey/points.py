@@ -0,0 +1,145 @@
+"""Intermediate points of a fiber line, one row per point.
+
+Points used to be stored as a JSON list in the "পয়েন্টসমূহ" cell of each
+"Main List" row. They now go to the "Points" worksheet with a "Line ID"
+that refers back to the line, so point analysis is a join and a groupby over
+the mirrored tables instead of a ``json.loads`` per row. ``migrate`` moves
+the JSON of rows saved before the split; it can be rerun safely.
+"""
+import json
+import uuid
+
+import pandas as pd
+
+from . import sheets
+from .geo_index import PLACEHOLDER
+from .schema import (DB_COLUMNS, DEST_CORE, LINE_ID_COLUMN, MAIN_WORKSHEET, POINT_COLUMNS, POINTS_COLUMN,
+                     POINTS_WORKSHEET, SOURCE_CORE)
+from .sqlutil import table_columns
+
+SEQ, NAME, CORE, DIST = POINT_COLUMNS[1:]
+MAIN_TABLE = "main_list"
+POINTS_TABLE = "points"
+
+
+def new_line_id():
+    return uuid.uuid4().hex[:16]
+
+
+def point_rows(line_id, points):
+    # points: [{"name": ..., "core": ..., "dist": ...}, ...] as entered in the form
+    rows = []
+    for seq, p in enumerate(points, start=1):
+        core = str(p.get("core") or "")
+        rows.append({
+            LINE_ID_COLUMN: line_id,
+            SEQ: seq,
+            NAME: p.get("name") or "",
+            CORE: "" if core == PLACEHOLDER else core,
+            DIST: p.get("dist") if p.get("dist") not in (None, "") else 0,
+        })
+    return rows
+
+
+def split_records(records):
+    # Gives every line a Line ID and moves its JSON points into point rows
+    lines, points = [], []
+    for rec in records:
+        rec = dict(rec)
+        rec[LINE_ID_COLUMN] = rec.get(LINE_ID_COLUMN) or new_line_id()
+        raw = rec.get(POINTS_COLUMN)
+        if raw:
+            points.extend(point_rows(rec[LINE_ID_COLUMN], json.loads(raw) if isinstance(raw, str) else raw))
+        rec[POINTS_COLUMN] = ""
+        lines.append(rec)
+    return lines, points
+
+
+def migrate(conn):
+    # One-time move of legacy JSON points; rows already in "Points" are skipped
+    ws = sheets.get_worksheet(conn, MAIN_WORKSHEET)
+    values = ws.get_all_values()
+    if len(values) < 2:
+        return {"lines": 0, "points": 0}
+    header = sheets.sheet_header(ws, DB_COLUMNS, [LINE_ID_COLUMN])
+    if POINTS_COLUMN not in header:
+        return {"lines": 0, "points": 0}
+    id_idx, json_idx = header.index(LINE_ID_COLUMN), header.index(POINTS_COLUMN)
+
+    points_ws = sheets.get_worksheet(conn, POINTS_WORKSHEET, create=True)
+    existing = points_ws.get_all_values()
+    done = set()
+    if existing and LINE_ID_COLUMN in existing[0]:
+        col = existing[0].index(LINE_ID_COLUMN)
+        done = {r[col] for r in existing[1:] if len(r) > col}
+
+    ids, new_points, assigned = [], [], 0
+    for row in values[1:]:
+        row = row + [""] * (len(header) - len(row))
+        line_id = row[id_idx]
+        if not line_id and any(v.strip() for v in row):
+            line_id = new_line_id()
+            assigned += 1
+        ids.append([line_id])
+        if line_id and row[json_idx] and line_id not in done:
+            try:
+                new_points.extend(point_rows(line_id, json.loads(row[json_idx])))
+            except (ValueError, AttributeError, TypeError):
+                pass  # left in place; shows up in the Main List validation report
+
+    # IDs are written before the points, so an interrupted run resumes cleanly
+    if assigned:
+        col = id_idx + 1
+        ws.update(range_name=f"{sheets.a1(2, col)}:{sheets.a1(len(values), col)}", values=ids)
+    if new_points:
+        sheets.append_records(conn, new_points, POINTS_WORKSHEET, POINT_COLUMNS)
+    return {"lines": assigned, "points": len(new_points)}
+
+
+# --- analysis over the mirrored tables ---------------------------------------
+def _has_column(con, table, column):
+    return column in table_columns(con, table)
+
+
+def _joinable(con):
+    return _has_column(con, MAIN_TABLE, LINE_ID_COLUMN) and _has_column(con, POINTS_TABLE, LINE_ID_COLUMN)
+
+
+def points_per_line(con):
+    # Number of lines with 0, 1, 2, ... intermediate points
+    if not _joinable(con):
+        return pd.DataFrame(columns=["Points", "Lines"])
+    return pd.read_sql_query(
+        f"""SELECT n AS Points, COUNT(*) AS Lines FROM (
+                SELECT m."{LINE_ID_COLUMN}", COUNT(p."{LINE_ID_COLUMN}") AS n
+                FROM {MAIN_TABLE} m LEFT JOIN {POINTS_TABLE} p ON p."{LINE_ID_COLUMN}" = m."{LINE_ID_COLUMN}"
+                WHERE m."{LINE_ID_COLUMN}" != '' GROUP BY m."{LINE_ID_COLUMN}")
+            GROUP BY n ORDER BY n""",
+        con,
+    )
+
+
+def core_transitions(con):
+    # Counts of core type changes along each line: source -> points -> destination
+    if not _joinable(con):
+        return pd.DataFrame(columns=["From", "To", "Count"])
+    ends = pd.read_sql_query(
+        f'SELECT "{LINE_ID_COLUMN}" AS line, "{SOURCE_CORE}" AS src, "{DEST_CORE}" AS dst '
+        f'FROM {MAIN_TABLE} WHERE "{LINE_ID_COLUMN}" != \'\'',
+        con,
+    )
+    pts = pd.read_sql_query(
+        f'SELECT "{LINE_ID_COLUMN}" AS line, CAST("{SEQ}" AS INTEGER) AS seq, "{CORE}" AS core FROM {POINTS_TABLE}',
+        con,
+    )
+    pts = pts[pts["line"].isin(ends["line"])]
+    chain = pd.concat([
+        pd.DataFrame({"line": ends["line"], "seq": 0, "core": ends["src"]}),
+        pts,
+        pd.DataFrame({"line": ends["line"], "seq": 10 ** 9, "core": ends["dst"]}),
+    ], ignore_index=True)
+    chain = chain[chain["core"].fillna("") != ""].sort_values(["line", "seq"], kind="stable")
+    chain["next"] = chain.groupby("line")["core"].shift(-1)
+    steps = chain.dropna(subset=["next"])
+    return (steps.groupby(["core", "next"]).size().reset_index(name="Count")
+            .rename(columns={"core": "From", "next": "To"}))
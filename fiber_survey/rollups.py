@@ -0,0 +1,194 @@
+"""Materialized aggregates behind the admin dashboard.
+
+``Rollups`` is a mirror hook: every batch of newly synced rows is grouped in
+pandas and added onto the aggregate tables inside the same transaction, and a
+full resync rebuilds them. Dashboard KPIs and chart tables are then small SQL
+queries whose cost does not depend on the number of survey rows.
+``AreaRollups`` does the same per upazila for the coverage map.
+"""
+import pandas as pd
+
+from . import frames
+from .schema import DEPENDENCY_KM, DEST_KM, SOURCE_CORE, SOURCE_GEO, SOURCE_KM
+
+KM_COLUMNS = {
+    "src_km": SOURCE_KM,
+    "dst_km": DEST_KM,
+    "dep_km": DEPENDENCY_KM,
+}
+GROUP_COLUMNS = {
+    "division": SOURCE_GEO[0],
+    "district": SOURCE_GEO[1],
+    "core": SOURCE_CORE,
+}
+AREA_COLUMNS = {
+    "division": SOURCE_GEO[0],
+    "district": SOURCE_GEO[1],
+    "upazila": SOURCE_GEO[2],
+    "core": SOURCE_CORE,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agg_daily (
+    division TEXT NOT NULL,
+    district TEXT NOT NULL,
+    day TEXT NOT NULL,
+    core TEXT NOT NULL,
+    entries INTEGER NOT NULL,
+    src_km REAL NOT NULL,
+    dst_km REAL NOT NULL,
+    dep_km REAL NOT NULL,
+    PRIMARY KEY (division, district, day, core)
+);
+CREATE TABLE IF NOT EXISTS agg_officers (
+    name TEXT PRIMARY KEY,
+    entries INTEGER NOT NULL
+);
+"""
+
+
+def _text(df, col):
+    if col not in df.columns:
+        return pd.Series("", index=df.index)
+    return df[col].fillna("").astype(str).str.strip()
+
+
+def _km(df, col):
+    if col not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    return frames.km(df[col], "float64").fillna(0.0)  # "inf" and "1e400" count as 0 too
+
+
+class Rollups:
+    def setup(self, con):
+        con.executescript(_SCHEMA)
+
+    def reset(self, con):
+        con.execute("DELETE FROM agg_daily")
+        con.execute("DELETE FROM agg_officers")
+
+    def apply(self, con, frame):
+        if frame is None or frame.empty:
+            return
+        parts = pd.DataFrame({key: _text(frame, col) for key, col in GROUP_COLUMNS.items()})
+        parts["day"] = pd.to_datetime(_text(frame, "Timestamp"), errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+        for key, col in KM_COLUMNS.items():
+            parts[key] = _km(frame, col)
+        parts["entries"] = 1
+        daily = parts.groupby(["division", "district", "day", "core"], as_index=False)[
+            ["entries", "src_km", "dst_km", "dep_km"]
+        ].sum()
+        con.executemany(
+            """INSERT INTO agg_daily (division, district, day, core, entries, src_km, dst_km, dep_km)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (division, district, day, core) DO UPDATE SET
+                   entries = entries + excluded.entries,
+                   src_km = src_km + excluded.src_km,
+                   dst_km = dst_km + excluded.dst_km,
+                   dep_km = dep_km + excluded.dep_km""",
+            daily[["division", "district", "day", "core", "entries", "src_km", "dst_km", "dep_km"]]
+            .astype(object).itertuples(index=False, name=None),
+        )
+        officers = _text(frame, "নাম")
+        officers = officers[officers != ""].value_counts()
+        con.executemany(
+            """INSERT INTO agg_officers (name, entries) VALUES (?, ?)
+               ON CONFLICT (name) DO UPDATE SET entries = entries + excluded.entries""",
+            [(name, int(n)) for name, n in officers.items()],
+        )
+
+
+_AREA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agg_area (
+    division TEXT NOT NULL,
+    district TEXT NOT NULL,
+    upazila TEXT NOT NULL,
+    core TEXT NOT NULL,
+    entries INTEGER NOT NULL,
+    km REAL NOT NULL,
+    PRIMARY KEY (division, district, upazila, core)
+);
+"""
+
+
+class AreaRollups:
+    # Links and fiber KM (source + destination) per source upazila and core
+    # type, for the coverage map
+    def setup(self, con):
+        con.executescript(_AREA_SCHEMA)
+
+    def reset(self, con):
+        con.execute("DELETE FROM agg_area")
+
+    def apply(self, con, frame):
+        if frame is None or frame.empty:
+            return
+        parts = pd.DataFrame({key: _text(frame, col) for key, col in AREA_COLUMNS.items()})
+        parts["km"] = _km(frame, KM_COLUMNS["src_km"]) + _km(frame, KM_COLUMNS["dst_km"])
+        parts["entries"] = 1
+        area = parts.groupby(list(AREA_COLUMNS), as_index=False)[["entries", "km"]].sum()
+        con.executemany(
+            """INSERT INTO agg_area (division, district, upazila, core, entries, km) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (division, district, upazila, core) DO UPDATE SET
+                   entries = entries + excluded.entries,
+                   km = km + excluded.km""",
+            area[["division", "district", "upazila", "core", "entries", "km"]]
+            .astype(object).itertuples(index=False, name=None),
+        )
+
+
+# --- queries -----------------------------------------------------------------
+def totals(con):
+    entries, src_km, dst_km, dep_km = con.execute(
+        "SELECT COALESCE(SUM(entries), 0), COALESCE(SUM(src_km), 0), COALESCE(SUM(dst_km), 0), "
+        "COALESCE(SUM(dep_km), 0) FROM agg_daily"
+    ).fetchone()
+    officers = con.execute("SELECT COUNT(*) FROM agg_officers").fetchone()[0]
+    return {"entries": entries, "src_km": src_km, "dst_km": dst_km, "dep_km": dep_km, "officers": officers}
+
+
+def counts_by(con, key):
+    # key is one of division / district / core
+    if key not in GROUP_COLUMNS:
+        raise ValueError(key)
+    return pd.read_sql_query(
+        f"SELECT {key}, SUM(entries) AS Count FROM agg_daily WHERE {key} != '' GROUP BY {key} ORDER BY Count DESC",
+        con,
+    )
+
+
+def daily_entries(con):
+    daily = pd.read_sql_query(
+        "SELECT day AS Date, SUM(entries) AS Count FROM agg_daily WHERE day != '' GROUP BY day ORDER BY day", con
+    )
+    if daily.empty:
+        return daily
+    # Fill gaps so the line matches resample('D')
+    daily["Date"] = pd.to_datetime(daily["Date"])
+    return daily.set_index("Date").asfreq("D", fill_value=0).reset_index()
+
+
+def top_officers(con, n=10):
+    return pd.read_sql_query(
+        "SELECT name AS User, entries AS Count FROM agg_officers ORDER BY entries DESC, name LIMIT ?", con, params=(n,)
+    )
+
+
+def area_totals(con, level, division=None):
+    # level: "district" or "upazila"; one row per area with KM, links and the
+    # core type carrying most links there
+    keys = ["division", "district"] + (["upazila"] if level == "upazila" else [])
+    if level not in ("district", "upazila"):
+        raise ValueError(level)
+    where = "WHERE district != ''" + (" AND division = ?" if division else "")
+    by_core = pd.read_sql_query(
+        f"SELECT {', '.join(keys)}, core, SUM(entries) AS entries, SUM(km) AS km FROM agg_area {where} "
+        f"GROUP BY {', '.join(keys)}, core",
+        con, params=(division,) if division else (),
+    )
+    if by_core.empty:
+        return pd.DataFrame(columns=keys + ["entries", "km", "core"])
+    totals = by_core.groupby(keys, as_index=False)[["entries", "km"]].sum()
+    dominant = (by_core[by_core["core"] != ""].sort_values(["entries", "core"], ascending=[False, True])
+                .drop_duplicates(keys)[keys + ["core"]])
+    return totals.merge(dominant, on=keys, how="left").fillna({"core": ""})
@@ -0,0 +1,35 @@
+"""Column layout of the survey worksheets."""
+
+MAIN_WORKSHEET = "Main List"
+POINTS_WORKSHEET = "Points"
+LINE_ID_COLUMN = "Line ID"
+POINTS_COLUMN = "পয়েন্টসমূহ"
+
+DB_COLUMNS = [
+    "Timestamp", "নাম", "যোগাযোগ নম্বর", "পদবী", "কর্মস্থল", 
+    "উৎস বিভাগ", "উৎস জেলা", "উৎস উপজেলা", "উৎস ইউনিয়ন", 
+    "উৎস (Source Name)", "উৎস কোর টাইপ", "উৎস দূরত্ব (KM)", 
+    "গন্তব্য বিভাগ", "গন্তব্য জেলা", "গন্তব্য উপজেলা", "গন্তব্য ইউনিয়ন",
+    "গন্তব্য (Destination Name)", "গন্তব্য কোর টাইপ", "গন্তব্য দূরত্ব (KM)", 
+    "ডিপেন্ডেন্সি (KM)", "পয়েন্টসমূহ", "Line ID"
+]
+
+# Both ends of a line: division, district, upazila and union, then the site
+SOURCE_GEO = ["উৎস বিভাগ", "উৎস জেলা", "উৎস উপজেলা", "উৎস ইউনিয়ন"]
+DEST_GEO = ["গন্তব্য বিভাগ", "গন্তব্য জেলা", "গন্তব্য উপজেলা", "গন্তব্য ইউনিয়ন"]
+SOURCE_NAME, DEST_NAME = "উৎস (Source Name)", "গন্তব্য (Destination Name)"
+SOURCE_CORE, DEST_CORE = "উৎস কোর টাইপ", "গন্তব্য কোর টাইপ"
+CORE_COLUMNS = [SOURCE_CORE, DEST_CORE]
+SOURCE_KM, DEST_KM, DEPENDENCY_KM = "উৎস দূরত্ব (KM)", "গন্তব্য দূরত্ব (KM)", "ডিপেন্ডেন্সি (KM)"
+KM_COLUMNS = [SOURCE_KM, DEST_KM, DEPENDENCY_KM]
+
+# One row per intermediate point; "Line ID" refers to the fiber line in
+# "Main List". "পয়েন্টসমূহ" is only filled on rows saved before the split.
+POINT_COLUMNS = [
+    "Line ID", "ক্রম (Seq)", "পয়েন্টের নাম (Point Name)", "পয়েন্ট কোর টাইপ", "পয়েন্ট দূরত্ব (KM)"
+]
+
+WORKSHEET_COLUMNS = {
+    MAIN_WORKSHEET: DB_COLUMNS,
+    POINTS_WORKSHEET: POINT_COLUMNS,
+}
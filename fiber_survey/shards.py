@@ -0,0 +1,165 @@
+"""Division and month shards of the "Main List" worksheet.
+
+With ``FIBER_SHEETS_SHARDING=division_month`` new lines are appended to one
+worksheet per source division and month, e.g. "Main List | 2026-10 | ঢাকা",
+each with the ``DB_COLUMNS`` header, so no single sheet grows toward the
+spreadsheet's cell limit. The unsharded "Main List" keeps the rows saved
+before and is read as one more shard.
+
+``select`` keeps the shards a query can match on its division and Timestamp
+filters; ``read`` fetches those concurrently and returns one frame. Rows are
+numbered ``shard number * SHARD_ROWS + sheet row``, the unsharded sheet being
+shard 0, so its rows keep their sheet row numbers.
+"""
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from . import metrics, sheets
+from .config import SHARD_READ_WORKERS
+from .schema import DB_COLUMNS, MAIN_WORKSHEET, SOURCE_GEO
+
+SEPARATOR = " | "
+DIVISION_COLUMN = SOURCE_GEO[0]
+TIME_COLUMN = "Timestamp"
+NO_DIVISION = "-"
+SHARD_ROWS = 10_000_000  # more rows than a sheet can hold
+BATCH_RANGES = 100  # ranges per values.batchGet request
+_MONTH = re.compile(r"^\d{4}-\d{2}$")
+
+Shard = namedtuple("Shard", "title month division worksheet")  # month "" = the unsharded sheet
+
+
+def shard_title(record, worksheet=MAIN_WORKSHEET):
+    # Month of the Timestamp (now if it has none) and source division
+    stamp = str(record.get(TIME_COLUMN) or "")
+    month = stamp[:7] if _MONTH.match(stamp[:7]) else datetime.now().strftime("%Y-%m")
+    division = str(record.get(DIVISION_COLUMN) or "").strip() or NO_DIVISION
+    return SEPARATOR.join([worksheet, month, division])
+
+
+def parse_title(title, worksheet=MAIN_WORKSHEET):
+    # (month, division) of a shard title, ("", "") for the unsharded sheet,
+    # None for any other worksheet
+    if title == worksheet:
+        return "", ""
+    name, _, rest = title.partition(SEPARATOR)
+    month, _, division = rest.partition(SEPARATOR)
+    if name != worksheet or not _MONTH.match(month) or not division:
+        return None
+    return month, division
+
+
+def split(records, worksheet=MAIN_WORKSHEET):
+    # {shard title: frame}, rows in their original order
+    df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+    titles = [shard_title(r, worksheet) for r in df.to_dict("records")]
+    return {title: part for title, part in df.groupby(pd.Series(titles, index=df.index), sort=False)}
+
+
+def list_shards(spreadsheet, worksheet=MAIN_WORKSHEET):
+    # Shards of `worksheet` from one metadata request: the unsharded sheet
+    # first, then by month and division
+    found = []
+    for ws in spreadsheet.worksheets():
+        parsed = parse_title(ws.title, worksheet)
+        if parsed is not None:
+            found.append(Shard(ws.title, *parsed, ws))
+    return sorted(found, key=lambda s: (s.month, s.division))
+
+
+def numbers(listed):
+    # Position-based shard numbers; the unsharded sheet is always 0. A shard
+    # added for an earlier month renumbers every shard after it
+    start = 0 if listed and not listed[0].month else 1
+    return {s.title: start + i for i, s in enumerate(listed)}
+
+
+def _may_match(shard, column, op, value):
+    if column == DIVISION_COLUMN:
+        division = shard.division if shard.division != NO_DIVISION else ""
+        if op == "=":
+            return division == str(value)
+        if op == "in":
+            return division in {str(v) for v in value}
+    elif column == TIME_COLUMN:
+        # Timestamps of the month sort between "YYYY-MM" and "YYYY-MM\uffff"
+        first, last, value = shard.month, shard.month + "\uffff", str(value)
+        if op in (">", ">="):
+            return last > value
+        if op == "<":
+            return first < value
+        if op == "<=":
+            return first <= value
+        if op == "=":
+            return value[:7] == shard.month
+    return True
+
+
+def select(listed, filters=()):
+    # Shards that can hold rows matching the normalized filters (see
+    # storage.normalize_filters); the unsharded sheet can hold anything
+    return [s for s in listed if not s.month or all(_may_match(s, c, op, v) for c, op, v in filters)]
+
+
+def header(values):
+    row = [str(v) for v in values[0]] if values else []
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def fetch(listed, workers=SHARD_READ_WORKERS):
+    # {title: all values}, the shards read concurrently
+    def get(shard):
+        with metrics.timer("sheets.read", worksheet=shard.title, full=True):
+            return shard.worksheet.get_all_values()
+
+    if not listed:
+        return {}
+    with metrics.timer("shards.read", shards=len(listed)):
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(listed)))) as pool:
+            return dict(zip([s.title for s in listed], pool.map(get, listed)))
+
+
+def batch_tails(spreadsheet, starts):
+    # {title: rows from its start row on} for [(shard, start row)], in
+    # values.batchGet requests of BATCH_RANGES ranges
+    from gspread.utils import absolute_range_name
+
+    out = {}
+    for i in range(0, len(starts), BATCH_RANGES):
+        chunk = starts[i:i + BATCH_RANGES]
+        ranges = [absolute_range_name(s.title, f"A{row}:{sheets.a1(1, max(s.worksheet.col_count or 0, 1))[:-1]}")
+                  for s, row in chunk]
+        with metrics.timer("sheets.read", worksheet=chunk[0][0].title, shards=len(chunk)):
+            reply = spreadsheet.values_batch_get(ranges)
+        for (shard, _), value_range in zip(chunk, reply.get("valueRanges", [])):
+            out[shard.title] = value_range.get("values", [])
+    return out
+
+
+def frame(values, number, columns=DB_COLUMNS):
+    # One shard's values as a frame of text, indexed by global row number
+    head = header(values)
+    rows = [list(r)[:len(head)] + [""] * (len(head) - len(r)) for r in values[1:]]
+    index = pd.RangeIndex(number * SHARD_ROWS + 2, number * SHARD_ROWS + 2 + len(rows))
+    df = pd.DataFrame(rows, columns=head, index=index, dtype=object)
+    return df[(df != "").any(axis=1)] if len(df.columns) else df.reindex(columns=columns)
+
+
+def read(conn, filters=(), worksheet=MAIN_WORKSHEET, columns=DB_COLUMNS, workers=SHARD_READ_WORKERS):
+    # One frame of the shards the filters need, oldest shard first; the
+    # filters themselves are left to the caller
+    listed = list_shards(sheets.get_spreadsheet(conn), worksheet)
+    number = numbers(listed)
+    chosen = select(listed, filters)
+    values = fetch(chosen, workers)
+    frames = [frame(values[s.title], number[s.title], columns) for s in chosen]
+    if not frames:
+        return pd.DataFrame(columns=list(columns), dtype=object)
+    df = pd.concat(frames).fillna("")
+    return sheets.order_columns(df, columns)
@@ -0,0 +1,126 @@
+"""Host-wide cache of expensive derived objects, shared by app workers.
+
+Several Streamlit processes on one host (replicas behind a load balancer)
+would each parse the gazetteer and rebuild the same tables. ``get(name,
+version, build)`` keeps one pickled copy per name under ``SHARED_CACHE_DIR``:
+the first worker to need a version builds it under a file lock and the others
+unpickle the file. Each process still holds its own copy in memory; what is
+shared is the parse, verify or build time, not the memory. A new version
+replaces the old file, so invalidation is just a changed version (a snapshot
+checksum, a mirror generation). Each process also keeps the last version of
+every name in memory.
+
+With ``FIBER_SHARED_CACHE_DIR`` set to an empty string, or when the directory
+cannot be written, only the in-process copy is used.
+"""
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+from .config import SHARED_CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: the lock only covers this process
+    fcntl = None
+
+_memory = {}  # name -> (version, value)
+_lock = threading.Lock()
+_MISSING = object()
+
+
+class FileLock:
+    # Exclusive lock across processes (flock) and threads of this process;
+    # re-entrant within a thread, also through another FileLock on the path
+    _held = {}  # path -> [RLock, depth, open file]
+
+    def __init__(self, path):
+        self.path = path
+        with _lock:
+            self._state = self._held.setdefault(path, [threading.RLock(), 0, None])
+
+    def __enter__(self):
+        state = self._state
+        state[0].acquire()
+        state[1] += 1
+        if state[1] == 1 and fcntl is not None:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                state[2] = open(self.path, "a+b")
+                fcntl.flock(state[2], fcntl.LOCK_EX)
+            except OSError:
+                state[2] = None  # read-only disk: threads are still serialized
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        state = self._state
+        state[1] -= 1
+        if state[1] == 0 and state[2] is not None:
+            fcntl.flock(state[2], fcntl.LOCK_UN)
+            state[2].close()
+            state[2] = None
+        state[0].release()
+        return False
+
+
+def _path(name, version):
+    digest = hashlib.sha256(repr(version).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(SHARED_CACHE_DIR, f"{name}-{digest}.pickle")
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return _MISSING
+
+
+def _write(name, path, value):
+    # Atomic replace, then drop older versions of the same name
+    try:
+        os.makedirs(SHARED_CACHE_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=SHARED_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        return
+    for old in glob.glob(os.path.join(SHARED_CACHE_DIR, f"{glob.escape(name)}-*.pickle*")):
+        if not old.startswith(path):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def get(name, version, build):
+    # In-process copy, then the host-wide file, then build() (once per host)
+    hit = _memory.get(name)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    value = _MISSING
+    if SHARED_CACHE_DIR:
+        path = _path(name, version)
+        value = _read(path)
+        if value is _MISSING:
+            with FileLock(path + ".lock"):
+                value = _read(path)
+                if value is _MISSING:
+                    value = build()
+                    _write(name, path, value)
+    if value is _MISSING:
+        value = build()
+    _memory[name] = (version, value)
+    return value
+
+
+def clear(name=None):
+    # Drops in-process copies; the files are replaced by the next version
+    if name is None:
+        _memory.clear()
+    else:
+        _memory.pop(name, None)
@@ -0,0 +1,135 @@
+"""Write path for the survey worksheets.
+
+New submissions are appended with the Sheets ``values.append`` call, which
+inserts rows server-side: only the new records travel over the wire and two
+offices submitting together cannot overwrite each other. The old
+read/concat/update path is kept as ``rewrite_records`` and is used only when
+``FIBER_SHEETS_WRITE_MODE=rewrite`` is set explicitly.
+"""
+import threading
+from numbers import Real
+
+import pandas as pd
+
+from . import metrics
+from .config import SHEETS_WRITE_MODE
+from .schema import DB_COLUMNS, MAIN_WORKSHEET
+
+_header_cache = {}
+_header_lock = threading.Lock()
+
+
+def _client(conn):
+    # GSheetsConnection -> GSheetsServiceAccountClient
+    client = getattr(conn, "client", conn)
+    if getattr(client, "_select_worksheet", None) is None:
+        raise RuntimeError(
+            "Row append needs a service account connection "
+            "(set FIBER_SHEETS_WRITE_MODE=rewrite to use the full-sheet update)"
+        )
+    return client
+
+
+def get_spreadsheet(conn):
+    return _client(conn)._open_spreadsheet()
+
+
+def get_worksheet(conn, worksheet=MAIN_WORKSHEET, create=False):
+    # GSheetsConnection -> GSheetsServiceAccountClient -> gspread Worksheet
+    client = _client(conn)
+    from gspread.exceptions import APIError, WorksheetNotFound
+
+    try:
+        return client._select_worksheet(worksheet=worksheet)
+    except WorksheetNotFound:
+        if not create:
+            raise
+    # e.g. "Points" on a spreadsheet that predates it, or a new shard; the
+    # header is written by the first append
+    try:
+        return client._open_spreadsheet().add_worksheet(title=worksheet, rows=1000, cols=26)
+    except APIError:
+        # Added by another worker in the meantime
+        return client._select_worksheet(worksheet=worksheet)
+
+
+def _cell(value):
+    # Same conversion gspread_dataframe applies on conn.update
+    if value is None or (not isinstance(value, str) and pd.isnull(value)):
+        return ""
+    if isinstance(value, Real) and not isinstance(value, bool):
+        return value.item() if hasattr(value, "item") else value
+    value = str(value)
+    if value.startswith("'"):
+        return "'" + value
+    return value
+
+
+def sheet_header(ws, layout, columns):
+    # Header row is fetched once per worksheet and process; a blank sheet
+    # gets the full layout written first.
+    key = (ws.spreadsheet.id, ws.id)
+    with _header_lock:
+        header = _header_cache.get(key)
+        if header is None or any(c not in header for c in columns):
+            # Another worker may have added the columns since it was cached
+            header = [h for h in ws.row_values(1) if h]
+            if not header:
+                header = list(layout)
+                ws.update(range_name="A1", values=[header])
+            _header_cache[key] = header
+        missing = [c for c in columns if c not in header]
+        if missing:
+            # New schema columns go to the right of the existing header
+            start = len(header) + 1
+            ws.update(range_name=a1(1, start), values=[missing])
+            header = header + missing
+            _header_cache[key] = header
+        return header
+
+
+def a1(row, col):
+    letters = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return f"{letters}{row}"
+
+
+def order_columns(df, columns=DB_COLUMNS):
+    final_columns = [c for c in columns if c in df.columns] + [c for c in df.columns if c not in columns]
+    return df[final_columns]
+
+
+def append_records(conn, records, worksheet=MAIN_WORKSHEET, columns=DB_COLUMNS):
+    df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+    if df.empty:
+        return 0
+    df = order_columns(df, columns)
+    ws = get_worksheet(conn, worksheet, create=True)
+    layout = list(columns) + [c for c in df.columns if c not in columns]
+    header = sheet_header(ws, layout, list(df.columns))
+    rows = [[_cell(v) for v in row] for row in df.reindex(columns=header).itertuples(index=False, name=None)]
+    with metrics.timer("sheets.append", worksheet=worksheet, rows=len(rows)):
+        ws.append_rows(rows, value_input_option="USER_ENTERED", insert_data_option="INSERT_ROWS", table_range="A1")
+    return len(rows)
+
+
+def rewrite_records(conn, records, worksheet=MAIN_WORKSHEET, columns=DB_COLUMNS):
+    new_record = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+    with metrics.timer("sheets.read", worksheet=worksheet):
+        existing_data = conn.read(worksheet=worksheet, ttl=0)
+    if existing_data is not None and not existing_data.empty:
+        with metrics.timer("pd.concat", rows=len(existing_data)):
+            updated_df = pd.concat([existing_data, new_record], ignore_index=True)
+    else:
+        updated_df = new_record
+    with metrics.timer("sheets.update", worksheet=worksheet, rows=len(updated_df)):
+        conn.update(worksheet=worksheet, data=order_columns(updated_df, columns))
+    return len(new_record)
+
+
+def save_records(conn, records, worksheet=MAIN_WORKSHEET, columns=DB_COLUMNS, mode=None):
+    if (mode or SHEETS_WRITE_MODE) == "rewrite":
+        return rewrite_records(conn, records, worksheet, columns)
+    return append_records(conn, records, worksheet, columns)
@@ -0,0 +1,10 @@
+"""Identifier quoting and table columns for the SQL the modules build by hand."""
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def table_columns(con, table):
+    # Column names of a table in order, without the _row key
+    return [r[1] for r in con.execute(f"PRAGMA table_info({table})") if r[1] != "_row"]
@@ -0,0 +1,636 @@
+"""Storage backends for survey rows.
+
+``Storage`` is what the outbox flusher writes to and what the mirror reads
+from: ``append``, ``read_since`` (incremental read by row number),
+``query`` (filters, order, paging), ``count`` and ``aggregate``.
+
+``SheetsStorage`` keeps the Google Sheets worksheets as the store; its
+``query``/``aggregate`` load the sheet into pandas, so they are only meant for
+small sheets. ``ShardedSheetsStorage`` spreads "Main List" over division and
+month worksheets (see ``shards``) and reads only the shards a query's filters
+can match. ``SQLStorage`` keeps one table per worksheet in SQLite or
+PostgreSQL (``FIBER_DATABASE_URL``) behind a small connection pool, with
+indexes on division, district and timestamp. With ``FIBER_STORAGE_BACKEND=sql``
+the database is the store and a ``Replicator`` thread copies new rows to the
+sheets, which stay the place officers and admins look at.
+
+Cells are stored as text. In filters and ``order_by`` the KM columns compare
+as numbers on every backend (blank or malformed cells match no comparison);
+everything else compares as text.
+"""
+import math
+import operator
+import os
+import queue
+import random
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from . import frames, shards, sheets
+from .shared_cache import FileLock
+from .config import (DATA_DIR, DATABASE_URL, DB_POOL_SIZE, FLUSH_BATCH_SIZE, FLUSH_INTERVAL, FLUSH_MAX_BACKOFF,
+                     SHEETS_REPLICA, SHEETS_SHARDING, STORAGE_BACKEND)
+from .schema import (DB_COLUMNS, KM_COLUMNS, LINE_ID_COLUMN, MAIN_WORKSHEET, POINTS_WORKSHEET, SOURCE_GEO,
+                     WORKSHEET_COLUMNS)
+from .sqlutil import quote
+
+TABLES = {MAIN_WORKSHEET: "main_list", POINTS_WORKSHEET: "points"}
+REPLICATION_LOCK_KEY = 0x66696272  # pg_advisory_lock key, "fibr"
+INDEXES = {
+    MAIN_WORKSHEET: [*SOURCE_GEO[:2], "Timestamp", LINE_ID_COLUMN],
+    POINTS_WORKSHEET: [LINE_ID_COLUMN],
+}
+COMPARISONS = {"=": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le, ">": operator.gt,
+               ">=": operator.ge}
+OPERATORS = set(COMPARISONS) | {"in", "like"}
+FUNCTIONS = {"count", "sum", "avg", "min", "max"}
+
+
+class StorageError(Exception):
+    pass
+
+
+def _text(value):
+    # Stored as the text a sheet would show; blanks instead of None/NaN
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return str(value)
+
+
+def table_name(worksheet):
+    return TABLES.get(worksheet) or "".join(c if c.isalnum() else "_" for c in worksheet.lower())
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise StorageError(f"{value!r} is not a number")
+
+
+def normalize_filters(filters):
+    # {column: value} or [(column, op, value), ...]; a list/set value means "in"
+    if not filters:
+        return []
+    if isinstance(filters, dict):
+        filters = [(c, "in" if isinstance(v, (list, tuple, set)) else "=", v) for c, v in filters.items()]
+    out = []
+    for column, op, value in filters:
+        op = op.lower()
+        if op not in OPERATORS:
+            raise StorageError(f"Unsupported filter operator {op!r}")
+        out.append((column, op, value))
+    return out
+
+
+class Storage:
+    def append(self, worksheet, records, columns=DB_COLUMNS):
+        raise NotImplementedError
+
+    def route(self, worksheet, record):
+        # Worksheet a record is appended to; batches are sent per route
+        return worksheet
+
+    def read_since(self, worksheet, after_row=0, limit=None):
+        # Rows numbered above after_row, oldest first; index = row number
+        raise NotImplementedError
+
+    def query(self, worksheet, filters=None, columns=None, order_by=None, descending=False, limit=None, offset=0):
+        raise NotImplementedError
+
+    def count(self, worksheet, filters=None):
+        raise NotImplementedError
+
+    def aggregate(self, worksheet, group_by, measures, filters=None):
+        # measures: {"alias": ("count" | "sum" | "avg" | "min" | "max", column)}
+        raise NotImplementedError
+
+
+# --- Google Sheets -------------------------------------------------------------
+def _read_rows(ws, columns, start, limit=None, base=0):
+    # Up to `limit` rows of ws from sheet row `start` on, numbered base + sheet row
+    header = [h for h in ws.row_values(1) if h] or list(columns)
+    last_col = sheets.a1(1, len(header))[:-1]
+    rows = ws.get(f"A{start}:{last_col}{start + limit - 1 if limit else ''}")
+    rows = [list(r)[:len(header)] + [""] * (len(header) - len(r)) for r in rows]
+    return pd.DataFrame(rows, columns=header, index=pd.RangeIndex(base + start, base + start + len(rows)), dtype=object)
+
+
+def _filter_frame(df, filters):
+    # KM columns compare as numbers (blank or malformed cells match nothing,
+    # like NULL in SQL); everything else as text
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        values = df[column] if column in df.columns else pd.Series("", index=df.index)
+        numeric = column in KM_COLUMNS and op != "like"
+        if numeric:
+            values = frames.km(values, "float64")
+        if op == "in":
+            mask &= values.isin([_number(v) if numeric else _text(v) for v in value])
+        elif op == "like":
+            # SQL LIKE: % any run, _ one character
+            pattern = "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in str(value))
+            mask &= values.str.fullmatch(pattern, case=False)
+        else:
+            mask &= COMPARISONS[op](values, _number(value) if numeric else _text(value))
+    return df[mask]
+
+
+def _sort_frame(df, order_by, descending):
+    # KM columns sort as numbers, blanks where SQLite puts NULL
+    key = (lambda s: frames.km(s, "float64")) if order_by in KM_COLUMNS else None
+    return df.sort_values(order_by, ascending=not descending, kind="stable", key=key,
+                          na_position="last" if descending else "first")
+
+
+class SheetsStorage(Storage):
+    def __init__(self, conn):
+        self.conn = conn
+
+    def append(self, worksheet, records, columns=DB_COLUMNS):
+        return sheets.save_records(self.conn, records, worksheet=worksheet, columns=columns)
+
+    def read_since(self, worksheet, after_row=0, limit=None):
+        # Row numbers are sheet rows (the header is row 1)
+        start = max(after_row, 1) + 1
+        try:
+            ws = sheets.get_worksheet(self.conn, worksheet, create=True)
+        except RuntimeError:
+            df = self.conn.read(worksheet=worksheet, ttl=0)
+            df = df.dropna(how="all").fillna("").astype(str)
+            df.index = pd.RangeIndex(2, 2 + len(df))
+            df = df.loc[start:]
+            return df.head(limit) if limit else df
+        return _read_rows(ws, WORKSHEET_COLUMNS.get(worksheet, DB_COLUMNS), start, limit)
+
+    def _frame(self, worksheet, filters):
+        return _filter_frame(self.read_since(worksheet), normalize_filters(filters))
+
+    def query(self, worksheet, filters=None, columns=None, order_by=None, descending=False, limit=None, offset=0):
+        df = self._frame(worksheet, filters)
+        if order_by:
+            df = _sort_frame(df, order_by, descending)
+        df = df.iloc[offset:offset + limit] if limit else df.iloc[offset:]
+        return df[columns] if columns else df
+
+    def count(self, worksheet, filters=None):
+        return len(self._frame(worksheet, filters))
+
+    def aggregate(self, worksheet, group_by, measures, filters=None):
+        df = self._frame(worksheet, filters)
+        group_by = list(group_by)
+        out = {}
+        for alias, (fn, column) in measures.items():
+            if fn not in FUNCTIONS:
+                raise StorageError(f"Unsupported aggregate {fn!r}")
+            if fn == "count":
+                out[alias] = df.groupby(group_by).size() if group_by else pd.Series([len(df)])
+                continue
+            values = frames.km(df[column], "float64")
+            grouped = values.groupby([df[c] for c in group_by]) if group_by else values
+            result = getattr(grouped, "mean" if fn == "avg" else fn)()
+            out[alias] = result if group_by else pd.Series([result])
+        result = pd.DataFrame(out)
+        return result.reset_index() if group_by else result
+
+
+class ShardedSheetsStorage(SheetsStorage):
+    # "Main List" rows go to division/month shards; other worksheets, and
+    # appends addressed to one shard, are written as they are. read_since
+    # numbers rows by the shards' current order (shards.numbers), so a row
+    # number is only stable while no shard is added before it: fine within
+    # one import_from, not as a watermark kept across shard changes.
+    def __init__(self, conn, worksheets=(MAIN_WORKSHEET,)):
+        super().__init__(conn)
+        self.worksheets = set(worksheets)
+
+    def sharded(self, worksheet):
+        return worksheet in self.worksheets
+
+    def route(self, worksheet, record):
+        return shards.shard_title(record, worksheet) if self.sharded(worksheet) else worksheet
+
+    def append(self, worksheet, records, columns=DB_COLUMNS):
+        if not self.sharded(worksheet):
+            return super().append(worksheet, records, columns)
+        return sum(super(ShardedSheetsStorage, self).append(title, part, columns)
+                   for title, part in shards.split(records, worksheet).items())
+
+    def read_since(self, worksheet, after_row=0, limit=None):
+        if not self.sharded(worksheet):
+            return super().read_since(worksheet, after_row, limit)
+        # Only the shards at or above after_row, and only the rows asked for
+        columns = WORKSHEET_COLUMNS.get(worksheet, DB_COLUMNS)
+        listed = shards.list_shards(sheets.get_spreadsheet(self.conn), worksheet)
+        number = shards.numbers(listed)
+        parts = []
+        for shard in listed:
+            base = number[shard.title] * shards.SHARD_ROWS
+            if base + shards.SHARD_ROWS <= after_row:
+                continue
+            part = _read_rows(shard.worksheet, columns, max(after_row - base, 1) + 1, limit, base)
+            parts.append(part)
+            if limit:
+                limit -= len(part)
+                if limit <= 0:
+                    break
+        if not parts:
+            return pd.DataFrame(columns=list(columns), dtype=object)
+        return pd.concat(parts).fillna("")
+
+    def _frame(self, worksheet, filters):
+        if not self.sharded(worksheet):
+            return super()._frame(worksheet, filters)
+        filters = normalize_filters(filters)
+        df = shards.read(self.conn, filters, worksheet, WORKSHEET_COLUMNS.get(worksheet, DB_COLUMNS))
+        return _filter_frame(df, filters)
+
+
+def sheets_storage(conn):
+    if SHEETS_SHARDING == "division_month":
+        return ShardedSheetsStorage(conn)
+    if SHEETS_SHARDING:
+        raise StorageError(f"Unknown FIBER_SHEETS_SHARDING {SHEETS_SHARDING!r} (use division_month)")
+    return SheetsStorage(conn)
+
+
+# --- SQL -------------------------------------------------------------------------
+class ConnectionPool:
+    # Fixed-size pool; connections are created on demand up to `size`
+    def __init__(self, connect, size=DB_POOL_SIZE, timeout=30):
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._timeout = timeout
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise StorageError("No database connection available (pool exhausted)")
+        try:
+            try:
+                con = self._idle.get_nowait()
+            except queue.Empty:
+                con = self._connect()
+            try:
+                yield con
+                con.commit()
+            except BaseException:
+                try:
+                    con.rollback()
+                except Exception:
+                    raise  # broken connection: dropped, the slot is freed below
+                self._idle.put(con)
+                raise
+            self._idle.put(con)
+        finally:
+            self._slots.release()
+
+
+class AdvisoryLock:
+    # pg_advisory_lock held on a connection of its own, so replicas on other
+    # hosts are serialized too; the server drops it if the process dies
+    def __init__(self, connect, key):
+        self._connect = connect
+        self._key = key
+        self._lock = threading.Lock()
+        self._con = None
+
+    def _execute(self, sql):
+        if self._con is None or self._con.closed:
+            self._con = self._connect()
+            self._con.autocommit = True
+        try:
+            self._con.cursor().execute(sql, (self._key,))
+        except Exception:
+            self._con.close()
+            self._con = None
+            raise
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            self._execute("SELECT pg_advisory_lock(%s)")
+        except BaseException:
+            self._lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._execute("SELECT pg_advisory_unlock(%s)")
+        except Exception:
+            pass  # connection closed above, which released the lock server-side
+        finally:
+            self._lock.release()
+        return False
+
+
+class SQLStorage(Storage):
+    def __init__(self, url=DATABASE_URL, pool_size=DB_POOL_SIZE):
+        parsed = urlparse(url)
+        self.url = url
+        if parsed.scheme == "sqlite":
+            # sqlite:///relative/or//absolute/path
+            path = url[len("sqlite:///"):] or os.path.join(DATA_DIR, "survey.sqlite3")
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.dialect = "sqlite"
+            self._mark = "?"
+            self._pool = ConnectionPool(lambda: self._sqlite(path), pool_size)
+            self.replication_lock = FileLock(os.path.abspath(path) + ".replication.lock")
+        elif parsed.scheme in ("postgres", "postgresql"):
+            try:
+                import psycopg2
+            except ImportError:
+                raise StorageError("PostgreSQL storage needs psycopg2 (pip install psycopg2-binary)")
+            self.dialect = "postgresql"
+            self._mark = "%s"
+            self._pool = ConnectionPool(lambda: psycopg2.connect(url), pool_size)
+            self.replication_lock = AdvisoryLock(lambda: psycopg2.connect(url), REPLICATION_LOCK_KEY)
+        else:
+            raise StorageError(f"Unsupported database URL {url!r} (use sqlite:/// or postgresql://)")
+        self._columns = {}
+        self._schema_lock = threading.Lock()
+        with self._pool.connection() as con:
+            cur = con.cursor()
+            cur.execute("""CREATE TABLE IF NOT EXISTS replication_state (
+                               worksheet TEXT NOT NULL, target TEXT NOT NULL, last_row BIGINT NOT NULL,
+                               PRIMARY KEY (worksheet, target))""")
+            for worksheet, columns in WORKSHEET_COLUMNS.items():
+                self._ensure_table(cur, worksheet, columns)
+
+    @staticmethod
+    def _sqlite(path):
+        con = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    # --- schema ------------------------------------------------------------------
+    def _table_columns(self, cur, table):
+        if self.dialect == "sqlite":
+            cur.execute(f"PRAGMA table_info({quote(table)})")
+            return [r[1] for r in cur.fetchall() if r[1] != "_row"]
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s "
+                    "AND column_name != '_row' ORDER BY ordinal_position", (table,))
+        return [r[0] for r in cur.fetchall()]
+
+    def _ensure_table(self, cur, worksheet, columns):
+        # Creates the table (and indexes) or adds missing columns; returns the
+        # table's column order
+        table = table_name(worksheet)
+        with self._schema_lock:
+            known = self._columns.get(table)
+            if known is not None and all(c in known for c in columns):
+                return known
+            key = "_row INTEGER PRIMARY KEY AUTOINCREMENT" if self.dialect == "sqlite" else "_row BIGSERIAL PRIMARY KEY"
+            cols = ", ".join(f"{quote(c)} TEXT" for c in columns)
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {quote(table)} ({key}, {cols})")
+            existing = self._table_columns(cur, table)
+            for c in columns:
+                if c not in existing:
+                    cur.execute(f"ALTER TABLE {quote(table)} ADD COLUMN {quote(c)} TEXT")
+                    existing.append(c)
+            for c in INDEXES.get(worksheet, []):
+                if c in existing:
+                    index = f"{table}_{existing.index(c)}_idx"
+                    cur.execute(f"CREATE INDEX IF NOT EXISTS {quote(index)} ON {quote(table)} ({quote(c)})")
+            self._columns[table] = existing
+            return existing
+
+    def columns(self, worksheet):
+        table = table_name(worksheet)
+        if table not in self._columns:
+            with self._pool.connection() as con:
+                self._ensure_table(con.cursor(), worksheet, WORKSHEET_COLUMNS.get(worksheet, DB_COLUMNS))
+        return list(self._columns[table])
+
+    # --- rows --------------------------------------------------------------------
+    def _frame(self, cur, columns, dtype=object):
+        return pd.DataFrame(cur.fetchall(), columns=columns, dtype=dtype)
+
+    def append(self, worksheet, records, columns=DB_COLUMNS):
+        df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+        if df.empty:
+            return 0
+        with self._pool.connection() as con:
+            cur = con.cursor()
+            layout = list(columns) + [c for c in df.columns if c not in columns]
+            table_columns = self._ensure_table(cur, worksheet, layout)
+            df = df.reindex(columns=table_columns)
+            rows = [[_text(v) for v in row] for row in df.itertuples(index=False, name=None)]
+            marks = ", ".join([self._mark] * len(table_columns))
+            cur.executemany(
+                f"INSERT INTO {quote(table_name(worksheet))} ({', '.join(quote(c) for c in table_columns)}) VALUES ({marks})",
+                rows,
+            )
+        return len(rows)
+
+    def read_since(self, worksheet, after_row=0, limit=None):
+        columns = self.columns(worksheet)
+        sql = (f"SELECT _row, {', '.join(quote(c) for c in columns)} FROM {quote(table_name(worksheet))} "
+               f"WHERE _row > {self._mark} ORDER BY _row")
+        params = [after_row]
+        if limit:
+            sql += f" LIMIT {self._mark}"
+            params.append(limit)
+        with self._pool.connection() as con:
+            cur = con.cursor()
+            cur.execute(sql, params)
+            df = self._frame(cur, ["_row"] + columns)
+        return df.set_index("_row")
+
+    def last_row(self, worksheet):
+        with self._pool.connection() as con:
+            cur = con.cursor()
+            cur.execute(f"SELECT COALESCE(MAX(_row), 0) FROM {quote(table_name(worksheet))}")
+            return cur.fetchone()[0]
+
+    def _number(self, column):
+        # A text column as a number; NULL where blank or not a number, as
+        # frames.km reads it (SQLite's CAST would make "abc" 0, PostgreSQL's
+        # would fail the query)
+        if self.dialect == "sqlite":
+            return (f"CASE WHEN TRIM({quote(column)}) != '' AND TRIM({quote(column)}) NOT GLOB '*[^0-9.eE+-]*' "
+                    f"THEN CAST({quote(column)} AS REAL) END")
+        return (f"CASE WHEN {quote(column)} ~ '^\\s*[-+]?([0-9]+\\.?[0-9]*|\\.[0-9]+)([eE][-+]?[0-9]+)?\\s*$' "
+                f"THEN CAST({quote(column)} AS DOUBLE PRECISION) END")
+
+    def _expr(self, column):
+        # KM columns compare and sort as numbers, like explorer._expr
+        return self._number(column) if column in KM_COLUMNS else quote(column)
+
+    def _where(self, worksheet, filters):
+        known = set(self.columns(worksheet))
+        clauses, params = [], []
+        for column, op, value in normalize_filters(filters):
+            if column not in known:
+                raise StorageError(f"Unknown column {column!r}")
+            numeric = column in KM_COLUMNS and op != "like"
+            expr = self._expr(column) if numeric else quote(column)
+            if op == "in":
+                values = [_number(v) if numeric else _text(v) for v in value]
+                if not values:
+                    clauses.append("1 = 0")
+                    continue
+                clauses.append(f"{expr} IN ({', '.join([self._mark] * len(values))})")
+                params.extend(values)
+            else:
+                clauses.append(f"{expr} {op.upper()} {self._mark}")
+                params.append(_number(value) if numeric else _text(value))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, worksheet, filters=None, columns=None, order_by=None, descending=False, limit=None, offset=0):
+        known = self.columns(worksheet)
+        columns = list(columns or known)
+        for c in columns + ([order_by] if order_by else []):
+            if c not in known and c != "_row":
+                raise StorageError(f"Unknown column {c!r}")
+        where, params = self._where(worksheet, filters)
+        direction = "DESC" if descending else "ASC"
+        order = f"{self._expr(order_by)} {direction}, _row {direction}" if order_by else f"_row {direction}"
+        sql = (f"SELECT _row, {', '.join(quote(c) for c in columns)} FROM {quote(table_name(worksheet))}"
+               f"{where} ORDER BY {order}")
+        if limit:
+            sql += f" LIMIT {self._mark} OFFSET {self._mark}"
+            params += [limit, offset]
+        elif offset:
+            sql += f" LIMIT -1 OFFSET {self._mark}" if self.dialect == "sqlite" else f" OFFSET {self._mark}"
+            params.append(offset)
+        with self._pool.connection() as con:
+            cur = con.cursor()
+            cur.execute(sql, params)
+            df = self._frame(cur, ["_row"] + columns)
+        return df.set_index("_row")
+
+    def count(self, worksheet, filters=None):
+        where, params = self._where(worksheet, filters)
+        with self._pool.connection() as con:
+            cur = con.cursor()
+            cur.execute(f"SELECT COUNT(*) FROM {quote(table_name(worksheet))}{where}", params)
+            return cur.fetchone()[0]
+
+    def aggregate(self, worksheet, group_by, measures, filters=None):
+        known = set(self.columns(worksheet))
+        group_by = list(group_by)
+        select = [quote(c) for c in group_by]
+        for alias, (fn, column) in measures.items():
+            if fn not in FUNCTIONS:
+                raise StorageError(f"Unsupported aggregate {fn!r}")
+            if fn == "count":
+                select.append(f"COUNT(*) AS {quote(alias)}")
+                continue
+            if column not in known:
+                raise StorageError(f"Unknown column {column!r}")
+            select.append(f"{fn.upper()}({self._number(column)}) AS {quote(alias)}")
+        for c in group_by:
+            if c not in known:
+                raise StorageError(f"Unknown column {c!r}")
+        where, params = self._where(worksheet, filters)
+        sql = f"SELECT {', '.join(select)} FROM {quote(table_name(worksheet))}{where}"
+        if group_by:
+            sql += f" GROUP BY {', '.join(quote(c) for c in group_by)} ORDER BY {', '.join(quote(c) for c in group_by)}"
+        with self._pool.connection() as con:
+            cur = con.cursor()
+            cur.execute(sql, params)
+            return self._frame(cur, group_by + list(measures), dtype=None)
+
+    # --- replication watermarks ---------------------------------------------------
+    def replicated(self, worksheet, target):
+        with self._pool.connection() as con:
+            cur = con.cursor()
+            cur.execute(f"SELECT last_row FROM replication_state WHERE worksheet = {self._mark} AND target = {self._mark}",
+                        (worksheet, target))
+            row = cur.fetchone()
+        return row[0] if row else 0
+
+    def mark_replicated(self, worksheet, target, last_row):
+        m = self._mark
+        with self._pool.connection() as con:
+            con.cursor().execute(
+                f"""INSERT INTO replication_state (worksheet, target, last_row) VALUES ({m}, {m}, {m})
+                    ON CONFLICT (worksheet, target) DO UPDATE SET last_row = excluded.last_row""",
+                (worksheet, target, last_row),
+            )
+
+    def import_from(self, source, target="sheets", batch_size=5000):
+        # One-time copy of the existing sheets into empty tables when a
+        # deployment moves to the database; the copied rows count as already
+        # replicated to `target`
+        copied = {}
+        with self.replication_lock:
+            for worksheet in WORKSHEET_COLUMNS:
+                if self.last_row(worksheet):
+                    raise StorageError(f"Table for {worksheet!r} is not empty; import only into a new database")
+            for worksheet, columns in WORKSHEET_COLUMNS.items():
+                after = copied[worksheet] = 0
+                while True:
+                    rows = source.read_since(worksheet, after, limit=batch_size)
+                    if rows.empty:
+                        break
+                    copied[worksheet] += self.append(worksheet, rows[(rows != "").any(axis=1)], columns)
+                    after = int(rows.index.max())
+                self.mark_replicated(worksheet, target, self.last_row(worksheet))
+        return copied
+
+
+class Replicator(threading.Thread):
+    # Copies rows from the database to the sheets in row order. The source's
+    # replication_lock is held across processes from reading the watermark to
+    # moving it, so replicas never send the same rows. A crash between the
+    # append and the watermark update resends that batch once.
+    def __init__(self, source, target, name="sheets", batch_size=FLUSH_BATCH_SIZE, interval=FLUSH_INTERVAL,
+                 max_backoff=FLUSH_MAX_BACKOFF):
+        super().__init__(name=f"replicator-{name}", daemon=True)
+        self.source = source
+        self.target = target
+        self.target_name = name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.failures = 0
+
+    def replicate_once(self):
+        sent = 0
+        with self.source.replication_lock:
+            for worksheet, columns in WORKSHEET_COLUMNS.items():
+                last = self.source.replicated(worksheet, self.target_name)
+                rows = self.source.read_since(worksheet, last, limit=self.batch_size)
+                if rows.empty:
+                    continue
+                self.target.append(worksheet, rows, columns)
+                self.source.mark_replicated(worksheet, self.target_name, int(rows.index.max()))
+                sent += len(rows)
+        return sent
+
+    def run(self):
+        delay = self.interval
+        while True:
+            time.sleep(delay)
+            try:
+                sent = self.replicate_once()
+            except Exception:
+                self.failures += 1
+                delay = min(self.max_backoff, self.interval * 2 ** self.failures) * random.uniform(0.5, 1.0)
+                continue
+            self.failures = 0
+            delay = 0.01 if sent >= self.batch_size else self.interval
+
+
+def uses_sheets():
+    # Whether this deployment needs a Google Sheets connection at all
+    return STORAGE_BACKEND != "sql" or SHEETS_REPLICA
+
+
+def from_config(conn=None):
+    if STORAGE_BACKEND == "gsheets":
+        return sheets_storage(conn)
+    if STORAGE_BACKEND == "sql":
+        return SQLStorage()
+    raise StorageError(f"Unknown FIBER_STORAGE_BACKEND {STORAGE_BACKEND!r} (use gsheets or sql)")
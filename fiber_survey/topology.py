@@ -0,0 +1,386 @@
+"""Fiber network graph assembled from the mirrored survey rows.
+
+Every "Main List" row is a line from its source through its intermediate
+points (the "Points" table) to its destination. ``Topology`` keeps these as
+an undirected graph in memory and only reads rows added since the last
+``sync``; a line whose points arrive later is re-laid. Results are memoized
+until the graph changes, so the dashboard can ask for them on every rerun.
+
+Lengths: a line is ``উৎস দূরত্ব + গন্তব্য দূরত্ব`` KM long and each point's
+KM is read as its distance from the source, so the segments are the
+differences between consecutive offsets.
+"""
+import heapq
+import math
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+import pandas as pd
+
+from .geo_index import normalize
+from .points import CORE, DIST, MAIN_TABLE, NAME, POINTS_TABLE, SEQ
+from .schema import (DEST_CORE, DEST_GEO, DEST_KM, DEST_NAME, LINE_ID_COLUMN, SOURCE_CORE, SOURCE_GEO, SOURCE_KM,
+                     SOURCE_NAME)
+from .sqlutil import quote, table_columns
+
+SOURCE = [*SOURCE_GEO, SOURCE_NAME, SOURCE_CORE]
+DEST = [*DEST_GEO, DEST_NAME, DEST_CORE]
+KM = [SOURCE_KM, DEST_KM]
+IN_CHUNK = 500  # SQLite host-parameter limit stays well clear
+
+_normalize = lru_cache(maxsize=65536)(normalize)  # names repeat across lines
+
+
+def _float(value):
+    # KM offset; blank, malformed, negative and non-finite values count as 0
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return number if math.isfinite(number) and number > 0 else 0.0
+
+
+def _core(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class Topology:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.nodes = {}                 # key -> (label, district)
+        self.adj = defaultdict(dict)    # key -> {neighbour: km}
+        self._edge_lines = {}           # (u, v) -> {line: km}
+        self._lines = {}                # line -> [(u, v), ...]
+        self._drops = {}                # line -> [(node, from_core, to_core), ...]
+        self._main_seen = 0
+        self._points_seen = 0
+        self._generations = None
+        self._memo = {}
+        self.version = 0
+
+    # --- building ------------------------------------------------------------
+    def _place(self, values):
+        div, dist, upz, uni, name, _ = values
+        if not name:
+            return None
+        key = ("site", _normalize(div), _normalize(dist), _normalize(upz), _normalize(uni), _normalize(name))
+        if key not in self.nodes:
+            self.nodes[key] = (f"{name} ({', '.join(v for v in (uni, upz, dist) if v)})", dist)
+        return key
+
+    def _set_edge(self, u, v):
+        # Parallel lines between two nodes: the shortest one counts
+        pair = (u, v) if u <= v else (v, u)
+        lengths = self._edge_lines.get(pair)
+        if lengths:
+            km = min(lengths.values())
+            self.adj[u][v] = km
+            self.adj[v][u] = km
+        else:
+            self._edge_lines.pop(pair, None)
+            self.adj[u].pop(v, None)
+            self.adj[v].pop(u, None)
+
+    def _remove_line(self, line):
+        for u, v in self._lines.pop(line, []):
+            pair = (u, v) if u <= v else (v, u)
+            self._edge_lines.get(pair, {}).pop(line, None)
+            self._set_edge(u, v)
+            for node in (u, v):
+                if not self.adj.get(node):
+                    # e.g. a point that was renamed when the line was re-laid
+                    self.adj.pop(node, None)
+                    self.nodes.pop(node, None)
+        self._drops.pop(line, None)
+
+    def _add_line(self, line, row, points):
+        if line in self._lines:
+            self._remove_line(line)
+        src, dst = self._place(row[:6]), self._place(row[6:12])
+        if src is None or dst is None:
+            return
+        district = row[1]
+        total = _float(row[12]) + _float(row[13])
+        chain = [(src, 0.0, _core(row[5]))]
+        for name, core, offset in points:
+            name = str(name).strip()
+            if not name:
+                continue
+            key = ("point", _normalize(district), _normalize(name))
+            if key not in self.nodes:
+                self.nodes[key] = (f"{name} ({district})", district)
+            chain.append((key, min(_float(offset), total), _core(core)))
+        chain.append((dst, total, _core(row[11])))
+
+        segments, drops = [], []
+        for (u, off_u, core_u), (v, off_v, core_v) in zip(chain, chain[1:]):
+            if u == v:
+                continue
+            pair = (u, v) if u <= v else (v, u)
+            km = max(off_v - off_u, 0.0)
+            self._edge_lines.setdefault(pair, {})[line] = km
+            if km < self.adj[u].get(v, float("inf")):
+                self.adj[u][v] = self.adj[v][u] = km
+            segments.append((u, v))
+            if core_u and core_v and core_v < core_u:
+                drops.append((v, core_u, core_v))
+        self._lines[line] = segments
+        if drops:
+            self._drops[line] = drops
+
+    # --- incremental sync from the mirror database ---------------------------
+    def sync(self, con, generations):
+        # generations: (Main List mirror generation, Points mirror generation);
+        # a full resync of either table rebuilds the graph
+        with self._lock:
+            if generations != self._generations:
+                self._reset()
+                self._generations = generations
+            main_cols = set(table_columns(con, MAIN_TABLE))
+            point_cols = set(table_columns(con, POINTS_TABLE))
+            if not set(SOURCE + DEST) <= main_cols:
+                return self.version
+            has_ids = LINE_ID_COLUMN in main_cols
+            has_points = has_ids and LINE_ID_COLUMN in point_cols
+
+            id_sql = quote(LINE_ID_COLUMN) if has_ids else "''"
+            select = ", ".join(["_row", id_sql] + [quote(c) for c in SOURCE + DEST + KM])
+            lines = pd.read_sql_query(
+                f"SELECT {select} FROM {MAIN_TABLE} WHERE _row > ? ORDER BY _row", con, params=(self._main_seen,)
+            )
+            relay = set()
+            new_points = None
+            if has_points:
+                new_points = pd.read_sql_query(
+                    f"SELECT _row, {quote(LINE_ID_COLUMN)} FROM {POINTS_TABLE} WHERE _row > ?",
+                    con, params=(self._points_seen,),
+                )
+                # Points for lines that are already in the graph
+                relay = (set(new_points[LINE_ID_COLUMN]) & set(self._lines)) - set(lines.iloc[:, 1])
+            if relay:
+                lines = pd.concat([lines, self._fetch(con, MAIN_TABLE, select, relay)], ignore_index=True)
+            if lines.empty:
+                if new_points is not None and len(new_points):
+                    self._points_seen = int(new_points["_row"].max())
+                return self.version
+
+            points = {}
+            if has_points:
+                ids = [i for i in lines.iloc[:, 1] if i]
+                cols = ", ".join(quote(c) for c in (LINE_ID_COLUMN, SEQ, NAME, CORE, DIST))
+                if self._main_seen == 0:
+                    frame = pd.read_sql_query(f"SELECT {cols} FROM {POINTS_TABLE}", con)
+                else:
+                    frame = self._fetch(con, POINTS_TABLE, cols, ids)
+                frame[SEQ] = pd.to_numeric(frame[SEQ], errors="coerce")
+                frame = frame.sort_values([LINE_ID_COLUMN, SEQ], kind="stable").fillna("").astype(object)
+                for line_id, _, name, core, km in frame.itertuples(index=False, name=None):
+                    points.setdefault(line_id, []).append((name, core, km))
+
+            for row in lines.fillna("").astype(object).itertuples(index=False, name=None):
+                line = row[1] or f"row:{row[0]}"
+                self._add_line(line, [str(v).strip() for v in row[2:]], points.get(row[1], ()) if row[1] else ())
+            self._main_seen = max(self._main_seen, int(lines["_row"].max()))
+            if new_points is not None and len(new_points):
+                self._points_seen = int(new_points["_row"].max())
+            self._memo.clear()
+            self.version += 1
+            return self.version
+
+    @staticmethod
+    def _fetch(con, table, select, ids):
+        ids = list(ids)
+        parts = []
+        for i in range(0, len(ids), IN_CHUNK):
+            chunk = ids[i:i + IN_CHUNK]
+            marks = ", ".join("?" * len(chunk))
+            parts.append(pd.read_sql_query(
+                f"SELECT {select} FROM {table} WHERE {quote(LINE_ID_COLUMN)} IN ({marks})", con, params=chunk
+            ))
+        if not parts:
+            # Keep the selected columns, e.g. new lines without a Line ID
+            return pd.read_sql_query(f"SELECT {select} FROM {table} WHERE 0", con)
+        return pd.concat(parts, ignore_index=True)
+
+    # --- analysis --------------------------------------------------------------
+    def _cached(self, name, fn):
+        with self._lock:
+            if name not in self._memo:
+                self._memo[name] = fn()
+            return self._memo[name]
+
+    # sync() from another session changes the graph under self._lock; every
+    # read of nodes/adj below holds it too
+    def label(self, key):
+        with self._lock:
+            return self.nodes[key][0]
+
+    def summary(self):
+        return self._cached("summary", lambda: {
+            "nodes": len(self.nodes),
+            "links": len(self._edge_lines),
+            "lines": len(self._lines),
+            "components": len(self._components()),
+            "spof": len(self._articulation()),
+        })
+
+    def _components(self):
+        def build():
+            seen, comps = set(), []
+            for start in self.nodes:
+                if start in seen:
+                    continue
+                seen.add(start)
+                stack, comp = [start], []
+                while stack:
+                    u = stack.pop()
+                    comp.append(u)
+                    for v in self.adj.get(u, ()):
+                        if v not in seen:
+                            seen.add(v)
+                            stack.append(v)
+                comps.append(comp)
+            return comps
+        return self._cached("components", build)
+
+    def components_by_district(self):
+        # Separate networks inside each district (links that stay in the district)
+        def build():
+            parent = {}
+
+            def find(x):
+                while parent.setdefault(x, x) != x:
+                    parent[x] = parent[parent[x]]
+                    x = parent[x]
+                return x
+
+            for u, v in self._edge_lines:
+                if self.nodes[u][1] == self.nodes[v][1]:
+                    parent[find(u)] = find(v)
+            sizes = Counter((self.nodes[k][1], find(k)) for k in self.nodes)
+            rows = defaultdict(list)
+            for (district, _), size in sizes.items():
+                rows[district].append(size)
+            return pd.DataFrame(
+                [(d, len(s), max(s), sum(s)) for d, s in rows.items()],
+                columns=["District", "Components", "Largest", "Nodes"],
+            ).sort_values(["Components", "District"], ascending=[False, True], ignore_index=True)
+        return self._cached("by_district", build)
+
+    def _dijkstra(self, source, target=None):
+        dist, prev = {source: 0.0}, {}
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist.get(u, float("inf")):
+                continue
+            if u == target:
+                break
+            for v, km in self.adj.get(u, {}).items():
+                nd = d + km
+                if nd < dist.get(v, float("inf")):
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(heap, (nd, v))
+        return dist, prev
+
+    def shortest_path(self, source, target):
+        with self._lock:
+            dist, prev = self._dijkstra(source, target)
+        if target not in dist:
+            return None, []
+        path = [target]
+        while path[-1] != source:
+            path.append(prev[path[-1]])
+        return dist[target], path[::-1]
+
+    def longest_routes(self, n=10):
+        # Farthest pair of each component by shortest-path KM (double sweep)
+        def build():
+            rows = []
+            for comp in self._components():
+                if len(comp) < 2:
+                    continue
+                dist, _ = self._dijkstra(comp[0])
+                a = max(dist, key=dist.get)
+                dist, _ = self._dijkstra(a)
+                b = max(dist, key=dist.get)
+                rows.append((self.label(a), self.label(b), round(dist[b], 2), len(comp)))
+            return pd.DataFrame(rows, columns=["From", "To", "KM", "Nodes"]).sort_values("KM", ascending=False)
+        return self._cached("longest", build).head(n)
+
+    def capacity_drops(self):
+        def build():
+            counts = Counter((node, a, b) for drops in self._drops.values() for node, a, b in drops)
+            return pd.DataFrame(
+                [(self.label(node), f"{a} → {b}", c) for (node, a, b), c in counts.items()],
+                columns=["Node", "Core", "Lines"],
+            ).sort_values("Lines", ascending=False, ignore_index=True)
+        return self._cached("drops", build)
+
+    def _articulation(self):
+        # Iterative Tarjan; value is how many nodes lose their path to the rest
+        def build():
+            disc, low, size, cut = {}, {}, {}, defaultdict(int)
+            timer = 0
+            for root in self.nodes:
+                if root in disc:
+                    continue
+                disc[root] = low[root] = timer
+                timer += 1
+                size[root] = 1
+                stack = [(root, None, iter(self.adj.get(root, {})))]
+                root_children = []
+                while stack:
+                    u, parent, it = stack[-1]
+                    advanced = False
+                    for v in it:
+                        if v == parent:
+                            continue
+                        if v in disc:
+                            low[u] = min(low[u], disc[v])
+                        else:
+                            disc[v] = low[v] = timer
+                            timer += 1
+                            size[v] = 1
+                            stack.append((v, u, iter(self.adj.get(v, {}))))
+                            advanced = True
+                            break
+                    if advanced:
+                        continue
+                    stack.pop()
+                    if parent is None:
+                        continue
+                    low[parent] = min(low[parent], low[u])
+                    size[parent] += size[u]
+                    if parent == root:
+                        root_children.append(size[u])
+                    elif low[u] >= disc[parent]:
+                        cut[parent] += size[u]
+                if len(root_children) > 1:
+                    cut[root] = sum(root_children) - max(root_children)
+            return dict(cut)
+        return self._cached("articulation", build)
+
+    def single_points_of_failure(self, n=20):
+        with self._lock:
+            cut = self._articulation()
+            top = heapq.nlargest(n, cut.items(), key=lambda kv: kv[1])
+            return pd.DataFrame(
+                [(self.label(k), self.nodes[k][1], c) for k, c in top], columns=["Node", "District", "Cut off nodes"]
+            )
+
+    def nodes_in(self, district):
+        with self._lock:
+            return sorted((k for k, (_, d) in self.nodes.items() if d == district), key=self.label)
+
+    def districts(self):
+        with self._lock:
+            return sorted({d for _, d in self.nodes.values() if d})
@@ -0,0 +1,205 @@
+"""Declarative validation rules for survey rows.
+
+Rules are keyed on ``DB_COLUMNS`` and evaluated column-wise on a DataFrame,
+so the same code checks one form submission, a bulk import chunk or the whole
+mirrored "Main List". ``validate`` returns one report row per problem.
+
+Errors block a submission; warnings (e.g. a place name that is not in the
+gazetteer because the officer typed it under "অন্যান্য") are only reported.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from . import shared_cache
+from .geo_index import PLACEHOLDER
+from .schema import DEST_CORE, DEST_GEO, DEST_NAME, KM_COLUMNS, POINTS_COLUMN, SOURCE_CORE, SOURCE_GEO, SOURCE_NAME
+
+CORE_TYPES = ["48", "24", "12"]
+MAX_KM = 500  # longer than any plausible single link inside Bangladesh
+REQUIRED_COLUMNS = [
+    "নাম", "যোগাযোগ নম্বর", "পদবী", "কর্মস্থল",
+    *SOURCE_GEO, SOURCE_NAME, SOURCE_CORE,
+    *DEST_GEO, DEST_NAME, DEST_CORE,
+]
+REPORT_COLUMNS = ["সারি (Row)", "কলাম (Column)", "সমস্যা (Error)", "ধরন (Severity)"]
+ERROR, WARNING = "error", "warning"
+
+
+class Rule:
+    severity = ERROR
+
+    def __init__(self, column, message, severity=None):
+        self.column = column
+        self.message = message
+        if severity:
+            self.severity = severity
+
+    def failing(self, df, ctx):
+        # Boolean Series, True where the row breaks the rule
+        raise NotImplementedError
+
+    def report(self, df, ctx):
+        # [(failing mask, column reported)]; nothing if df lacks the column
+        return [(self.failing(df, ctx), self.column)] if self.column in df.columns else []
+
+
+class Required(Rule):
+    def __init__(self, column, message="পূরণ করা হয়নি", severity=None):
+        super().__init__(column, message, severity)
+
+    def failing(self, df, ctx):
+        return df[self.column] == ""
+
+
+class Pattern(Rule):
+    def __init__(self, column, regex, message, severity=None):
+        super().__init__(column, message, severity)
+        self.regex = regex
+
+    def failing(self, df, ctx):
+        values = df[self.column]
+        return (values != "") & ~values.str.fullmatch(self.regex)
+
+
+class OneOf(Rule):
+    def __init__(self, column, allowed, message, severity=None):
+        super().__init__(column, message, severity)
+        self.allowed = set(allowed)
+
+    def failing(self, df, ctx):
+        values = df[self.column]
+        return (values != "") & ~values.isin(self.allowed)
+
+
+class NumberRange(Rule):
+    def __init__(self, column, low, high, message, severity=None):
+        super().__init__(column, message, severity)
+        self.low, self.high = low, high
+
+    def failing(self, df, ctx):
+        km = ctx["numbers"][self.column]
+        bad = ~np.isfinite(km)  # unreadable, or "inf"/"1e400", which to_numeric accepts
+        if self.low is not None:
+            bad |= km < self.low
+        if self.high is not None:
+            bad |= km > self.high
+        return bad
+
+
+class InGazetteer(Rule):
+    # Checks the Division -> Union chain level by level with hashed lookups;
+    # only the first unknown level of a row is reported.
+    severity = WARNING
+
+    def __init__(self, columns, message="গেজেটিয়ারে নেই (তালিকার বাইরে)", severity=None):
+        super().__init__(columns[-1], message, severity)
+        self.columns = columns
+
+    def report(self, df, ctx):
+        # One mask per level, reported against that level's column
+        keysets = ctx.get("gazetteer_keys")
+        if not keysets:
+            return []
+        out = []
+        key = pd.Series("", index=df.index)
+        already_bad = pd.Series(False, index=df.index)
+        for level, col in enumerate(self.columns):
+            key = df[col] if level == 0 else key + "\x1f" + df[col]
+            bad = (df[col] != "") & ~already_bad & ~key.isin(keysets[level])
+            if bad.any():
+                out.append((bad, col))
+            already_bad |= bad | (df[col] == "")
+        return out
+
+
+class PointsJson(Rule):
+    def __init__(self, column=POINTS_COLUMN,
+                 message='JSON তালিকা হতে হবে, যেমন [{"name": ..., "core": ..., "dist": ...}]', severity=None):
+        super().__init__(column, message, severity)
+
+    def failing(self, df, ctx):
+        # Anything not shaped like "[...]" fails without parsing; the rest is
+        # parsed once per distinct value
+        values = df[self.column]
+        bracketed = values.str.startswith("[") & values.str.endswith("]")
+        bad_values = {v for v in pd.unique(values[bracketed]) if not _is_points(v)}
+        return ((values != "") & ~bracketed) | values.isin(bad_values)
+
+
+def _is_points(value):
+    try:
+        points = json.loads(value)
+    except ValueError:
+        return False
+    return isinstance(points, list) and all(isinstance(p, dict) for p in points)
+
+
+RULES = [
+    *[Required(c) for c in REQUIRED_COLUMNS],
+    Pattern("যোগাযোগ নম্বর", r"\d{11}", "১১ ডিজিটের সংখ্যা হতে হবে"),
+    *[OneOf(c, CORE_TYPES, "কোর টাইপ 48, 24 অথবা 12 হতে হবে") for c in (SOURCE_CORE, DEST_CORE)],
+    *[NumberRange(c, 0, None, "শূন্য বা ধনাত্মক সংখ্যা হতে হবে") for c in KM_COLUMNS],
+    *[NumberRange(c, None, MAX_KM, f"{MAX_KM} KM এর বেশি — যাচাই করুন", WARNING) for c in KM_COLUMNS],
+    InGazetteer(SOURCE_GEO),
+    InGazetteer(DEST_GEO),
+    PointsJson(),
+]
+
+
+def gazetteer_keys(tree):
+    # One hash set per level: "div", "div\x1fdist", ... for Series.isin
+    keys = [set(), set(), set(), set()]
+    for div, districts in tree.items():
+        keys[0].add(div)
+        for dist, upazilas in districts.items():
+            keys[1].add(f"{div}\x1f{dist}")
+            for upz, unions in upazilas.items():
+                keys[2].add(f"{div}\x1f{dist}\x1f{upz}")
+                keys[3].update(f"{div}\x1f{dist}\x1f{upz}\x1f{u}" for u in unions)
+    return keys
+
+
+def gazetteer_keys_for_version(tree, version):
+    # gazetteer_keys shared by the host's workers per gazetteer version; None,
+    # and nothing cached, while the gazetteer has not loaded
+    if not tree:
+        return None
+    return shared_cache.get("gazetteer_keys", version, lambda: gazetteer_keys(tree))
+
+
+def normalize_frame(df, columns):
+    # Text columns stripped, placeholders blanked, ".0" dropped from codes that
+    # spreadsheets turned into numbers
+    df = df.reindex(columns=columns, fill_value="")
+    df = df.fillna("").astype(str).apply(lambda s: s.str.strip())
+    df = df.replace(PLACEHOLDER, "")
+    for col in ["যোগাযোগ নম্বর", SOURCE_CORE, DEST_CORE]:
+        if col in df.columns:
+            df[col] = df[col].str.replace(r"\.0$", "", regex=True)
+    return df
+
+
+def validate(df, rules=RULES, gazetteer=None, gazetteer_key_sets=None):
+    # df must already be normalized (see normalize_frame)
+    ctx = {
+        "numbers": {c: pd.to_numeric(df[c].replace("", "0"), errors="coerce") for c in KM_COLUMNS if c in df.columns},
+        "gazetteer_keys": gazetteer_key_sets or (gazetteer_keys(gazetteer) if gazetteer else None),
+    }
+    parts = []
+    for rule in rules:
+        for mask, column in rule.report(df, ctx):
+            mask = mask.to_numpy()
+            if mask.any():
+                parts.append(pd.DataFrame({
+                    REPORT_COLUMNS[0]: df.index[mask], REPORT_COLUMNS[1]: column,
+                    REPORT_COLUMNS[2]: rule.message, REPORT_COLUMNS[3]: rule.severity,
+                }))
+    if not parts:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+def errors_only(report):
+    return report[report[REPORT_COLUMNS[3]] == ERROR]
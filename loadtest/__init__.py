@@ -0,0 +1 @@
+"""Concurrent-surveyor load test against a local Sheets stand-in; run ``python -m loadtest --help``."""
@@ -0,0 +1,387 @@
+"""Load test: ``python -m loadtest [--sessions 50,100,200] [--mode outbox] [--json out.json]``.
+
+Runs N simulated survey sessions at once, each submitting forms the way
+``render_survey_form`` does (build the rows, validate them, then save),
+against the local Google Sheets stand-in in ``sheets_server``. The app's
+own code does the saving:
+
+* ``outbox`` (the app's path): duplicate claim on the mirror and a commit to
+  the local outbox; ``--workers`` flusher threads, one per app process,
+  append to the sheets in the background;
+* ``append``: ``sheets.save_records`` in the request, one row append per
+  worksheet (``FIBER_SHEETS_WRITE_MODE=append`` without the outbox);
+* ``rewrite``: the legacy read, concat and full-sheet update.
+
+The stand-in adds latency and enforces per-minute quotas like Google's
+(``--read-quota``/``--write-quota``, 60 per minute per user by default) and
+can fail a fraction of requests. After the sessions end (and the outbox has
+drained) the sheet is read back and every Line ID a session was told was
+saved is looked up, so the report shows lost and duplicated rows next to
+throughput and submit latency. Each ``--sessions`` level runs on a fresh
+sheet; the level where latency or losses jump is the concurrency ceiling.
+
+Everything runs in a scratch data directory, which is removed afterwards.
+"""
+import argparse
+import collections
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+_USER_DATA_DIR = os.environ.get("FIBER_SURVEY_DATA_DIR")
+WORK_DIR = tempfile.mkdtemp(prefix="fiber-loadtest-")
+os.environ["FIBER_SURVEY_DATA_DIR"] = WORK_DIR  # before fiber_survey.config is imported
+
+import pandas as pd  # noqa: E402
+
+from bench import synthetic  # noqa: E402
+from fiber_survey import dedup, gazetteer, sheets, storage, validation  # noqa: E402
+from fiber_survey.config import BASE_DIR  # noqa: E402
+from fiber_survey.mirror import Mirror  # noqa: E402
+from fiber_survey.outbox import Flusher, Outbox  # noqa: E402
+from fiber_survey.schema import DB_COLUMNS, LINE_ID_COLUMN, MAIN_WORKSHEET, POINT_COLUMNS, POINTS_WORKSHEET  # noqa: E402
+
+from .local_sheets import LocalConnection  # noqa: E402
+from .sheets_server import SheetsServer, SheetsState  # noqa: E402
+
+MODES = ["outbox", "append", "rewrite"]
+SAVED, INVALID, DUPLICATE, FAILED = "saved", "invalid", "duplicate", "failed"
+PERCENTILES = [50, 95, 99]
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def gazetteer_path(explicit=None):
+    user_data = _USER_DATA_DIR or os.path.join(BASE_DIR, "local_data")
+    candidates = [explicit] if explicit else [gazetteer.SNAPSHOT_PATH, os.path.join(user_data, "gazetteer.json.gz")]
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    if explicit:
+        raise SystemExit(f"No gazetteer snapshot at {explicit}")
+    print("No gazetteer snapshot found (run `python -m fiber_survey.gazetteer refresh`); "
+          "using a synthetic gazetteer", flush=True)
+    path = os.path.join(WORK_DIR, "synthetic-gazetteer.json.gz")
+    gazetteer.write_snapshot(synthetic.gazetteer(), path, sources={})
+    return path
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {"commit": commit, "python": platform.python_version(), "pandas": pd.__version__,
+            "when": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def retrying(fn, attempts=8):
+    # For setup and the final read-back, which must get past the quota
+    from gspread.exceptions import APIError
+
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except APIError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(min(2 ** attempt, 30))
+
+
+class Result:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []  # ms per submit
+        self.outcomes = collections.Counter()
+        self.errors = collections.Counter()
+        self.saved_lines = set()
+        self.saved_points = collections.Counter()  # Line ID -> point rows
+
+    def add(self, outcome, ms, records=(), point_rows=(), error=None):
+        with self.lock:
+            self.latencies.append(ms)
+            self.outcomes[outcome] += 1
+            if error is not None:
+                self.errors[_error_kind(error)] += 1
+            if outcome == SAVED:
+                self.saved_lines.update(r[LINE_ID_COLUMN] for r in records)
+                self.saved_points.update(p[LINE_ID_COLUMN] for p in point_rows)
+
+
+def _error_kind(error):
+    response = getattr(error, "response", None)
+    if response is not None:
+        return f"HTTP {response.status_code}"
+    return type(error).__name__
+
+
+class Target:
+    # What a session's submit button does in one mode
+    def __init__(self, mode, conn, keys, scratch, workers):
+        self.mode = mode
+        self.conn = conn
+        self.keys = keys
+        self.flushers = []
+        if mode == "outbox":
+            self.mirror = Mirror(path=os.path.join(scratch, "mirror.sqlite3"), hooks=[dedup.LineHashes()])
+            path = os.path.join(scratch, "outbox.sqlite3")
+            self.outbox = Outbox(path=path)
+            # One outbox connection and flusher per simulated app process
+            self.flushers = [Flusher(Outbox(path=path), storage.SheetsStorage(conn)) for _ in range(workers)]
+
+    def start(self):
+        for flusher in self.flushers:
+            flusher.start()
+
+    def stop(self):
+        for flusher in self.flushers:
+            flusher.stop()
+
+    def submit(self, officer, fiber_records, result):
+        records, point_rows = synthetic.submit_records(officer, fiber_records)
+        start = time.perf_counter()
+        frame = validation.normalize_frame(pd.DataFrame(records), DB_COLUMNS)
+        frame.index = pd.RangeIndex(1, len(frame) + 1)
+        if not validation.errors_only(validation.validate(frame, gazetteer_key_sets=self.keys)).empty:
+            return result.add(INVALID, _ms(start))
+        try:
+            if self.mode == "outbox":
+                status = self.mirror.query(dedup.claim, frame)
+                keep = (status != dedup.DUPLICATE).to_numpy()
+                records = [r for r, k in zip(records, keep) if k]
+                if not records:
+                    return result.add(DUPLICATE, _ms(start))
+                kept = {r[LINE_ID_COLUMN] for r in records}
+                point_rows = [p for p in point_rows if p[LINE_ID_COLUMN] in kept]
+                try:
+                    self.outbox.enqueue_many({MAIN_WORKSHEET: records, POINTS_WORKSHEET: point_rows})
+                except Exception:
+                    self.mirror.query(dedup.release, frame[keep])
+                    raise
+            else:
+                sheets.save_records(self.conn, records, MAIN_WORKSHEET, DB_COLUMNS, mode=self.mode)
+                if point_rows:
+                    sheets.save_records(self.conn, point_rows, POINTS_WORKSHEET, POINT_COLUMNS, mode=self.mode)
+        except Exception as e:
+            return result.add(FAILED, _ms(start), error=e)
+        result.add(SAVED, _ms(start), records, point_rows)
+
+    def drain(self, timeout):
+        # Seconds until the outbox is empty, or None if it is not by timeout
+        if self.mode != "outbox":
+            return 0.0
+        start = time.monotonic()
+        while self.outbox.stats()["pending"]:
+            if time.monotonic() - start > timeout:
+                return None
+            self.outbox.wakeup.set()
+            time.sleep(0.2)
+        return time.monotonic() - start
+
+    def queue_delays(self):
+        # Seconds from submit to append, per row the flushers sent
+        if self.mode != "outbox":
+            return [], 0
+        with self.outbox._lock:
+            rows = self.outbox._con.execute(
+                "SELECT created_at, flushed_at, attempts FROM outbox WHERE status = 'flushed'"
+            ).fetchall()
+        fmt = "%Y-%m-%d %H:%M:%S"
+        delays = [(time.mktime(time.strptime(f, fmt)) - time.mktime(time.strptime(c, fmt))) for c, f, _ in rows]
+        return delays, sum(1 for *_, attempts in rows if attempts)
+
+
+def _ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def session(target, forms, think, ramp, seed, result):
+    rng = random.Random(seed)
+    time.sleep(rng.uniform(0, ramp))
+    for i, (officer, fiber_records) in enumerate(forms):
+        if i:
+            time.sleep(think * rng.uniform(0.5, 1.5))
+        target.submit(officer, fiber_records, result)
+
+
+def seed_sheet(state, tree, rows, seed):
+    # Both worksheets with their header, and --rows existing "Main List" rows
+    # so the rewrite path reads a realistic sheet
+    for title, columns in ((MAIN_WORKSHEET, DB_COLUMNS), (POINTS_WORKSHEET, POINT_COLUMNS)):
+        state.add_sheet(title).values = [list(columns)]
+    if rows:
+        lines = synthetic.main_list(tree, rows, seed)
+        state.sheets[MAIN_WORKSHEET].values += lines[DB_COLUMNS].astype(str).values.tolist()
+
+
+def read_back(conn):
+    # Line IDs in the sheets, with how often each appears
+    main = retrying(lambda: conn.read(worksheet=MAIN_WORKSHEET))
+    pts = retrying(lambda: conn.read(worksheet=POINTS_WORKSHEET))
+    lines = collections.Counter(main[LINE_ID_COLUMN]) if LINE_ID_COLUMN in main.columns else collections.Counter()
+    point_ids = collections.Counter(pts[LINE_ID_COLUMN]) if LINE_ID_COLUMN in pts.columns else collections.Counter()
+    return lines, point_ids
+
+
+def run_level(args, tree, keys, sessions, level):
+    scratch = tempfile.mkdtemp(dir=WORK_DIR)
+    state = SheetsState(args.latency, args.jitter, args.read_quota, args.write_quota, args.error_rate, args.seed)
+    server = SheetsServer(state).start()
+    target = None
+    try:
+        conn = LocalConnection(server.url, pool_size=sessions + args.workers + 4)
+        seed_sheet(state, tree, args.rows, args.seed)
+        forms = synthetic.form_submissions(tree, sessions * args.submissions, args.lines, args.points,
+                                           seed=args.seed + 1000 + level)
+        target = Target(args.mode, conn, keys, scratch, args.workers)
+        target.start()
+        result = Result()
+        threads = [threading.Thread(
+            target=session, name=f"session-{i}",
+            args=(target, forms[i * args.submissions:(i + 1) * args.submissions], args.think, args.ramp,
+                  args.seed + i, result),
+        ) for i in range(sessions)]
+        stats_before = state.stats.copy()
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        drain = target.drain(args.drain_timeout)
+        delays, retried = target.queue_delays()
+        lines, point_ids = read_back(conn)
+        server_stats = state.stats - stats_before
+    finally:
+        if target is not None:
+            target.stop()
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    saved = result.saved_lines
+    lost = sorted(i for i in saved if not lines.get(i))
+    duplicated = sum(n - 1 for i, n in lines.items() if i in saved and n > 1)
+    points_lost = sum(max(n - point_ids.get(i, 0), 0) for i, n in result.saved_points.items())
+    points_duplicated = sum(max(point_ids.get(i, 0) - n, 0) for i, n in result.saved_points.items())
+    latencies = result.latencies
+    return {
+        "mode": args.mode, "sessions": sessions, "submissions": len(latencies),
+        "saved": result.outcomes[SAVED], "failed": result.outcomes[FAILED],
+        "duplicate": result.outcomes[DUPLICATE], "invalid": result.outcomes[INVALID],
+        "elapsed_s": round(elapsed, 3),
+        "submits_per_s": round(result.outcomes[SAVED] / elapsed, 2) if elapsed else None,
+        **{f"p{p}_ms": _round(percentile(latencies, p)) for p in PERCENTILES},
+        "max_ms": _round(max(latencies, default=None)),
+        "drain_s": _round(drain),
+        "lines_saved": len(saved), "lines_lost": len(lost), "lines_duplicated": duplicated,
+        "points_lost": points_lost, "points_duplicated": points_duplicated,
+        "queue_p50_s": _round(percentile(delays, 50)), "queue_p95_s": _round(percentile(delays, 95)),
+        "queue_max_s": _round(max(delays, default=None)), "rows_retried": retried,
+        "errors": dict(result.errors),
+        "api": {k: v for k, v in server_stats.items() if v},
+        "lost_sample": lost[:10],
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def _cell(value, width):
+    text = "-" if value is None else f"{value:.1f}" if isinstance(value, float) else str(value)
+    return f"{text:>{width}}"
+
+
+def print_report(row):
+    print(f"  {row['sessions']:>8} {row['submissions']:>7} {row['saved']:>6} {row['failed']:>6}"
+          f"{_cell(row['submits_per_s'], 9)}{_cell(row['p50_ms'], 9)}{_cell(row['p95_ms'], 9)}"
+          f"{_cell(row['p99_ms'], 9)}{_cell(row['drain_s'], 8)}{row['lines_lost']:>6}{row['lines_duplicated']:>6}",
+          flush=True)
+    details = []
+    if row["errors"]:
+        details.append("errors " + ", ".join(f"{k}: {v}" for k, v in sorted(row["errors"].items())))
+    api = row["api"]
+    details.append(f"API {api.get('read_requests', 0)} reads, {api.get('write_requests', 0)} writes, "
+                   f"{api.get('http_429', 0)} over quota, {api.get('http_503', 0)} unavailable")
+    if row["mode"] == "outbox":
+        details.append(f"queue p50/p95/max {_cell(row['queue_p50_s'], 0)}/{_cell(row['queue_p95_s'], 0)}/"
+                       f"{_cell(row['queue_max_s'], 0)} s, {row['rows_retried']} rows retried")
+    if row["drain_s"] is None:
+        details.append("outbox not drained by --drain-timeout; undrained rows count as lost")
+    if row["points_lost"] or row["points_duplicated"]:
+        details.append(f"points lost {row['points_lost']}, duplicated {row['points_duplicated']}")
+    for line in details:
+        print(f"  {'':>8} {line}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m loadtest")
+    parser.add_argument("--sessions", default="10,50,100", help="concurrent sessions per level, e.g. 50,100,200")
+    parser.add_argument("--mode", choices=MODES, default="outbox")
+    parser.add_argument("--submissions", type=int, default=3, help="forms submitted per session")
+    parser.add_argument("--lines", type=int, default=2, help="fiber lines per form")
+    parser.add_argument("--points", type=int, default=1, help="intermediate points per line")
+    parser.add_argument("--think", type=float, default=2.0, help="mean seconds between a session's submits")
+    parser.add_argument("--ramp", type=float, default=5.0, help="sessions start within this many seconds")
+    parser.add_argument("--rows", type=parse_size, default=0, help="rows already in Main List, e.g. 10k")
+    parser.add_argument("--workers", type=int, default=1, help="app processes (outbox flushers)")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds added to each Sheets request")
+    parser.add_argument("--jitter", type=float, default=0.2, help="up to this many more seconds, at random")
+    parser.add_argument("--read-quota", type=int, default=60, help="read requests per minute, 0 for none")
+    parser.add_argument("--write-quota", type=int, default=60, help="write requests per minute, 0 for none")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failed with 503")
+    parser.add_argument("--drain-timeout", type=float, default=300, help="seconds to wait for the outbox")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gazetteer", help="gazetteer snapshot to use (default: the app's)")
+    parser.add_argument("--json", help="write the results here")
+    args = parser.parse_args(argv)
+
+    levels = [int(s) for s in args.sessions.split(",") if s.strip()]
+    rows = []
+    print(f"mode {args.mode}: {args.submissions} forms x {args.lines} lines per session, "
+          f"{args.latency}+{args.jitter}s latency, quotas {args.read_quota or '-'} reads / "
+          f"{args.write_quota or '-'} writes per minute, error rate {args.error_rate}")
+    print(f"  {'sessions':>8} {'submits':>7} {'saved':>6} {'failed':>6} {'saved/s':>8} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'drain s':>7} {'lost':>5} {'dupes':>5}")
+    try:
+        tree = gazetteer.read_snapshot(gazetteer_path(args.gazetteer))["tree"]
+        keys = validation.gazetteer_keys(tree)
+        for level, sessions in enumerate(levels):
+            row = run_level(args, tree, keys, sessions, level)
+            rows.append(row)
+            print_report(row)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "settings": vars(args), "results": rows}, f,
+                      ensure_ascii=False, indent=1)
+    return 1 if any(r["lines_lost"] or r["lines_duplicated"] for r in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""``GSheetsConnection`` look-alike that talks to the local Sheets stand-in.
+
+It exposes what the app uses from the real connection: ``conn.read`` and
+``conn.update`` (the legacy rewrite path) and the service account client's
+``_open_spreadsheet``/``_select_worksheet`` (the append path and the
+mirror). Requests go through gspread itself, over HTTP, with the Google API
+host swapped for the stand-in, so request counts, error handling and
+serialization are those of production. Like the real client, every worksheet
+lookup re-reads the spreadsheet metadata.
+"""
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from .sheets_server import SPREADSHEET_ID
+
+GOOGLE_API = "https://sheets.googleapis.com"
+
+
+class LocalSession(requests.Session):
+    def __init__(self, base_url, pool_size=10):
+        super().__init__()
+        self.base_url = base_url.rstrip("/")
+        self.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def request(self, method, url, *args, **kwargs):
+        if url.startswith(GOOGLE_API):
+            url = self.base_url + url[len(GOOGLE_API):]
+        return super().request(method, url, *args, **kwargs)
+
+
+class LocalClient:
+    def __init__(self, base_url, pool_size=10):
+        import gspread
+
+        self._client = gspread.Client(None, session=LocalSession(base_url, pool_size))
+
+    def _open_spreadsheet(self, **kwargs):
+        return self._client.open_by_key(SPREADSHEET_ID)
+
+    def _select_worksheet(self, worksheet=None, **kwargs):
+        spreadsheet = self._open_spreadsheet()
+        if isinstance(worksheet, str):
+            return spreadsheet.worksheet(worksheet)
+        return spreadsheet.get_worksheet(worksheet or 0)
+
+
+class LocalConnection:
+    def __init__(self, base_url, pool_size=10):
+        self.client = LocalClient(base_url, pool_size)
+
+    def read(self, worksheet=None, ttl=None, **kwargs):
+        values = self.client._select_worksheet(worksheet=worksheet).get_all_values()
+        if not values:
+            return pd.DataFrame()
+        return pd.DataFrame(values[1:], columns=values[0])
+
+    def update(self, worksheet=None, data=None, **kwargs):
+        # Same calls as GSheetsServiceAccountClient.update, minus formatting
+        from gspread_dataframe import set_with_dataframe
+
+        ws = self.client._select_worksheet(worksheet=worksheet)
+        ws.clear()
+        set_with_dataframe(ws, data)
+        return data
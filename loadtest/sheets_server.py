@@ -0,0 +1,353 @@
+"""Local HTTP stand-in for the Google Sheets v4 API.
+
+Serves the calls gspread makes for the survey app: spreadsheet metadata,
+``values.get``/``batchGet``/``update``/``append``/``clear`` and the ``batchUpdate``
+requests that add and resize worksheets. Every request can be delayed
+(``latency`` plus uniform ``jitter``), read and write requests are counted
+against per-minute quotas like Google's per-user limits, and a fraction of
+requests can be failed at random. Over quota the server answers 429
+RESOURCE_EXHAUSTED with the same JSON body as Google, so gspread raises the
+same ``APIError``.
+
+Each request is applied under one lock, as Sheets applies one request
+atomically; interleaving between requests is left to the clients.
+
+Standalone: ``python -m loadtest.sheets_server --port 8765 --latency 0.3``.
+"""
+import argparse
+import collections
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+SPREADSHEET_ID = "loadtest"
+DEFAULT_ROWS = 1000
+DEFAULT_COLS = 26
+_A1 = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def _col(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def _letters(n):
+    out = ""
+    while n:
+        n, rem = divmod(n - 1, 26)
+        out = chr(65 + rem) + out
+    return out
+
+
+def parse_range(text):
+    # "'Main List'!A2:V" -> ("Main List", first row, first col, last row, last col);
+    # open ends are None
+    title, _, cells = text.rpartition("!") if "!" in text else (text, "", "")
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    if not cells:
+        return title, 1, 1, None, None
+    start, _, end = cells.partition(":")
+    m1, m2 = _A1.match(start), _A1.match(end or start)
+    if not m1 or not m2:
+        raise ValueError(f"Unable to parse range: {text}")
+    row1, col1 = int(m1.group(2) or 1), _col(m1.group(1)) or 1
+    row2 = int(m2.group(2)) if m2.group(2) else None
+    col2 = _col(m2.group(1)) or None
+    return title, row1, col1, row2, col2
+
+
+class Quota:
+    # Requests allowed per rolling minute; None for no limit
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self._times = collections.deque()
+
+    def take(self, now):
+        if not self.per_minute:
+            return
+        while self._times and now - self._times[0] >= 60:
+            self._times.popleft()
+        if len(self._times) >= self.per_minute:
+            raise QuotaExceeded()
+        self._times.append(now)
+
+
+class Sheet:
+    def __init__(self, sheet_id, title, rows=DEFAULT_ROWS, cols=DEFAULT_COLS):
+        self.id = sheet_id
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.values = []  # lists of strings, trailing blanks trimmed
+
+    def properties(self, index):
+        return {"sheetId": self.id, "title": self.title, "index": index, "sheetType": "GRID",
+                "gridProperties": {"rowCount": self.row_count, "columnCount": self.col_count}}
+
+    def used_rows(self):
+        n = len(self.values)
+        while n and not any(self.values[n - 1]):
+            n -= 1
+        return n
+
+    def read(self, row1, col1, row2, col2):
+        out = []
+        for row in self.values[row1 - 1:row2 if row2 else None]:
+            row = row[col1 - 1:col2 if col2 else None]
+            while row and row[-1] == "":
+                row = row[:-1]
+            out.append(row)
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def write(self, row1, col1, values):
+        for i, new in enumerate(values):
+            while len(self.values) < row1 + i:
+                self.values.append([])
+            row = self.values[row1 - 1 + i]
+            if len(row) < col1 - 1 + len(new):
+                row.extend([""] * (col1 - 1 + len(new) - len(row)))
+            row[col1 - 1:col1 - 1 + len(new)] = [_cell(v) for v in new]
+        self.row_count = max(self.row_count, row1 - 1 + len(values))
+        self.col_count = max([self.col_count] + [col1 - 1 + len(v) for v in values])
+
+    def clear(self, row1, col1, row2, col2):
+        for row in self.values[row1 - 1:row2 if row2 else None]:
+            stop = min(len(row), col2) if col2 else len(row)
+            row[col1 - 1:stop] = [""] * max(stop - col1 + 1, 0)
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class SheetsState:
+    def __init__(self, latency=0.0, jitter=0.0, read_quota=None, write_quota=None, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.read_quota = Quota(read_quota)
+        self.write_quota = Quota(write_quota)
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sheets = {}
+        self.stats = collections.Counter()
+
+    def sheet(self, title):
+        sheet = self.sheets.get(title)
+        if sheet is None:
+            raise KeyError(title)
+        return sheet
+
+    def add_sheet(self, title, rows=DEFAULT_ROWS, cols=DEFAULT_COLS):
+        if title in self.sheets:
+            raise ValueError(f'A sheet with the name "{title}" already exists.')
+        sheet = Sheet(max([s.id for s in self.sheets.values()], default=0) + 1, title, rows, cols)
+        self.sheets[title] = sheet
+        return sheet
+
+    def metadata(self):
+        return {"spreadsheetId": SPREADSHEET_ID, "properties": {"title": "Fiber survey (load test)"},
+                "sheets": [{"properties": s.properties(i)} for i, s in enumerate(self.sheets.values())]}
+
+    def values(self, title):
+        # Snapshot of a worksheet's rows, for checking results
+        with self.lock:
+            return [list(r) for r in self.sheet(title).values]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None  # SheetsState, set per server
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, message, reason):
+        self.state.stats[f"http_{status}"] += 1
+        return status, {"error": {"code": status, "message": message, "status": reason}}
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _handle(self, method):
+        state = self.state
+        url = urlparse(self.path)
+        params = {k: v if k == "ranges" else v[-1] for k, v in parse_qs(url.query).items()}
+        body = self._body() if method in ("POST", "PUT") else {}
+        delay = state.latency + state.random.uniform(0, state.jitter) if state.latency or state.jitter else 0
+        if delay:
+            time.sleep(delay)
+        with state.lock:
+            status, reply = self._dispatch(method, url.path, params, body)
+        self._reply(status, reply)
+
+    def _dispatch(self, method, path, params, body):
+        state = self.state
+        prefix = f"/v4/spreadsheets/{SPREADSHEET_ID}"
+        if not path.startswith(prefix):
+            return self._error(404, "Requested entity was not found.", "NOT_FOUND")
+        write = method != "GET"
+        state.stats["write_requests" if write else "read_requests"] += 1
+        try:
+            (state.write_quota if write else state.read_quota).take(time.monotonic())
+        except QuotaExceeded:
+            metric = "Write requests" if write else "Read requests"
+            return self._error(429, f"Quota exceeded for quota metric '{metric}' and limit "
+                                    f"'{metric} per minute per user' of service 'sheets.googleapis.com'.",
+                               "RESOURCE_EXHAUSTED")
+        if state.error_rate and state.random.random() < state.error_rate:
+            return self._error(503, "The service is currently unavailable.", "UNAVAILABLE")
+        try:
+            return self._apply(method, path[len(prefix):], params, body)
+        except KeyError as e:
+            return self._error(400, f"Unable to parse range: {e.args[0]}", "INVALID_ARGUMENT")
+        except ValueError as e:
+            return self._error(400, str(e), "INVALID_ARGUMENT")
+
+    def _apply(self, method, path, params, body):
+        state = self.state
+        if path == "" and method == "GET":
+            return 200, state.metadata()
+        if path == ":batchUpdate" and method == "POST":
+            return 200, {"spreadsheetId": SPREADSHEET_ID, "replies": [self._request(r) for r in body["requests"]]}
+        if path == "/values:batchGet" and method == "GET":
+            ranges = []
+            for target in params.get("ranges", []):
+                title, row1, col1, row2, col2 = parse_range(target)
+                values = state.sheet(title).read(row1, col1, row2, col2)
+                ranges.append({"range": target, "majorDimension": "ROWS", **({"values": values} if values else {})})
+            return 200, {"spreadsheetId": SPREADSHEET_ID, "valueRanges": ranges}
+        if not path.startswith("/values/"):
+            raise ValueError(f"Unsupported request {method} {path}")
+        # The action suffix is the only unescaped ":" in the path
+        target, _, action = path[len("/values/"):].partition(":")
+        target = unquote(target)
+        title, row1, col1, row2, col2 = parse_range(target)
+        sheet = state.sheet(title)
+        if method == "GET":
+            values = sheet.read(row1, col1, row2, col2)
+            reply = {"range": target, "majorDimension": "ROWS"}
+            if values:
+                reply["values"] = values
+            return 200, reply
+        if method == "PUT":
+            values = body.get("values") or []
+            sheet.write(row1, col1, values)
+            state.stats["rows_written"] += len(values)
+            return 200, {"spreadsheetId": SPREADSHEET_ID, "updatedRange": target, "updatedRows": len(values)}
+        if action == "append":
+            values = body.get("values") or []
+            start = sheet.used_rows() + 1
+            if params.get("insertDataOption") == "INSERT_ROWS":
+                sheet.values[start - 1:start - 1] = [[] for _ in values]
+            sheet.write(start, col1, values)
+            state.stats["rows_appended"] += len(values)
+            updated = f"'{title}'!{_letters(col1)}{start}:{_letters(col1 + max(map(len, values), default=1) - 1)}" \
+                      f"{start + len(values) - 1}"
+            return 200, {"spreadsheetId": SPREADSHEET_ID, "tableRange": target,
+                         "updates": {"spreadsheetId": SPREADSHEET_ID, "updatedRange": updated,
+                                     "updatedRows": len(values)}}
+        if action == "clear":
+            sheet.clear(row1, col1, row2, col2)
+            return 200, {"spreadsheetId": SPREADSHEET_ID, "clearedRange": target}
+        raise ValueError(f"Unsupported request {method} {path}")
+
+    def _request(self, request):
+        # batchUpdate: sheets can be added and resized; formatting is accepted
+        # and ignored
+        state = self.state
+        if "addSheet" in request:
+            props = request["addSheet"].get("properties", {})
+            grid = props.get("gridProperties", {})
+            sheet = state.add_sheet(props["title"], grid.get("rowCount", DEFAULT_ROWS),
+                                    grid.get("columnCount", DEFAULT_COLS))
+            return {"addSheet": {"properties": sheet.properties(len(state.sheets) - 1)}}
+        if "updateSheetProperties" in request:
+            props = request["updateSheetProperties"]["properties"]
+            grid = props.get("gridProperties", {})
+            for sheet in state.sheets.values():
+                if sheet.id == props.get("sheetId"):
+                    sheet.row_count = grid.get("rowCount", sheet.row_count)
+                    sheet.col_count = grid.get("columnCount", sheet.col_count)
+                    del sheet.values[sheet.row_count:]
+        return {}
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+
+class SheetsServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, state, host="127.0.0.1", port=0):
+        handler = type("BoundHandler", (Handler,), {"state": state})
+        super().__init__((host, port), handler)
+        self.state = state
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name="sheets-server", daemon=True)
+        thread.start()
+        return self
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m loadtest.sheets_server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many more seconds, at random")
+    parser.add_argument("--read-quota", type=int, help="read requests per minute (Google: 60 per user)")
+    parser.add_argument("--write-quota", type=int, help="write requests per minute (Google: 60 per user)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failed with 503")
+    args = parser.parse_args(argv)
+    state = SheetsState(args.latency, args.jitter, args.read_quota, args.write_quota, args.error_rate)
+    server = SheetsServer(state, args.host, args.port)
+    print(f"Sheets stand-in on {server.url} (spreadsheet id {SPREADSHEET_ID!r})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,35 @@
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+# fiber_survey.config reads the data directory at import
+os.environ["FIBER_SURVEY_DATA_DIR"] = tempfile.mkdtemp(prefix="fiber-survey-tests-")
+os.environ.setdefault("FIBER_SHARED_CACHE_DIR", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Tables:
+    # Mirrored "Main List" and "Points" tables in memory; query() and table
+    # are what export and the checks use of a Mirror
+    def __init__(self, lines=(), points=()):
+        from fiber_survey.points import MAIN_TABLE, POINTS_TABLE
+        from fiber_survey.schema import DB_COLUMNS, POINT_COLUMNS
+
+        self.table = MAIN_TABLE
+        self.con = sqlite3.connect(":memory:")
+        for table, columns, rows in ((MAIN_TABLE, DB_COLUMNS, lines), (POINTS_TABLE, POINT_COLUMNS, points)):
+            quoted = [f'"{c}"' for c in columns]
+            self.con.execute(f"CREATE TABLE {table} (_row INTEGER PRIMARY KEY, {', '.join(q + ' TEXT' for q in quoted)})")
+            self.con.executemany(f"INSERT INTO {table} ({', '.join(quoted)}) VALUES ({', '.join('?' * len(columns))})",
+                                 [[str(r.get(c, "")) for c in columns] for r in rows])
+
+    def query(self, fn, *args, **kwargs):
+        return fn(self.con, *args, **kwargs)
+
+
+@pytest.fixture
+def tables():
+    return Tables
@@ -0,0 +1,72 @@
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from fiber_survey import dedup
+
+
+def line(**overrides):
+    row = {
+        "উৎস বিভাগ": "ঢাকা", "উৎস জেলা": "গাজীপুর", "উৎস উপজেলা": "কালিয়াকৈর", "উৎস (Source Name)": "POP A",
+        "গন্তব্য বিভাগ": "ঢাকা", "গন্তব্য জেলা": "গাজীপুর", "গন্তব্য উপজেলা": "কালিয়াকৈর",
+        "গন্তব্য (Destination Name)": "POP B", "উৎস কোর টাইপ": "24", "গন্তব্য কোর টাইপ": "24",
+        "উৎস দূরত্ব (KM)": "1.5", "গন্তব্য দূরত্ব (KM)": "2", "ডিপেন্ডেন্সি (KM)": "0",
+    }
+    row.update(overrides)
+    return row
+
+
+def test_same_line_same_hash_reversed_line_same_link():
+    reversed_line = line(**{"উৎস (Source Name)": "POP B", "গন্তব্য (Destination Name)": "POP A"})
+    keys = dedup.content_keys(pd.DataFrame([line(), line(), reversed_line]))
+    assert keys["hash"][0] == keys["hash"][1] != keys["hash"][2]
+    assert keys["link"].nunique() == 1
+
+
+def test_distances_hash_to_the_metre():
+    keys = dedup.content_keys(pd.DataFrame([line(), line(**{"উৎস দূরত্ব (KM)": "1.5000001"}),
+                                            line(**{"উৎস দূরত্ব (KM)": "1.501"})]))
+    assert keys["hash"][0] == keys["hash"][1] != keys["hash"][2]
+
+
+def test_non_finite_distances_do_not_raise():
+    df = pd.DataFrame([line(**{"উৎস দূরত্ব (KM)": v}) for v in ("inf", "-inf", "1e400", "1e300", "nan")])
+    keys = dedup.content_keys(df)
+    assert keys["hash"].nunique() == 1  # all read as 0 KM
+
+
+def test_hook_stores_rows_with_infinite_distance():
+    con = sqlite3.connect(":memory:")
+    hook = dedup.LineHashes()
+    hook.setup(con)
+    hook.apply(con, pd.DataFrame([line(**{"গন্তব্য দূরত্ব (KM)": "inf"})], index=[2]))
+    assert con.execute("SELECT row FROM line_hashes").fetchall() == [(2,)]
+
+
+def test_claim_rejects_a_second_submit():
+    con = sqlite3.connect(":memory:")
+    dedup.LineHashes().setup(con)
+    df = pd.DataFrame([line()])
+    assert list(dedup.claim(con, df)) == [dedup.NEW]
+    assert list(dedup.claim(con, df)) == [dedup.DUPLICATE]
+
+
+def test_claim_waits_for_a_claim_in_another_connection(tmp_path):
+    # Another worker has registered the same line but not committed yet
+    path = str(tmp_path / "mirror.sqlite3")
+    other = sqlite3.connect(path, check_same_thread=False)
+    other.execute("PRAGMA journal_mode=WAL")
+    dedup.LineHashes().setup(other)
+    df = pd.DataFrame([line()])
+    other.execute("BEGIN IMMEDIATE")
+    other.execute("INSERT INTO line_hashes (hash, link, row, added) VALUES (?, ?, NULL, '')",
+                  tuple(dedup.content_keys(df).iloc[0]))
+    result = []
+    worker = threading.Thread(target=lambda: result.extend(dedup.claim(sqlite3.connect(path, timeout=10), df)))
+    worker.start()
+    time.sleep(0.2)
+    other.commit()
+    worker.join()
+    assert result == [dedup.DUPLICATE]
@@ -0,0 +1,36 @@
+from fiber_survey import distance_checks as dc
+from fiber_survey.schema import DEPENDENCY_KM, DEST_KM, LINE_ID_COLUMN, POINT_COLUMNS, SOURCE_KM
+
+SEQ, NAME, CORE, DIST = POINT_COLUMNS[1:]
+
+
+def line(src, dst, dep="0", district="গাজীপুর", line_id=""):
+    return {SOURCE_KM: src, DEST_KM: dst, DEPENDENCY_KM: dep, dc.DISTRICT_COLUMN: district, LINE_ID_COLUMN: line_id}
+
+
+def findings(tables, lines, points=(), **kwargs):
+    db = tables(lines, points)
+    result = dc.scan(db.con, **kwargs)
+    return {(row, check) for row, check in zip(result["_row"], result["check"])}
+
+
+def test_consistent_lines_pass(tables):
+    assert findings(tables, [line("1", "2", "1.5")]) == set()
+
+
+def test_dependency_and_zero_length(tables):
+    assert findings(tables, [line("1", "2", "3.5"), line("0", "", "0"), line("inf", "1e400")]) == {
+        (1, dc.DEPENDENCY), (2, dc.ZERO_LENGTH), (3, dc.ZERO_LENGTH)}
+
+
+def test_points_beyond_the_line_or_out_of_order(tables):
+    points = [{LINE_ID_COLUMN: "a", SEQ: "1", DIST: "2"}, {LINE_ID_COLUMN: "a", SEQ: "2", DIST: "1"},
+              {LINE_ID_COLUMN: "b", SEQ: "1", DIST: "9"}]
+    assert findings(tables, [line("1", "2", line_id="a"), line("1", "2", line_id="b")], points) == {
+        (1, dc.POINT_ORDER), (2, dc.POINT_BEYOND)}
+
+
+def test_length_outliers_within_a_district(tables):
+    lines = [line(str(2 + i % 3 * 0.1), "1") for i in range(10)] + [line("400", "1")]
+    assert findings(tables, lines) == {(11, dc.OUTLIER)}
+    assert findings(tables, lines, min_group=20) == set()
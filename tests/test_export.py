@@ -0,0 +1,72 @@
+import json
+
+import pandas as pd
+import pytest
+
+from fiber_survey import export, frames
+from fiber_survey.points import POINTS_TABLE
+from fiber_survey.schema import LINE_ID_COLUMN, POINT_COLUMNS, POINTS_COLUMN
+
+SEQ, NAME, CORE, DIST = POINT_COLUMNS[1:]
+LINES = [
+    {"উৎস জেলা": "গাজীপুর", "উৎস উপজেলা": "কালিয়াকৈর", "গন্তব্য জেলা": "ঢাকা", "গন্তব্য উপজেলা": "সাভার",
+     "উৎস দূরত্ব (KM)": "1.25", "গন্তব্য দূরত্ব (KM)": "inf", "Timestamp": "2026-10-01 10:00:00",
+     LINE_ID_COLUMN: "a1"},
+    {"উৎস জেলা": "খুলনা", "উৎস দূরত্ব (KM)": "", "Timestamp": "2026-10-02",
+     POINTS_COLUMN: json.dumps([{"name": "P", "core": "24", "dist": "0.5"}])},
+]
+POINTS = [{LINE_ID_COLUMN: "a1", SEQ: "2", NAME: "Y", CORE: "12", DIST: "0.9"},
+          {LINE_ID_COLUMN: "a1", SEQ: "1", NAME: "X", CORE: "24", DIST: "0.4"}]
+
+
+@pytest.fixture
+def mirror(tables):
+    return tables(LINES, POINTS)
+
+
+def test_read_chunk_parses_km_and_attaches_points(mirror):
+    chunk = mirror.query(export.read_chunk, mirror.table, POINTS_TABLE)
+    assert chunk["উৎস দূরত্ব (KM)"].tolist()[0] == 1.25
+    assert chunk["গন্তব্য দূরত্ব (KM)"].isna().all()  # "inf" and blank alike
+    assert [p["name"] for p in chunk.loc[1, POINTS_COLUMN]] == ["X", "Y"]
+    assert chunk.loc[2, POINTS_COLUMN] == [{"seq": 1, "name": "P", "core": "24", "dist": 0.5}]
+
+
+def test_chunks_follow_filters_and_row_order(mirror):
+    chunks = list(export.iter_chunks(mirror, POINTS_TABLE, chunk_size=1))
+    assert [list(c.index) for c in chunks] == [[1], [2]]
+    only = list(export.iter_chunks(mirror, POINTS_TABLE, {"উৎস জেলা": "খুলনা"}))
+    assert [list(c.index) for c in only] == [[2]]
+
+
+def test_csv_keeps_points_as_json(mirror, tmp_path):
+    path = tmp_path / "out.csv"
+    export.write_csv(export.iter_chunks(mirror, POINTS_TABLE), path)
+    df = pd.read_csv(path, encoding="utf-8-sig", keep_default_na=False)
+    assert len(df) == 2
+    assert [p["name"] for p in json.loads(df.loc[0, POINTS_COLUMN])] == ["X", "Y"]
+
+
+def test_geojson_links_areas_with_known_places(mirror, tmp_path):
+    path = tmp_path / "out.geojson"
+    places = {"গাজীপুর|কালিয়াকৈর": (90.2, 24.0), "ঢাকা": (90.4, 23.8)}
+    export.write_geojson(export.iter_chunks(mirror, POINTS_TABLE), path, places)
+    features = json.loads(path.read_text(encoding="utf-8"))["features"]
+    assert features[0]["geometry"]["coordinates"] == [[90.2, 24.0], [90.4, 23.8]]
+    assert features[0]["properties"]["গন্তব্য দূরত্ব (KM)"] is None
+    assert features[1]["geometry"] is None
+
+
+def test_parquet_types_km_and_timestamp(mirror, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "out.parquet"
+    export.write_parquet(export.iter_chunks(mirror, POINTS_TABLE), path)
+    table = pq.read_table(path)
+    assert str(table.schema.field("উৎস দূরত্ব (KM)").type) == "double"
+    assert table.column("Timestamp").to_pylist()[1] == pd.Timestamp("2026-10-02")
+
+
+def test_km_reads_unusable_values_as_nan():
+    km = frames.km(pd.Series(["1.5", "", "abc", "inf", "-inf", "1e400"]))
+    assert km.dtype == "float32"
+    assert km.notna().tolist() == [True, False, False, False, False, False]
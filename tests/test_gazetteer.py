@@ -0,0 +1,60 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from fiber_survey import gazetteer
+
+
+def write_checkout(root):
+    files = {
+        "divisions": [{"id": "3", "name": "Dhaka", "bn_name": "ঢাকা"}],
+        "districts": [{"id": "34", "division_id": "3", "name": "Gazipur", "bn_name": "গাজীপুর"}],
+        "upazilas": [{"id": "250", "district_id": "34", "name": "Kaliakair", "bn_name": "কালিয়াকৈর"}],
+        "unions": [{"id": "1", "upazilla_id": "250", "name": "Mouchak", "bn_name": "মৌচাক"}],
+    }
+    for key, data in files.items():
+        os.makedirs(root / key)
+        # upstream files are phpMyAdmin exports: a list with a {"data": [...]} entry
+        (root / key / f"{key}.json").write_text(json.dumps([{"type": "table", "data": data}]), encoding="utf-8")
+
+
+def test_refresh_from_a_local_checkout(tmp_path):
+    write_checkout(tmp_path / "geocode")
+    out = tmp_path / "gazetteer.json.gz"
+    assert gazetteer.main(["refresh", "--source", str(tmp_path / "geocode"), "--output", str(out)]) == 0
+    doc = gazetteer.read_snapshot(str(out))
+    assert doc["tree"] == {"ঢাকা": {"গাজীপুর": {"কালিয়াকৈর": ["মৌচাক"]}}}
+    assert doc["en_names"]["upazilas"] == {"গাজীপুর|কালিয়াকৈর": "Kaliakair"}
+
+
+def test_read_snapshot_rejects_a_changed_tree(tmp_path):
+    path = str(tmp_path / "gazetteer.json.gz")
+    doc = gazetteer.write_snapshot({"ঢাকা": {}}, path)
+    doc["tree"]["খুলনা"] = {}
+    with open(path, "wb") as f:
+        f.write(gzip.compress(json.dumps(doc).encode("utf-8")))
+    with pytest.raises(gazetteer.GazetteerError):
+        gazetteer.read_snapshot(path)
+
+
+def test_failed_fetch_is_not_retried_at_once(tmp_path, monkeypatch):
+    calls = []
+
+    def offline(sources=gazetteer.NUHIL_RAW):
+        calls.append(1)
+        raise OSError("Name or service not known")
+
+    monkeypatch.setattr(gazetteer, "SNAPSHOT_PATH", str(tmp_path / "shipped.json.gz"))
+    monkeypatch.setattr(gazetteer, "LOCAL_SNAPSHOT_PATH", str(tmp_path / "local.json.gz"))
+    monkeypatch.setattr(gazetteer, "build_from_sources", offline)
+    monkeypatch.setattr(gazetteer, "_fetch_failed", None)
+    for _ in range(3):
+        with pytest.raises(gazetteer.GazetteerError, match="Live fetch failed"):
+            gazetteer.load_document()
+    assert len(calls) == 1
+    monkeypatch.setattr(gazetteer, "FETCH_RETRY_AFTER", 0)
+    with pytest.raises(gazetteer.GazetteerError):
+        gazetteer.load_document()
+    assert len(calls) == 2
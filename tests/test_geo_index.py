@@ -0,0 +1,29 @@
+from fiber_survey import geo_index, shared_cache, validation
+from fiber_survey.geo_index import OTHER, PLACEHOLDER, GeoIndex
+
+TREE = {"ঢাকা": {"গাজীপুর": {"কালিয়াকৈর": ["মৌচাক", "সফিপুর"]}}, "খুলনা": {"যশোর": {"সদর": []}}}
+
+
+def setup_function():
+    shared_cache.clear()
+
+
+def test_failed_load_is_not_cached():
+    assert geo_index.for_version({}, None).options() == (PLACEHOLDER, OTHER)
+    assert validation.gazetteer_keys_for_version({}, None) is None
+    assert "ঢাকা" in geo_index.for_version(TREE, "v1").options()
+    assert "ঢাকা" in validation.gazetteer_keys_for_version(TREE, "v1")[0]
+
+
+def test_new_version_rebuilds():
+    first = geo_index.for_version(TREE, "v1")
+    assert geo_index.for_version(TREE, "v1") is first
+    assert "বরিশাল" in geo_index.for_version({"বরিশাল": {}}, "v2").options()
+
+
+def test_options_are_sorted_between_placeholder_and_other():
+    index = GeoIndex(TREE)
+    assert index.options() == (PLACEHOLDER, "খুলনা", "ঢাকা", OTHER)
+    assert index.options("ঢাকা", "গাজীপুর", "কালিয়াকৈর")[1:-1] == ("মৌচাক", "সফিপুর")
+    assert index.contains("ঢাকা", "গাজীপুর")
+    assert not index.contains("ঢাকা", "যশোর")
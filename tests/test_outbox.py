@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from fiber_survey.outbox import Flusher, Outbox
+from fiber_survey.schema import MAIN_WORKSHEET
+from fiber_survey.storage import Storage
+
+
+class FlakyStorage(Storage):
+    def __init__(self, failures):
+        self.failures = failures
+        self.rows = []
+
+    def append(self, worksheet, records, columns=None):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("quota exceeded")
+        self.rows.extend(records)
+        return len(records)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(str(tmp_path / "outbox.sqlite3"))
+
+
+def test_flush_once_sends_in_order_and_marks_flushed(outbox):
+    target = FlakyStorage(0)
+    outbox.enqueue([{"নাম": "a"}, {"নাম": "b"}])
+    assert Flusher(outbox, target).flush_once() == 2
+    assert [r["নাম"] for r in target.rows] == ["a", "b"]
+    assert outbox.stats()["pending"] == 0
+
+
+def test_failed_batch_is_released_for_a_retry(outbox):
+    target = FlakyStorage(1)
+    outbox.enqueue([{"নাম": "a"}], MAIN_WORKSHEET)
+    with pytest.raises(ConnectionError):
+        Flusher(outbox, target).flush_once()
+    assert outbox.stats()["pending"] == 1
+    assert Flusher(outbox, target).flush_once() == 1
+
+
+def test_flush_now_cuts_the_backoff_short(outbox):
+    target = FlakyStorage(1)
+    flusher = Flusher(outbox, target, interval=60, max_backoff=300)
+    flusher.start()
+    try:
+        outbox.enqueue([{"নাম": "a"}])
+        wait_for(lambda: flusher.failures)
+        outbox.enqueue([{"নাম": "b"}])  # a submission alone waits out the backoff
+        time.sleep(0.2)
+        assert not target.rows
+        outbox.flush_now()
+        wait_for(lambda: len(target.rows) == 2)
+        assert flusher.failures == 0
+    finally:
+        flusher.stop()
+        flusher.join(5)
+    assert not flusher.is_alive()
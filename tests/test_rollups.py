@@ -0,0 +1,32 @@
+import sqlite3
+
+import pandas as pd
+
+from fiber_survey import rollups
+
+SRC, DST = rollups.KM_COLUMNS["src_km"], rollups.KM_COLUMNS["dst_km"]
+
+
+def frame(*km):
+    return pd.DataFrame([{"উৎস বিভাগ": "ঢাকা", "উৎস জেলা": "গাজীপুর", "উৎস উপজেলা": "কালিয়াকৈর",
+                          "উৎস কোর টাইপ": "24", "Timestamp": "2026-10-01 10:00:00", "নাম": "A",
+                          SRC: src, DST: dst} for src, dst in km])
+
+
+def test_totals_add_up_across_batches():
+    con = sqlite3.connect(":memory:")
+    hook = rollups.Rollups()
+    hook.setup(con)
+    hook.apply(con, frame(("1.5", "2")))
+    hook.apply(con, frame(("3", "")))
+    totals = rollups.totals(con)
+    assert (totals["entries"], totals["src_km"], totals["dst_km"], totals["officers"]) == (2, 4.5, 2.0, 1)
+
+
+def test_unusable_km_counts_as_zero():
+    con = sqlite3.connect(":memory:")
+    for hook in (rollups.Rollups(), rollups.AreaRollups()):
+        hook.setup(con)
+        hook.apply(con, frame(("inf", "1e400"), ("abc", "2")))
+    assert rollups.totals(con)["src_km"] == 0.0
+    assert con.execute("SELECT km FROM agg_area").fetchall() == [(2.0,)]
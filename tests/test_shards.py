@@ -0,0 +1,63 @@
+from fiber_survey import shards
+from fiber_survey.schema import MAIN_WORKSHEET
+
+TITLES = [MAIN_WORKSHEET, "Main List | 2026-09 | ঢাকা", "Main List | 2026-10 | ঢাকা", "Main List | 2026-10 | খুলনা",
+          "Main List | 2026-10 | -", "Points", "Main List | 2026-1 | ঢাকা"]
+
+
+class Book:
+    def worksheets(self):
+        return [type("Worksheet", (), {"title": t})() for t in TITLES]
+
+
+def listed():
+    return shards.list_shards(Book())
+
+
+def titles(found):
+    return [s.title for s in found]
+
+
+def test_shard_titles_round_trip():
+    title = shards.shard_title({"উৎস বিভাগ": " ঢাকা ", "Timestamp": "2026-10-05 09:00:00"})
+    assert title == "Main List | 2026-10 | ঢাকা"
+    assert shards.parse_title(title) == ("2026-10", "ঢাকা")
+    assert shards.parse_title(MAIN_WORKSHEET) == ("", "")
+    assert shards.parse_title("Points") is None
+
+
+def test_listing_skips_other_sheets_and_numbers_the_unsharded_one_0():
+    found = listed()
+    assert titles(found) == [MAIN_WORKSHEET, "Main List | 2026-09 | ঢাকা", "Main List | 2026-10 | -",
+                             "Main List | 2026-10 | খুলনা", "Main List | 2026-10 | ঢাকা"]
+    assert shards.numbers(found)[MAIN_WORKSHEET] == 0
+    assert shards.numbers(found[1:])["Main List | 2026-09 | ঢাকা"] == 1
+
+
+def test_select_by_division_and_month():
+    found = listed()
+    assert titles(shards.select(found, [("উৎস বিভাগ", "=", "ঢাকা")])) == [
+        MAIN_WORKSHEET, "Main List | 2026-09 | ঢাকা", "Main List | 2026-10 | ঢাকা"]
+    assert titles(shards.select(found, [("উৎস বিভাগ", "=", "")])) == [MAIN_WORKSHEET, "Main List | 2026-10 | -"]
+    assert titles(shards.select(found, [("Timestamp", ">=", "2026-10-01")]))[1:] == [
+        "Main List | 2026-10 | -", "Main List | 2026-10 | খুলনা", "Main List | 2026-10 | ঢাকা"]
+    assert titles(shards.select(found, [("Timestamp", "<", "2026-10"), ("উৎস বিভাগ", "in", ["ঢাকা"])])) == [
+        MAIN_WORKSHEET, "Main List | 2026-09 | ঢাকা"]
+    assert titles(shards.select(found, [("Timestamp", "<=", "2026-09-30 23:59:59")]))[1:] == [
+        "Main List | 2026-09 | ঢাকা"]
+    assert len(shards.select(found, [("নাম", "=", "x")])) == len(found)
+
+
+def test_split_keeps_order_within_each_shard():
+    records = [{"উৎস বিভাগ": "ঢাকা", "Timestamp": "2026-10-01", "n": 1},
+               {"উৎস বিভাগ": "খুলনা", "Timestamp": "2026-10-01", "n": 2},
+               {"উৎস বিভাগ": "ঢাকা", "Timestamp": "2026-10-02", "n": 3}]
+    parts = shards.split(records)
+    assert {t: list(p["n"]) for t, p in parts.items()} == {
+        "Main List | 2026-10 | ঢাকা": [1, 3], "Main List | 2026-10 | খুলনা": [2]}
+
+
+def test_frame_numbers_rows_by_shard():
+    df = shards.frame([["a", "b", ""], ["1", "2"], ["", ""], ["3", "4", "x"]], 2)
+    assert list(df.index) == [2 * shards.SHARD_ROWS + 2, 2 * shards.SHARD_ROWS + 4]
+    assert df.to_dict("list") == {"a": ["1", "3"], "b": ["2", "4"]}
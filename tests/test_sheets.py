@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+from fiber_survey import sheets
+
+
+class Worksheet:
+    # Header row of one worksheet, shared by the "workers" holding it
+    def __init__(self, header=()):
+        self.spreadsheet = SimpleNamespace(id="book")
+        self.id = id(self)
+        self.row = list(header)
+        self.updates = []
+
+    def row_values(self, row):
+        return list(self.row)
+
+    def update(self, range_name=None, values=None, **kwargs):
+        self.updates.append((range_name, values[0]))
+        col = 0
+        for ch in range_name.rstrip("0123456789"):
+            col = col * 26 + ord(ch) - 64
+        self.row[col - 1:col - 1 + len(values[0])] = values[0]
+
+
+def setup_function():
+    sheets._header_cache.clear()
+
+
+def test_blank_sheet_gets_the_layout():
+    ws = Worksheet()
+    assert sheets.sheet_header(ws, ["a", "b"], ["a"]) == ["a", "b"]
+    assert ws.updates == [("A1", ["a", "b"])]
+
+
+def test_missing_columns_are_appended_once():
+    ws = Worksheet(["a", "b"])
+    assert sheets.sheet_header(ws, ["a", "b", "c"], ["a", "c"]) == ["a", "b", "c"]
+    assert sheets.sheet_header(ws, ["a", "b", "c"], ["a", "c"]) == ["a", "b", "c"]
+    assert ws.updates == [("C1", ["c"])]
+
+
+def test_columns_added_by_another_worker_are_not_written_again():
+    ws = Worksheet(["a", "b"])
+    sheets.sheet_header(ws, ["a", "b"], ["a"])  # cached ["a", "b"]
+    ws.row.append("c")  # another process adds "c"
+    assert sheets.sheet_header(ws, ["a", "b", "c"], ["a", "c"]) == ["a", "b", "c"]
+    assert ws.updates == []
+    assert ws.row == ["a", "b", "c"]
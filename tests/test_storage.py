@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from bench.memory_sheets import MemoryConnection
+from fiber_survey import storage
+from fiber_survey.schema import DB_COLUMNS, MAIN_WORKSHEET
+
+
+class SlowTarget(storage.Storage):
+    # Records what it is sent; slow enough for two replicas to overlap
+    def __init__(self):
+        self.sent = []
+
+    def append(self, worksheet, records, columns=DB_COLUMNS):
+        time.sleep(0.05)
+        self.sent.extend(records.index)
+        return len(records)
+
+
+KM = "উৎস দূরত্ব (KM)"
+
+
+@pytest.fixture
+def url(tmp_path):
+    return f"sqlite:///{tmp_path / 'survey.sqlite3'}"
+
+
+def rows(n):
+    return pd.DataFrame([{"উৎস বিভাগ": ["ঢাকা", "খুলনা"][i % 2], "উৎস জেলা": f"জেলা {i % 3}",
+                          "উৎস দূরত্ব (KM)": str(i), "Timestamp": f"2026-10-{1 + i % 28:02d} 10:00:00"}
+                         for i in range(n)])
+
+
+def test_replicas_do_not_send_rows_twice(url):
+    storage.SQLStorage(url).append(MAIN_WORKSHEET, rows(50))
+    target = SlowTarget()
+    replicators = [storage.Replicator(storage.SQLStorage(url), target, batch_size=10) for _ in range(2)]
+
+    def drain(replicator):
+        while replicator.replicate_once():
+            pass
+
+    threads = [threading.Thread(target=drain, args=(r,)) for r in replicators]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(target.sent) == list(range(1, 51))
+
+
+def test_import_refuses_a_non_empty_database(url):
+    db = storage.SQLStorage(url)
+    db.append(MAIN_WORKSHEET, rows(1))
+    with pytest.raises(storage.StorageError):
+        db.import_from(storage.SQLStorage(url))
+
+
+def test_query_count_and_aggregate(url):
+    db = storage.SQLStorage(url)
+    db.append(MAIN_WORKSHEET, rows(6))
+    dhaka = db.query(MAIN_WORKSHEET, {"উৎস বিভাগ": "ঢাকা"}, columns=["উৎস দূরত্ব (KM)"],
+                     order_by="Timestamp", descending=True)
+    assert list(dhaka["উৎস দূরত্ব (KM)"]) == ["4", "2", "0"]
+    assert db.count(MAIN_WORKSHEET, [("Timestamp", ">=", "2026-10-03")]) == 4
+    assert db.count(MAIN_WORKSHEET, {"উৎস বিভাগ": []}) == 0
+    paged = db.query(MAIN_WORKSHEET, limit=2, offset=3)
+    assert list(paged.index) == [4, 5]
+    totals = db.aggregate(MAIN_WORKSHEET, ["উৎস বিভাগ"],
+                          {"lines": ("count", None), "km": ("sum", "উৎস দূরত্ব (KM)")})
+    assert totals.set_index("উৎস বিভাগ").to_dict("index") == {"খুলনা": {"lines": 3, "km": 9.0},
+                                                              "ঢাকা": {"lines": 3, "km": 6.0}}
+
+
+def test_rejects_unknown_columns_and_operators(url):
+    db = storage.SQLStorage(url)
+    with pytest.raises(storage.StorageError):
+        db.query(MAIN_WORKSHEET, {"no such column": "x"})
+    with pytest.raises(storage.StorageError):
+        db.count(MAIN_WORKSHEET, [("Timestamp", "between", "2026")])
+    with pytest.raises(storage.StorageError):
+        db.aggregate(MAIN_WORKSHEET, [], {"x": ("median", "উৎস দূরত্ব (KM)")})
+
+
+@pytest.fixture(params=["sql", "sheets", "sharded"])
+def backend(request, url):
+    if request.param == "sql":
+        return storage.SQLStorage(url)
+    conn = MemoryConnection()
+    return storage.SheetsStorage(conn) if request.param == "sheets" else storage.ShardedSheetsStorage(conn)
+
+
+def test_km_filters_and_order_are_numeric(backend):
+    backend.append(MAIN_WORKSHEET, [{KM: km, "উৎস বিভাগ": "ঢাকা", "Timestamp": "2026-10-01 10:00:00"}
+                                    for km in ("10.0", "2.5", "30", "", "abc")])
+    assert backend.count(MAIN_WORKSHEET, [(KM, ">=", 5)]) == 2
+    assert backend.count(MAIN_WORKSHEET, [(KM, "<", "10")]) == 1
+    assert backend.count(MAIN_WORKSHEET, {KM: [2.5, 30]}) == 2
+    ordered = backend.query(MAIN_WORKSHEET, order_by=KM, descending=True)[KM].tolist()
+    assert ordered[:3] == ["30", "10.0", "2.5"]
+    with pytest.raises(storage.StorageError):
+        backend.count(MAIN_WORKSHEET, [(KM, ">", "far")])
+
+
+def test_import_from_shards_reads_each_row_once(url):
+    source = storage.ShardedSheetsStorage(MemoryConnection())
+    records = rows(30)
+    records["Timestamp"] = [f"2026-{8 + i % 3:02d}-01 10:00:00" for i in range(30)]
+    source.append(MAIN_WORKSHEET, records)
+    spreadsheet = source.conn.spreadsheet
+    spreadsheet.calls = 0
+    db = storage.SQLStorage(url)
+    copied = db.import_from(source, batch_size=4)
+    assert copied[MAIN_WORKSHEET] == 30
+    assert sorted(db.query(MAIN_WORKSHEET)[KM].astype(int)) == list(range(30))
+    # one header and one window per batch and shard crossed, never whole shards
+    assert spreadsheet.calls < 40
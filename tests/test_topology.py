@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+import time
+
+from fiber_survey.schema import LINE_ID_COLUMN, POINT_COLUMNS
+from fiber_survey.topology import DEST, KM, SOURCE, Topology
+
+SEQ, NAME, CORE, DIST = POINT_COLUMNS[1:]
+
+
+def line(src, dst, src_km="1", dst_km="1", core=("24", "24"), line_id=""):
+    row = dict(zip(SOURCE, ["ঢাকা", "গাজীপুর", "কালিয়াকৈর", "", src, core[0]]))
+    row.update(zip(DEST, ["ঢাকা", "গাজীপুর", "কালিয়াকৈর", "", dst, core[1]]))
+    row.update(zip(KM, [src_km, dst_km]))
+    row[LINE_ID_COLUMN] = line_id
+    return row
+
+
+def site(name):
+    return ("site", "ঢাকা", "গাজীপুর", "কালিয়াকৈর", "", name.casefold())
+
+
+def test_shortest_path_through_a_point(tables):
+    db = tables([line("A", "B", line_id="x"), line("B", "C", "2", "2")],
+                [{LINE_ID_COLUMN: "x", SEQ: "1", NAME: "P", CORE: "12", DIST: "0.5"}])
+    topo = Topology()
+    topo.sync(db.con, (1, 1))
+    km, path = topo.shortest_path(site("A"), site("C"))
+    assert km == 6.0
+    assert [topo.label(k).split(" ")[0] for k in path] == ["A", "P", "B", "C"]
+    assert topo.summary()["spof"] == 2  # P and B
+    assert list(topo.capacity_drops()["Core"]) == ["24 → 12"]
+
+
+def test_non_finite_lengths_count_as_zero(tables):
+    db = tables([line("A", "B", "inf", "nan"), line("B", "C", "-1", "1e400")])
+    topo = Topology()
+    topo.sync(db.con, (1, 1))
+    assert topo.shortest_path(site("A"), site("C"))[0] == 0.0
+
+
+def test_sync_reads_only_new_rows_and_rebuilds_on_a_new_generation(tables):
+    db = tables([line("A", "B")])
+    topo = Topology()
+    version = topo.sync(db.con, (1, 1))
+    assert topo.sync(db.con, (1, 1)) == version
+    db.con.execute(f'INSERT INTO main_list ("{SOURCE[4]}", "{DEST[4]}") VALUES (?, ?)', ("C", "D"))
+    assert topo.sync(db.con, (1, 1)) > version
+    assert topo.summary()["components"] == 2
+    db.con.execute("DELETE FROM main_list WHERE _row = 1")
+    topo.sync(db.con, (2, 1))
+    assert topo.summary()["lines"] == 1
+
+
+def test_reads_are_safe_during_a_sync(tables):
+    db = tables([line(f"S{i}", f"S{i + 1}") for i in range(300)])
+    shared = sqlite3.connect(":memory:", check_same_thread=False)
+    db.con.commit()
+    db.con.backup(shared)
+    topo = Topology()
+    topo.sync(shared, (0, 0))
+
+    def resync():
+        for generation in range(1, 20):
+            topo.sync(shared, (generation, 0))  # a new generation rebuilds the graph
+
+    worker = threading.Thread(target=resync)
+    worker.start()
+    for _ in range(200):
+        for district in topo.districts():
+            assert all(topo.label(k) for k in topo.nodes_in(district))
+        time.sleep(0.001)
+    worker.join()
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from fiber_survey import validation
+from fiber_survey.schema import DB_COLUMNS
+
+TREE = {"ঢাকা": {"গাজীপুর": {"কালিয়াকৈর": ["মৌচাক"]}}}
+
+
+def row(**overrides):
+    values = {
+        "নাম": "রহিম", "যোগাযোগ নম্বর": "01711000000", "পদবী": "প্রোগ্রামার", "কর্মস্থল": "গাজীপুর",
+        "উৎস বিভাগ": "ঢাকা", "উৎস জেলা": "গাজীপুর", "উৎস উপজেলা": "কালিয়াকৈর", "উৎস ইউনিয়ন": "মৌচাক",
+        "উৎস (Source Name)": "POP A", "উৎস কোর টাইপ": "24", "উৎস দূরত্ব (KM)": "1.5",
+        "গন্তব্য বিভাগ": "ঢাকা", "গন্তব্য জেলা": "গাজীপুর", "গন্তব্য উপজেলা": "কালিয়াকৈর", "গন্তব্য ইউনিয়ন": "মৌচাক",
+        "গন্তব্য (Destination Name)": "POP B", "গন্তব্য কোর টাইপ": "24", "গন্তব্য দূরত্ব (KM)": "2",
+        "ডিপেন্ডেন্সি (KM)": "0",
+    }
+    values.update(overrides)
+    return values
+
+
+def report(*rows):
+    df = validation.normalize_frame(pd.DataFrame(list(rows)), DB_COLUMNS)
+    return validation.validate(df, gazetteer=TREE)
+
+
+def problems(result, severity=validation.ERROR):
+    row_col, col_col, _, sev_col = validation.REPORT_COLUMNS
+    return set(zip(result.loc[result[sev_col] == severity, row_col], result.loc[result[sev_col] == severity, col_col]))
+
+
+def test_clean_row_passes():
+    assert report(row()).empty
+
+
+@pytest.mark.parametrize("value", ["inf", "-inf", "1e400", "abc", "-1"])
+def test_bad_distances_are_errors(value):
+    assert (0, "উৎস দূরত্ব (KM)") in problems(report(row(**{"উৎস দূরত্ব (KM)": value})))
+
+
+def test_long_distance_is_only_a_warning():
+    result = report(row(**{"গন্তব্য দূরত্ব (KM)": "900"}))
+    assert not problems(result)
+    assert problems(result, validation.WARNING) == {(0, "গন্তব্য দূরত্ব (KM)")}
+
+
+def test_required_pattern_and_core_type():
+    found = problems(report(row(নাম="", **{"যোগাযোগ নম্বর": "123", "উৎস কোর টাইপ": "36"})))
+    assert found == {(0, "নাম"), (0, "যোগাযোগ নম্বর"), (0, "উৎস কোর টাইপ")}
+
+
+def test_first_unknown_gazetteer_level_is_a_warning():
+    result = report(row(**{"উৎস উপজেলা": "অজানা", "উৎস ইউনিয়ন": "অজানা"}))
+    assert not problems(result)
+    assert problems(result, validation.WARNING) == {(0, "উৎস উপজেলা")}
+
+
+def test_points_json():
+    result = report(row(**{"পয়েন্টসমূহ": '[{"name": "P", "dist": 1}]'}), row(**{"পয়েন্টসমূহ": "[not json]"}))
+    assert problems(result) == {(1, "পয়েন্টসমূহ")}